@@ -0,0 +1,82 @@
+import math
+from typing import Optional, Tuple
+
+# 増減の指数移動平均・分散の平滑化係数（直近およそ2/α回分の取得を重視する）
+ANOMALY_EWMA_ALPHA = 0.1
+
+# この回数の増減を学習するまでは、急な増減かどうかを判定しない
+ANOMALY_MIN_SAMPLES = 12
+
+# Zスコアの絶対値がこの値以上の増減を、いつもと異なる急な増減とみなす
+ANOMALY_Z_THRESHOLD = 4.0
+
+# 標準偏差の下限（増減がほとんどないアカウントで、1人の増減を急な変化とみなさないため）
+ANOMALY_MIN_STD = 1.0
+
+# 急な増減とみなす増減の人数の下限と、フォロワー数に対する割合の下限
+# 急な増減はユーザーごとの通知の下限に関わらず通知するため、Zスコアが大きくても小さな増減は対象にしない
+ANOMALY_MIN_CHANGE = 10
+ANOMALY_MIN_CHANGE_RATIO = 0.01
+
+def update_anomaly_state(state: Optional[dict], change: float) -> Tuple[dict, Optional[float]]:
+    """
+    前回の取得からのフォロワー数の増減changeで、増減の指数移動平均・分散（EWMA）の状態を更新する
+    stateは {'mean': 平均, 'variance': 分散, 'samples': 学習した回数} の形式で、初回はNone
+    履歴を読み込まず、1回の更新あたり定数時間で計算する
+    戻り値は (更新後の状態, 更新前の状態に対するchangeのZスコア)
+    学習した回数がANOMALY_MIN_SAMPLESに満たない場合、Zスコアは None
+    """
+    change = float(change)
+    if not state:
+        return {'mean': change, 'variance': 0.0, 'samples': 1}, None
+
+    mean = float(state['mean'])
+    variance = float(state['variance'])
+    samples = int(state['samples'])
+
+    score = None
+    if samples >= ANOMALY_MIN_SAMPLES:
+        score = (change - mean) / max(math.sqrt(variance), ANOMALY_MIN_STD)
+
+    # 急な増減も状態に取り込み、増減の水準が変わった場合はそれに追従する
+    diff = change - mean
+    increment = ANOMALY_EWMA_ALPHA * diff
+    state = {
+        'mean': mean + increment,
+        'variance': (1 - ANOMALY_EWMA_ALPHA) * (variance + diff * increment),
+        'samples': samples + 1
+    }
+    return state, score
+
+def revert_anomaly_state(state: Optional[dict], change: float) -> Optional[dict]:
+    """
+    update_anomaly_state(更新前の状態, change)で更新された状態stateから、更新前の状態を復元する
+    既に状態に取り込んだ増減のZスコアを、状態を更新し直さずに求めるために使う
+    初回の更新で作成された状態の場合はNone
+    """
+    if not state or int(state['samples']) <= 1:
+        return None
+
+    change = float(change)
+    mean = (float(state['mean']) - ANOMALY_EWMA_ALPHA * change) / (1 - ANOMALY_EWMA_ALPHA)
+    diff = change - mean
+    variance = float(state['variance']) / (1 - ANOMALY_EWMA_ALPHA) - ANOMALY_EWMA_ALPHA * diff * diff
+    return {'mean': mean, 'variance': max(variance, 0.0), 'samples': int(state['samples']) - 1}
+
+def get_min_anomalous_change(followers_count: Optional[int] = None) -> int:
+    """
+    急な増減とみなす増減の人数の下限を返す（ANOMALY_MIN_CHANGEと、フォロワー数のANOMALY_MIN_CHANGE_RATIOの大きい方）
+    """
+    if not followers_count:
+        return ANOMALY_MIN_CHANGE
+    return max(ANOMALY_MIN_CHANGE, math.ceil(followers_count * ANOMALY_MIN_CHANGE_RATIO))
+
+def is_anomalous(score: Optional[float], change: Optional[float] = None, followers_count: Optional[int] = None,
+                 threshold: float = ANOMALY_Z_THRESHOLD) -> bool:
+    """
+    Zスコアの絶対値がthreshold以上の場合はTrue（判定できない場合はFalse）
+    changeを指定した場合は、その絶対値がget_min_anomalous_change(followers_count)以上であることも条件にする
+    """
+    if score is None or abs(score) < threshold:
+        return False
+    return change is None or abs(change) >= get_min_anomalous_change(followers_count)
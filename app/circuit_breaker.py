@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict
+
+class CircuitBreaker:
+    """
+    失敗率または遅延が続いた呼び出し先への呼び出しを一時的に止めるサーキットブレーカー
+    - closed: 通常どおり呼び出す。直近window_size件の失敗（遅延を含む）の割合が閾値を超えたらopenにする
+    - open: open_duration秒の間は呼び出しを拒否する
+    - half_open: 試行の呼び出しを1件だけ許可し、成功したらclosed、失敗したら再びopenにする
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate_threshold: float = 0.5, slow_call_seconds: float = 10.0,
+                 window_size: int = 20, minimum_calls: int = 5, open_duration: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self._clock = clock
+        self._outcomes = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self.rejected_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.open_duration:
+            self._state = self.HALF_OPEN
+            self._trial_in_progress = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        呼び出してよいかを返す。Trueを返した場合は、呼び出し後に必ずrecordで結果を記録すること
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+
+            self.rejected_count += 1
+            return False
+
+    def record(self, success: bool, duration: float = 0.0):
+        """
+        呼び出しの結果を記録する。slow_call_secondsを超えた呼び出しは失敗として扱う
+        """
+        failed = not success or duration > self.slow_call_seconds
+
+        with self._lock:
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                self._trial_in_progress = False
+                if failed:
+                    self._trip()
+                else:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                return
+
+            if state == self.OPEN:
+                return
+
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.minimum_calls:
+                failure_rate = sum(self._outcomes) / len(self._outcomes)
+                if failure_rate >= self.failure_rate_threshold:
+                    self._trip()
+
+    def _trip(self):
+        print(f"Circuit breaker opened for {self.open_duration} seconds.")
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        現在の状態と、これまでに拒否した呼び出しの数を返す
+        """
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'rejected_count': self.rejected_count
+            }
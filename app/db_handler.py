@@ -1,17 +1,103 @@
 import boto3
+import json
 import os
-from typing import List, Dict, Optional
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional, Tuple
+from boto3.dynamodb.types import Binary
 from botocore.exceptions import ClientError
 
+# NumPyの読み込みには時間がかかるため、フォロワー数の履歴を扱うメソッドの中で読み込む
+if TYPE_CHECKING:
+    import numpy as np
+
+# 全件スキャン時に取得する属性（キー属性と、通知するフォロワー数の変化の下限、最後に通知したフォロワー数）
+USER_MAPPING_PROJECTION = 'line_user_id, note_username, notify_min_change, last_notified_followers_count'
+
+# 条件付きGETの検証子として取得する属性
+PROFILE_VALIDATORS_PROJECTION = 'request_url, etag, last_modified, followers_count'
+
+# フォロワー数のスナップショットとして取得する属性
+FOLLOWER_SNAPSHOT_PROJECTION = 'followers_count, fetched_at'
+
+# 更新されなくなったnote.comアカウントの項目をTTLで削除するまでの秒数
+FOLLOWER_SNAPSHOT_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# フォロワー数の履歴と、増減の異常検知の状態（app.anomaly）として取得する属性
+# 定期実行ではこの1回の読み込みで条件付きGETの検証子も取得する
+FOLLOWER_HISTORY_PROJECTION = 'follower_history, follower_anomaly, ' + PROFILE_VALIDATORS_PROJECTION
+
+# note.comアカウントごとに保持するフォロワー数の履歴の件数（1時間ごとの実行で1年分）
+# 履歴はhistory_codecの形式でまとめたBinary属性として保存する（1年分で数KB程度）
+FOLLOWER_HISTORY_MAX_ENTRIES = 24 * 365
+
+# スケジュール実行の続きの呼び出しに失敗した場合に、次の実行で再開するためのカーソルを保存する項目のキー
+# note.comアカウントのテーブルに保存し、note.comユーザー名に使えない文字（#）で始めて重ならないようにする
+SCHEDULED_CURSOR_KEY_PREFIX = '#scheduled_cursor'
+
+# 保存したカーソルをTTLで削除するまでの秒数
+SCHEDULED_CURSOR_TTL_SECONDS = 24 * 60 * 60
+
+# 並列スキャン時にセグメントのスレッドから受け渡す項目のバッファ上限
+PARALLEL_SCAN_BUFFER_SIZE = 1000
+
+# 並列スキャンでセグメントのスキャン完了を表す番兵
+_SEGMENT_DONE = object()
+
 class DynamoDBHandler:
     """
     DynamoDBでのユーザー情報管理を行うクラス
     """
 
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
         self.table_name = os.environ.get('DYNAMODB_TABLE_NAME', 'note-monitor-users')
-        self.table = self.dynamodb.Table(self.table_name)
+        # note.comアカウントごとの情報（条件付きGETの検証子など）を保存するテーブル
+        self.account_table_name = os.environ.get('NOTE_ACCOUNT_TABLE_NAME', 'note-monitor-note-accounts')
+        # boto3のリソースはスレッド間で共有できないため、スレッドごとに作成する（作成したスレッドの分はここで作成する）
+        self._local = threading.local()
+        self._owner_thread = threading.current_thread()
+        self._connect()
+        # 並列スキャンで使い終わったセグメントごとのテーブル（ウォームスタート間で再利用する）
+        self._idle_segment_tables = []
+        self._segment_tables_lock = threading.Lock()
+
+    def _connect(self) -> threading.local:
+        """
+        呼び出したスレッドで使うboto3のリソースとテーブルを作成する
+        boto3のデフォルトセッションからの作成はスレッドセーフではないため、
+        ハンドラーを作成したスレッド以外では、スレッドごとのセッションからリソースを作成する
+        """
+        if threading.current_thread() is self._owner_thread:
+            dynamodb = boto3.resource('dynamodb')
+        else:
+            dynamodb = boto3.session.Session().resource('dynamodb')
+        self._local.dynamodb = dynamodb
+        self._local.table = dynamodb.Table(self.table_name)
+        self._local.account_table = dynamodb.Table(self.account_table_name)
+        return self._local
+
+    def _connection(self) -> threading.local:
+        """
+        呼び出したスレッドのboto3のリソースとテーブルを返す（まだない場合は作成する）
+        """
+        if not hasattr(self._local, 'table'):
+            return self._connect()
+        return self._local
+
+    @property
+    def dynamodb(self):
+        return self._connection().dynamodb
+
+    @property
+    def table(self):
+        return self._connection().table
+
+    @property
+    def account_table(self):
+        return self._connection().account_table
 
     def save_user_mapping(self, line_user_id: str, note_username: str) -> bool:
         """
@@ -79,6 +165,50 @@ class DynamoDBHandler:
             print(f"Error deleting user mapping: {e}")
             return False
 
+    def update_notify_min_change(self, line_user_id: str, notify_min_change: int) -> bool:
+        """
+        LINE ユーザーIDの全てのマッピングに、通知するフォロワー数の変化の下限を設定
+        """
+        try:
+            response = self.table.query(
+                KeyConditionExpression='line_user_id = :line_user_id',
+                ExpressionAttributeValues={
+                    ':line_user_id': line_user_id
+                }
+            )
+            for item in response.get('Items', []):
+                self.table.update_item(
+                    Key={
+                        'line_user_id': line_user_id,
+                        'note_username': item['note_username']
+                    },
+                    UpdateExpression='SET notify_min_change = :notify_min_change',
+                    ExpressionAttributeValues={':notify_min_change': notify_min_change}
+                )
+            return True
+        except ClientError as e:
+            print(f"Error updating notify min change: {e}")
+            return False
+
+    def update_last_notified_followers_count(self, line_user_id: str, note_username: str,
+                                             followers_count: int) -> bool:
+        """
+        ユーザーマッピングに、スケジュール実行で最後に通知したフォロワー数を保存
+        """
+        try:
+            self.table.update_item(
+                Key={
+                    'line_user_id': line_user_id,
+                    'note_username': note_username
+                },
+                UpdateExpression='SET last_notified_followers_count = :followers_count',
+                ExpressionAttributeValues={':followers_count': followers_count}
+            )
+            return True
+        except ClientError as e:
+            print(f"Error updating last notified followers count: {e}")
+            return False
+
     def get_user_mapping(self, line_user_id: str) -> Optional[str]:
         """
         LINE ユーザーIDから note.com ユーザー名を取得（後方互換性のため最初の1つを返す）
@@ -102,26 +232,584 @@ class DynamoDBHandler:
             print(f"Error getting user mappings: {e}")
             return []
 
+    def iter_all_user_mappings(self, exclusive_start_key: Optional[Dict[str, str]] = None,
+                               page_size: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """
+        すべてのユーザーマッピングを1件ずつ返すジェネレータ
+        LastEvaluatedKeyをたどって全ページをスキャンし、ページが届くたびに順次返す
+        exclusive_start_keyを指定した場合は、そのキーの次の項目からスキャンを再開する
+        """
+        yield from self._scan_items(
+            'Error getting all user mappings',
+            exclusive_start_key=exclusive_start_key,
+            page_size=page_size,
+            ProjectionExpression=USER_MAPPING_PROJECTION
+        )
+
+    def iter_all_user_mappings_parallel(self, total_segments: int,
+                                        page_size: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """
+        Segment/TotalSegmentsによる並列スキャンで全ユーザーマッピングを1件ずつ返すジェネレータ
+        セグメントごとにスレッドでスキャンし、届いた順に1つのストリームにまとめて返す
+        total_segmentsが1以下の場合は通常のスキャンと同じ
+        """
+        if total_segments <= 1:
+            yield from self.iter_all_user_mappings(page_size=page_size)
+            return
+
+        tables = self._acquire_segment_tables(total_segments)
+        try:
+            yield from self._scan_segments(tables, total_segments, page_size)
+        finally:
+            self._release_segment_tables(tables)
+
+    def _scan_segments(self, tables: list, total_segments: int,
+                       page_size: Optional[int]) -> Iterator[Dict[str, str]]:
+        """
+        セグメントごとにスレッドでスキャンし、届いた順に1つのストリームにまとめて返す
+        """
+        results = queue.Queue(maxsize=PARALLEL_SCAN_BUFFER_SIZE)
+        stopped = threading.Event()
+
+        def put(item) -> bool:
+            # 呼び出し側が読み込みを打ち切った場合はブロックせずに終了する
+            while not stopped.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan_segment(segment: int):
+            try:
+                items = self._scan_items(
+                    f'Error getting all user mappings (segment {segment})',
+                    page_size=page_size,
+                    table=tables[segment],
+                    ProjectionExpression=USER_MAPPING_PROJECTION,
+                    Segment=segment,
+                    TotalSegments=total_segments
+                )
+                for item in items:
+                    if not put(item):
+                        return
+            except Exception as e:
+                print(f"Error scanning segment {segment}: {e}")
+            finally:
+                put(_SEGMENT_DONE)
+
+        with ThreadPoolExecutor(max_workers=total_segments) as executor:
+            for segment in range(total_segments):
+                executor.submit(scan_segment, segment)
+
+            try:
+                remaining_segments = total_segments
+                while remaining_segments:
+                    item = results.get()
+                    if item is _SEGMENT_DONE:
+                        remaining_segments -= 1
+                        continue
+                    yield item
+            finally:
+                stopped.set()
+
+    def _acquire_segment_tables(self, total_segments: int) -> list:
+        """
+        並列スキャンのセグメントごとのテーブルを取り出す
+        boto3のリソースはスレッド間で共有できないため、同時に行われるスキャンの間では同じテーブルを使わない
+        使い終わったテーブルがない場合のみ作成する
+        """
+        with self._segment_tables_lock:
+            tables = self._idle_segment_tables[:total_segments]
+            del self._idle_segment_tables[:total_segments]
+        while len(tables) < total_segments:
+            tables.append(boto3.resource('dynamodb').Table(self.table_name))
+        return tables
+
+    def _release_segment_tables(self, tables: list):
+        """
+        並列スキャンで使い終わったテーブルを、以降のスキャンで再利用できるように戻す
+        """
+        with self._segment_tables_lock:
+            self._idle_segment_tables.extend(tables)
+
     def get_all_user_mappings(self) -> List[Dict[str, str]]:
         """
         すべてのユーザーマッピングを取得
         """
-        try:
-            response = self.table.scan()
-            return response.get('Items', [])
-        except ClientError as e:
-            print(f"Error getting all user mappings: {e}")
-            return []
+        return list(self.iter_all_user_mappings())
 
     def get_all_line_user_ids(self) -> List[str]:
         """
         すべてのLINE ユーザーIDを取得
         """
+        items = self._scan_items(
+            'Error getting all line user IDs',
+            ProjectionExpression='line_user_id'
+        )
+        return [item['line_user_id'] for item in items]
+
+    def get_profile_validators(self, note_username: str) -> Optional[Dict]:
+        """
+        note.comアカウントの前回の取得時の検証子（ETag・Last-Modified）とその時のフォロワー数を取得
+        保存されていない場合はNone
+        """
+        try:
+            response = self.account_table.get_item(
+                Key={'note_username': note_username},
+                ProjectionExpression=PROFILE_VALIDATORS_PROJECTION
+            )
+        except ClientError as e:
+            print(f"Error getting profile validators: {e}")
+            return None
+
+        return self._profile_validators_from_item(response.get('Item'))
+
+    def _profile_validators_from_item(self, item: Optional[Dict]) -> Optional[Dict]:
+        """
+        note.comアカウントの項目から、条件付きGETの検証子とその時のフォロワー数を取り出す
+        保存されていない場合はNone
+        """
+        if not item or 'request_url' not in item:
+            return None
+        return {
+            'request_url': item['request_url'],
+            'etag': item.get('etag'),
+            'last_modified': item.get('last_modified'),
+            'followers_count': int(item['followers_count']) if 'followers_count' in item else None
+        }
+
+    def get_follower_snapshot(self, note_username: str) -> Optional[Dict]:
+        """
+        note.comアカウントの最後に取得したフォロワー数と取得日時（UNIX時間）を取得
+        保存されていない場合はNone
+        """
         try:
-            response = self.table.scan(
-                ProjectionExpression='line_user_id'
+            response = self.account_table.get_item(
+                Key={'note_username': note_username},
+                ProjectionExpression=FOLLOWER_SNAPSHOT_PROJECTION
             )
-            return [item['line_user_id'] for item in response.get('Items', [])]
         except ClientError as e:
-            print(f"Error getting all line user IDs: {e}")
-            return []
\ No newline at end of file
+            print(f"Error getting follower snapshot: {e}")
+            return None
+
+        item = response.get('Item')
+        if not item or 'fetched_at' not in item or 'followers_count' not in item:
+            return None
+        return {
+            'followers_count': int(item['followers_count']),
+            'fetched_at': int(item['fetched_at'])
+        }
+
+    def save_follower_snapshot(self, note_username: str, followers_count: int, fetched_at: int,
+                               validators: Optional[Dict] = None) -> bool:
+        """
+        note.comアカウントのフォロワー数と取得日時を、その取得で得た条件付きGETの検証子とともに保存
+        """
+        set_clauses, remove_attributes, values = self._follower_snapshot_update(followers_count, fetched_at, validators)
+        try:
+            self.account_table.update_item(
+                Key={'note_username': note_username},
+                UpdateExpression=self._build_update_expression(set_clauses, remove_attributes),
+                ExpressionAttributeValues=values
+            )
+            return True
+        except ClientError as e:
+            print(f"Error saving follower snapshot: {e}")
+            return False
+
+    def _follower_snapshot_update(self, followers_count: int, fetched_at: int,
+                                  validators: Optional[Dict]) -> Tuple[List[str], List[str], Dict]:
+        """
+        フォロワー数のスナップショットと検証子を保存する更新式のSET句・REMOVEする属性・値を返す
+        検証子がない場合は以前の検証子を削除する（別の取得結果の検証子が残らないようにする）
+        expires_atはDynamoDBのTTL属性で、更新されなくなった項目はFOLLOWER_SNAPSHOT_TTL_SECONDS後に削除される
+        """
+        set_clauses = ['followers_count = :followers_count', 'fetched_at = :fetched_at', 'expires_at = :expires_at']
+        values = {
+            ':followers_count': followers_count,
+            ':fetched_at': fetched_at,
+            ':expires_at': fetched_at + FOLLOWER_SNAPSHOT_TTL_SECONDS
+        }
+        if not validators:
+            return set_clauses, ['request_url', 'etag', 'last_modified'], values
+
+        set_clauses += ['request_url = :request_url', 'etag = :etag', 'last_modified = :last_modified']
+        values.update({
+            ':request_url': validators['request_url'],
+            ':etag': validators.get('etag'),
+            ':last_modified': validators.get('last_modified')
+        })
+        return set_clauses, [], values
+
+    @staticmethod
+    def _build_update_expression(set_clauses: List[str], remove_attributes: List[str]) -> str:
+        """
+        SET句とREMOVEする属性から更新式を組み立てる
+        """
+        update_expression = 'SET ' + ', '.join(set_clauses)
+        if remove_attributes:
+            update_expression += ' REMOVE ' + ', '.join(remove_attributes)
+        return update_expression
+
+    def get_follower_record(self, note_username: str) -> Dict:
+        """
+        note.comアカウントのフォロワー数の履歴と増減の異常検知の状態、条件付きGETの検証子を、1回の読み込みで取得
+        戻り値は {'history': (取得日時の配列, フォロワー数の配列), 'anomaly_state': 異常検知の状態, 'validators': 検証子} の形式で、
+        履歴がない場合は空の配列、異常検知の状態・検証子がない場合はNone
+        """
+        try:
+            response = self.account_table.get_item(
+                Key={'note_username': note_username},
+                ProjectionExpression=FOLLOWER_HISTORY_PROJECTION
+            )
+        except ClientError as e:
+            print(f"Error getting follower history: {e}")
+            return {'history': self._decode_follower_history(None), 'anomaly_state': None, 'validators': None}
+
+        item = response.get('Item') or {}
+        anomaly_state = item.get('follower_anomaly')
+        return {
+            'history': self._decode_follower_history(item.get('follower_history')),
+            'anomaly_state': {
+                'mean': float(anomaly_state['mean']),
+                'variance': float(anomaly_state['variance']),
+                'samples': int(anomaly_state['samples'])
+            } if anomaly_state else None,
+            'validators': self._profile_validators_from_item(item)
+        }
+
+    def get_follower_history_arrays(self, note_username: str) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        note.comアカウントのフォロワー数の履歴を、古い順の取得日時（UNIX時間）とフォロワー数の配列（int64のNumPy配列）で取得
+        履歴がない場合は空の配列
+        """
+        return self.get_follower_record(note_username)['history']
+
+    def _decode_follower_history(self, history) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        保存されたフォロワー数の履歴の属性を、取得日時とフォロワー数の配列に復元する
+        """
+        import numpy as np
+        from app.history_codec import decode_history_arrays
+
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        if isinstance(history, Binary):
+            try:
+                return decode_history_arrays(history.value)
+            except ValueError as e:
+                print(f"Error decoding follower history: {e}")
+                return empty
+        if not history:
+            return empty
+
+        # 以前のリスト形式で保存された履歴
+        return (
+            np.array([int(entry['fetched_at']) for entry in history], dtype=np.int64),
+            np.array([int(entry['followers_count']) for entry in history], dtype=np.int64)
+        )
+
+    def get_follower_history(self, note_username: str) -> List[Dict]:
+        """
+        note.comアカウントのフォロワー数の履歴を古い順に取得
+        各要素は {'fetched_at': 取得日時（UNIX時間）, 'followers_count': フォロワー数} の形式
+        """
+        timestamps, counts = self.get_follower_history_arrays(note_username)
+        return [
+            {'fetched_at': fetched_at, 'followers_count': followers_count}
+            for fetched_at, followers_count in zip(timestamps.tolist(), counts.tolist())
+        ]
+
+    def append_follower_history(self, note_username: str, followers_count: int, fetched_at: int,
+                                history: Optional[Tuple['np.ndarray', 'np.ndarray']] = None,
+                                anomaly_state: Optional[Dict] = None, validators: Optional[Dict] = None) -> bool:
+        """
+        note.comアカウントのフォロワー数の履歴の末尾に1件追加
+        historyには直前にget_follower_recordで取得した履歴を渡す（省略した場合はここで取得する）
+        FOLLOWER_HISTORY_MAX_ENTRIESを超えた分は古いものから捨て、まとめた履歴を1回の更新で保存する
+        フォロワー数のスナップショットと検証子（save_follower_snapshotと同じもの）、
+        anomaly_stateを指定した場合は増減の異常検知の状態も同じ更新で保存する
+        履歴を読み込んだ後に他の実行が履歴を更新していた場合は、その履歴を上書きせずにFalseを返す
+        """
+        import numpy as np
+        from app.history_codec import encode_history_arrays
+
+        timestamps, counts = history if history is not None else self.get_follower_history_arrays(note_username)
+        previous_fetched_at = int(timestamps[-1]) if len(timestamps) else None
+        start = max(0, len(timestamps) - FOLLOWER_HISTORY_MAX_ENTRIES + 1)
+        timestamps = np.append(timestamps[start:], fetched_at)
+        counts = np.append(counts[start:], followers_count)
+
+        set_clauses, remove_attributes, values = self._follower_snapshot_update(followers_count, fetched_at, validators)
+        set_clauses += ['follower_history = :history', 'history_fetched_at = :fetched_at']
+        values[':history'] = Binary(encode_history_arrays(timestamps, counts))
+        if anomaly_state is not None:
+            # DynamoDBの数値型はfloatを受け付けないため、Decimalに変換して保存する
+            set_clauses.append('follower_anomaly = :anomaly')
+            values[':anomaly'] = {
+                'mean': Decimal(repr(float(anomaly_state['mean']))),
+                'variance': Decimal(repr(float(anomaly_state['variance']))),
+                'samples': int(anomaly_state['samples'])
+            }
+
+        # 読み込んだ時点の履歴の最後の取得日時（history_fetched_at）が変わっていない場合のみ更新する
+        # history_fetched_atがない項目は、まだ履歴がないか、history_fetched_atを保存する前の形式の履歴
+        condition_expression = 'attribute_not_exists(history_fetched_at)'
+        if previous_fetched_at is not None:
+            condition_expression += ' OR history_fetched_at = :previous_fetched_at'
+            values[':previous_fetched_at'] = previous_fetched_at
+
+        try:
+            self.account_table.update_item(
+                Key={'note_username': note_username},
+                UpdateExpression=self._build_update_expression(set_clauses, remove_attributes),
+                ConditionExpression=condition_expression,
+                ExpressionAttributeValues=values
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                print(f"Follower history of {note_username} was updated by another run. Skipping.")
+            else:
+                print(f"Error appending follower history: {e}")
+            return False
+
+    def save_scheduled_cursor(self, shard_index: int, shard_count: int, cursor: Dict) -> bool:
+        """
+        続きの呼び出しに失敗したスケジュール実行のカーソルを、次のスケジュール実行で再開できるように保存
+        同じシャードのカーソルが既にある場合は置き換える
+        """
+        try:
+            self.account_table.put_item(Item={
+                'note_username': f'{SCHEDULED_CURSOR_KEY_PREFIX}/{shard_index}/{shard_count}',
+                'cursor': json.dumps(cursor),
+                'expires_at': int(time.time()) + SCHEDULED_CURSOR_TTL_SECONDS
+            })
+            return True
+        except ClientError as e:
+            print(f"Error saving scheduled cursor: {e}")
+            return False
+
+    def pop_scheduled_cursor(self, shard_index: int, shard_count: int) -> Optional[Dict]:
+        """
+        保存されたスケジュール実行のカーソルを取り出して削除する（同時に取り出した実行のうち1つだけが受け取る）
+        保存されていない場合はNone
+        """
+        try:
+            response = self.account_table.delete_item(
+                Key={'note_username': f'{SCHEDULED_CURSOR_KEY_PREFIX}/{shard_index}/{shard_count}'},
+                ReturnValues='ALL_OLD'
+            )
+        except ClientError as e:
+            print(f"Error getting scheduled cursor: {e}")
+            return None
+
+        item = response.get('Attributes')
+        if not item or 'cursor' not in item:
+            return None
+        return json.loads(item['cursor'])
+
+    def _scan_items(self, error_message: str, exclusive_start_key: Optional[Dict[str, str]] = None,
+                    page_size: Optional[int] = None, table=None, **scan_kwargs) -> Iterator[Dict[str, str]]:
+        """
+        LastEvaluatedKeyがなくなるまでテーブルをスキャンし、項目を1件ずつ返す
+        ClientErrorが発生した場合はエラーを出力し、それまでに取得した項目で打ち切る
+        """
+        table = table or self.table
+        if exclusive_start_key:
+            scan_kwargs['ExclusiveStartKey'] = exclusive_start_key
+        if page_size:
+            scan_kwargs['Limit'] = page_size
+
+        while True:
+            try:
+                response = table.scan(**scan_kwargs)
+            except ClientError as e:
+                print(f"{error_message}: {e}")
+                return
+
+            yield from response.get('Items', [])
+
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                return
+            scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+def _marshal_value(value) -> Dict:
+    """
+    Pythonの値をDynamoDBの低レベルAPIの属性値（{'S': ...} など）に変換する
+    このアプリケーションで保存する型（文字列・数値・Binary・None・マップ）のみに対応し、文字列を最初に判定する
+    """
+    value_type = type(value)
+    if value_type is str:
+        return {'S': value}
+    if value_type is bool:
+        return {'BOOL': value}
+    if value_type is int or value_type is Decimal:
+        return {'N': str(value)}
+    if value is None:
+        return {'NULL': True}
+    if value_type is Binary:
+        return {'B': value.value}
+    if value_type is bytes:
+        return {'B': value}
+    if isinstance(value, dict):
+        return {'M': _marshal_item(value)}
+    if isinstance(value, (list, tuple)):
+        return {'L': [_marshal_value(element) for element in value]}
+    raise TypeError(f"Unsupported type for DynamoDB attribute: {value_type.__name__}")
+
+def _marshal_item(item: Dict) -> Dict:
+    """
+    項目（属性名と値の辞書）をDynamoDBの低レベルAPIの形式に変換する
+    """
+    return {name: _marshal_value(value) for name, value in item.items()}
+
+def _unmarshal_value(value: Dict):
+    """
+    DynamoDBの低レベルAPIの属性値をPythonの値に変換する
+    boto3のリソースと同じく、数値はDecimal、バイナリはBinaryとして返す
+    """
+    if 'S' in value:
+        return value['S']
+    (type_name, data), = value.items()
+    if type_name == 'N':
+        return Decimal(data)
+    if type_name == 'B':
+        return Binary(data)
+    if type_name == 'M':
+        return _unmarshal_item(data)
+    if type_name == 'NULL':
+        return None
+    if type_name == 'BOOL':
+        return data
+    if type_name == 'L':
+        return [_unmarshal_value(element) for element in data]
+    if type_name == 'SS':
+        return set(data)
+    if type_name == 'NS':
+        return {Decimal(element) for element in data}
+    if type_name == 'BS':
+        return {Binary(element) for element in data}
+    raise TypeError(f"Unsupported DynamoDB attribute type: {type_name}")
+
+def _unmarshal_item(item: Dict) -> Dict:
+    """
+    DynamoDBの低レベルAPIの形式の項目を、属性名と値の辞書に変換する
+    """
+    return {name: _unmarshal_value(value) for name, value in item.items()}
+
+class _ClientTable:
+    """
+    boto3のクライアントを、DynamoDBHandlerで使うboto3のリソースのTableと同じ呼び出し方で使えるようにするクラス
+    Item・Key・ExpressionAttributeValuesを変換してクライアントを呼び出し、結果の項目を変換して返す
+    """
+
+    def __init__(self, client, table_name: str):
+        self.client = client
+        self.table_name = table_name
+
+    def put_item(self, Item: Dict, **kwargs) -> Dict:
+        return self._call(self.client.put_item, Item=_marshal_item(Item), **kwargs)
+
+    def get_item(self, Key: Dict, **kwargs) -> Dict:
+        return self._call(self.client.get_item, Key=_marshal_item(Key), **kwargs)
+
+    def update_item(self, Key: Dict, **kwargs) -> Dict:
+        return self._call(self.client.update_item, Key=_marshal_item(Key), **kwargs)
+
+    def delete_item(self, Key: Dict, **kwargs) -> Dict:
+        return self._call(self.client.delete_item, Key=_marshal_item(Key), **kwargs)
+
+    def query(self, **kwargs) -> Dict:
+        return self._call(self.client.query, **kwargs)
+
+    def scan(self, **kwargs) -> Dict:
+        if 'ExclusiveStartKey' in kwargs:
+            kwargs['ExclusiveStartKey'] = _marshal_item(kwargs['ExclusiveStartKey'])
+        return self._call(self.client.scan, **kwargs)
+
+    def _call(self, operation, **kwargs) -> Dict:
+        if 'ExpressionAttributeValues' in kwargs:
+            kwargs['ExpressionAttributeValues'] = _marshal_item(kwargs['ExpressionAttributeValues'])
+        response = operation(TableName=self.table_name, **kwargs)
+
+        if 'Items' in response:
+            response['Items'] = [_unmarshal_item(item) for item in response['Items']]
+        for name in ('Item', 'Attributes', 'LastEvaluatedKey'):
+            if name in response:
+                response[name] = _unmarshal_item(response[name])
+        return response
+
+class DynamoDBClientHandler(DynamoDBHandler):
+    """
+    boto3のリソースの代わりにクライアント（boto3.client('dynamodb')）を使うDynamoDBHandler
+    リソースの作成と項目ごとの型変換を省くため、コールドスタートと大量の項目のスキャンが速い
+    メソッドと戻り値はDynamoDBHandlerと同じ
+    """
+
+    def __init__(self):
+        self._client = boto3.client('dynamodb')
+        super().__init__()
+
+    def _connect(self) -> threading.local:
+        """
+        boto3のクライアントはスレッド間で共有できるため、全スレッドで同じクライアントを使う
+        """
+        self._local.dynamodb = self._client
+        self._local.table = _ClientTable(self._client, self.table_name)
+        self._local.account_table = _ClientTable(self._client, self.account_table_name)
+        return self._local
+
+    def _acquire_segment_tables(self, total_segments: int) -> list:
+        """
+        boto3のクライアントはスレッド間で共有できるため、全セグメントで同じテーブルを使う
+        """
+        return [self.table] * total_segments
+
+    def _release_segment_tables(self, tables: list):
+        """
+        共有しているテーブルのため、戻す必要はない
+        """
+
+def create_db_handler() -> DynamoDBHandler:
+    """
+    環境変数DYNAMODB_BACKENDで選択したDynamoDBHandlerを作成する（デフォルトはresource）
+    """
+    backend = os.environ.get('DYNAMODB_BACKEND') or 'resource'
+    if backend == 'client':
+        return DynamoDBClientHandler()
+    if backend != 'resource':
+        print(f"Invalid DYNAMODB_BACKEND value: {backend}")
+    return DynamoDBHandler()
+
+# プロセス全体で共有するDynamoDBHandler（get_db_handlerの初回の呼び出し時に作成する）
+_db_handler = None
+_db_handler_lock = threading.Lock()
+
+def get_db_handler() -> DynamoDBHandler:
+    """
+    プロセス全体で共有するDynamoDBHandlerを返す（初回の呼び出し時に作成する）
+    モジュールの変数として保持するため、Lambdaのウォームスタート間でもboto3のリソースの作成を省ける
+    複数のスレッドから同時に呼び出しても、作成されるのは1つだけ
+    boto3のリソースはハンドラーの中でスレッドごとに作成されるため、返したハンドラーは複数のスレッドから使ってよい
+    """
+    global _db_handler
+    handler = _db_handler
+    if handler is not None:
+        return handler
+
+    with _db_handler_lock:
+        if _db_handler is None:
+            _db_handler = create_db_handler()
+        return _db_handler
+
+def set_db_handler(handler: Optional[DynamoDBHandler]):
+    """
+    get_db_handlerが返すハンドラーを差し替える（テストなどで使用する）
+    Noneの場合は、次のget_db_handlerの呼び出し時に作成し直す
+    """
+    global _db_handler
+    with _db_handler_lock:
+        _db_handler = handler
@@ -0,0 +1,136 @@
+import struct
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# 形式のバージョン
+HISTORY_FORMAT_VERSION = 1
+
+# フラグ：ペイロードをzlibで圧縮している
+FLAG_ZLIB = 0x01
+
+# ヘッダー：バージョン、フラグ、時刻の配列の型コード、フォロワー数の配列の型コード、
+#           最初の取得日時、最初のフォロワー数、取得間隔、件数
+HISTORY_HEADER = struct.Struct('<BBccqqII')
+
+# 値の範囲に応じて使う配列の型コード（小さいものから順に試す）とリトルエンディアンの型
+_TYPECODE_DTYPES = {'b': np.dtype('<i1'), 'h': np.dtype('<i2'), 'i': np.dtype('<i4'), 'q': np.dtype('<i8')}
+
+def _pack_integers(values: np.ndarray) -> Tuple[bytes, bytes]:
+    """
+    整数の配列を、すべての値が収まる最も小さい型のリトルエンディアンのバイト列にする
+    戻り値は (型コード, バイト列)
+    """
+    low = int(values.min()) if values.size else 0
+    high = int(values.max()) if values.size else 0
+    for typecode, dtype in _TYPECODE_DTYPES.items():
+        limits = np.iinfo(dtype)
+        if limits.min <= low and high <= limits.max:
+            return typecode.encode(), values.astype(dtype).tobytes()
+    raise ValueError('history value is out of range')
+
+def encode_history_arrays(timestamps: Sequence[int], counts: Sequence[int], compress: bool = True) -> bytes:
+    """
+    フォロワー数の履歴（古い順の取得日時とフォロワー数の配列）をバイト列にまとめる
+    - 取得日時は最初の値と取得間隔（間隔の中央値）をヘッダーに持ち、各取得の間隔とのずれだけを保存する
+    - フォロワー数は最初の値をヘッダーに持ち、前の値との差分だけを保存する
+    どちらも値が収まる最も小さい整数型の配列に詰め、compressがTrueで小さくなる場合はzlibで圧縮する
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if timestamps.shape != counts.shape or timestamps.ndim != 1:
+        raise ValueError('timestamps and counts must be one-dimensional arrays of the same length')
+
+    gaps = np.diff(timestamps)
+    interval = 0
+    if gaps.size:
+        # 偶数個の場合は小さい方の中央値を使い、取得間隔を整数に保つ
+        middle = (gaps.size - 1) // 2
+        interval = max(0, int(np.partition(gaps, middle)[middle]))
+
+    timestamp_typecode, timestamp_deltas = _pack_integers(gaps - interval)
+    count_typecode, count_deltas = _pack_integers(np.diff(counts))
+    payload = timestamp_deltas + count_deltas
+
+    flags = 0
+    if compress:
+        compressed = zlib.compress(payload)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_ZLIB
+
+    header = HISTORY_HEADER.pack(
+        HISTORY_FORMAT_VERSION, flags, timestamp_typecode, count_typecode,
+        int(timestamps[0]) if timestamps.size else 0, int(counts[0]) if counts.size else 0,
+        interval, int(timestamps.size)
+    )
+    return header + payload
+
+def encode_history(history: List[Dict], compress: bool = True) -> bytes:
+    """
+    フォロワー数の履歴（古い順の {'fetched_at', 'followers_count'} のリスト）をバイト列にまとめる
+    """
+    return encode_history_arrays(
+        [entry['fetched_at'] for entry in history],
+        [entry['followers_count'] for entry in history],
+        compress
+    )
+
+def decode_history_arrays(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    encode_history_arraysでまとめたバイト列から、取得日時とフォロワー数の配列（int64のNumPy配列）を復元する
+    差分の復元はNumPyでまとめて行い、Pythonのループは使わない
+    形式が不正な場合はValueErrorを送出する
+    """
+    data = bytes(data)
+    if len(data) < HISTORY_HEADER.size:
+        raise ValueError('history data is too short')
+
+    version, flags, timestamp_typecode, count_typecode, first_timestamp, first_count, interval, length = \
+        HISTORY_HEADER.unpack_from(data)
+    if version != HISTORY_FORMAT_VERSION:
+        raise ValueError(f'unsupported history format version: {version}')
+
+    timestamp_dtype = _TYPECODE_DTYPES.get(timestamp_typecode.decode('latin-1'))
+    count_dtype = _TYPECODE_DTYPES.get(count_typecode.decode('latin-1'))
+    if timestamp_dtype is None or count_dtype is None:
+        raise ValueError('invalid history typecode')
+
+    payload = data[HISTORY_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error as e:
+            raise ValueError(f'invalid compressed history: {e}') from e
+
+    delta_count = max(0, length - 1)
+    timestamp_size = delta_count * timestamp_dtype.itemsize
+    if len(payload) != timestamp_size + delta_count * count_dtype.itemsize:
+        raise ValueError('history payload size does not match its header')
+
+    if length == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    timestamps = np.empty(length, dtype=np.int64)
+    timestamps[0] = first_timestamp
+    timestamps[1:] = np.frombuffer(payload, dtype=timestamp_dtype, count=delta_count)
+    timestamps[1:] += interval
+    np.cumsum(timestamps, out=timestamps)
+
+    counts = np.empty(length, dtype=np.int64)
+    counts[0] = first_count
+    counts[1:] = np.frombuffer(payload, dtype=count_dtype, count=delta_count, offset=timestamp_size)
+    np.cumsum(counts, out=counts)
+    return timestamps, counts
+
+def decode_history(data: bytes) -> List[Dict]:
+    """
+    encode_historyでまとめたバイト列から、フォロワー数の履歴を復元する
+    形式が不正な場合はValueErrorを送出する
+    """
+    timestamps, counts = decode_history_arrays(data)
+    return [
+        {'fetched_at': fetched_at, 'followers_count': followers_count}
+        for fetched_at, followers_count in zip(timestamps.tolist(), counts.tolist())
+    ]
@@ -0,0 +1,41 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 接続プールの最小サイズ（スケジュール実行の同時実行数がこれより大きい場合はそちらに合わせる）
+DEFAULT_HTTP_POOL_SIZE = 10
+
+def get_pool_size(name: str) -> int:
+    """
+    環境変数nameから接続プールのサイズを取得する
+    未設定または不正な値の場合は、SCHEDULED_MAX_WORKERSとDEFAULT_HTTP_POOL_SIZEの大きい方を使う
+    （取得と送信は同じワーカーで行うため、同時接続数はワーカー数を超えない）
+    """
+    default = DEFAULT_HTTP_POOL_SIZE
+    try:
+        default = max(default, int(os.environ.get('SCHEDULED_MAX_WORKERS') or 0))
+    except ValueError:
+        pass
+
+    value = os.environ.get(name)
+    if not value:
+        return default
+
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"Invalid {name} value: {value}")
+        return default
+
+def create_session(pool_size: int) -> requests.Session:
+    """
+    keep-aliveの接続をpool_size本まで保持するセッションを作成する
+    モジュールの変数として保持すると、Lambdaのウォームスタート間でも接続が再利用される
+    リトライはRetryPolicyで行うため、アダプター側ではリトライしない
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
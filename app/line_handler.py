@@ -4,6 +4,10 @@ import hmac
 import hashlib
 import base64
 import json
+import uuid
+from typing import List
+from app import http_session
+from app.retry import RetryPolicy
 
 # 環境変数からLINEの認証情報を取得
 def get_line_credentials():
@@ -18,6 +22,20 @@ def get_line_credentials():
 LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET = get_line_credentials()
 
 LINE_REPLY_API_URL = "https://api.line.me/v2/bot/message/reply"
+LINE_PUSH_API_URL = "https://api.line.me/v2/bot/message/push"
+LINE_MULTICAST_API_URL = "https://api.line.me/v2/bot/message/multicast"
+
+# マルチキャスト1回あたりの最大送信先数（LINE Messaging APIの上限）
+LINE_MULTICAST_MAX_RECIPIENTS = 500
+
+# api.line.meへの接続を使い回すセッション（接続プールのサイズはLINE_HTTP_POOL_SIZEで変更できる）
+LINE_SESSION = http_session.create_session(http_session.get_pool_size('LINE_HTTP_POOL_SIZE'))
+
+# プッシュ・マルチキャストのリトライポリシー（返信はreplyTokenが1回限りのためリトライしない）
+LINE_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=5.0)
+
+# LINE Messaging APIへのリクエストのタイムアウト（秒）
+LINE_API_TIMEOUT_SECONDS = 5
 
 def validate_signature(body: str, signature: str, channel_secret: str) -> bool:
     """
@@ -54,21 +72,39 @@ def reply_message(reply_token: str, text: str):
 
     try:
         # ペイロードをUTF-8でエンコードして送信
-        response = requests.post(LINE_REPLY_API_URL, headers=headers, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'), timeout=5)
+        response = LINE_SESSION.post(LINE_REPLY_API_URL, headers=headers, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'), timeout=LINE_API_TIMEOUT_SECONDS)
         response.raise_for_status()
         print(f"LINE reply API response: {response.status_code} {response.text}")
     except requests.exceptions.RequestException as e:
         print(f"Error replying to LINE: {e}")
 
-def send_push_message(target_id: str, text: str):
+def post_with_retry(url: str, headers: dict, payload: dict) -> requests.Response:
+    """
+    LINE Messaging APIにリトライキーを付けてPOSTし、必要に応じてリトライする
+    同じリトライキーのリクエストが既に受け付けられていた場合（409）は成功として扱うため、
+    リトライによって同じメッセージが二重に送信されることはない
+    """
+    headers = dict(headers)
+    headers['X-Line-Retry-Key'] = str(uuid.uuid4())
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    response = LINE_RETRY_POLICY.call(lambda: LINE_SESSION.post(url, headers=headers, data=data, timeout=LINE_API_TIMEOUT_SECONDS))
+    if response.status_code == 409 and response.headers.get('X-Line-Accepted-Request-Id'):
+        return response
+
+    response.raise_for_status()
+    return response
+
+def send_push_message(target_id: str, text: str) -> bool:
     """
     LINE Messaging APIを使ってプッシュメッセージを送信する。
+    送信に成功した場合はTrueを返す。
     """
     access_token = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
 
     if not access_token:
         print("LINE Channel Access Token is not configured.")
-        return
+        return False
 
     headers = {
         'Content-Type': 'application/json',
@@ -84,14 +120,52 @@ def send_push_message(target_id: str, text: str):
         ]
     }
 
-    push_url = "https://api.line.me/v2/bot/message/push"
-
     try:
-        response = requests.post(push_url, headers=headers, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'), timeout=5)
-        response.raise_for_status()
+        response = post_with_retry(LINE_PUSH_API_URL, headers, payload)
         print(f"LINE push API response: {response.status_code} {response.text}")
+        return True
     except requests.exceptions.RequestException as e:
         print(f"Error sending push message to LINE: {e}")
+        return False
+
+def send_multicast_message(target_ids: List[str], text: str) -> int:
+    """
+    LINE Messaging APIを使って同じメッセージを複数のユーザーに送信する。
+    送信先はLINE_MULTICAST_MAX_RECIPIENTS件ごとに分割してマルチキャストで送信し、
+    送信に成功した送信先の数を返す。
+    """
+    access_token = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
+
+    if not access_token:
+        print("LINE Channel Access Token is not configured.")
+        return 0
+
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {access_token}'
+    }
+
+    sent_count = 0
+    for i in range(0, len(target_ids), LINE_MULTICAST_MAX_RECIPIENTS):
+        chunk = target_ids[i:i + LINE_MULTICAST_MAX_RECIPIENTS]
+        payload = {
+            'to': chunk,
+            'messages': [
+                {
+                    'type': 'text',
+                    'text': text
+                }
+            ]
+        }
+
+        try:
+            response = post_with_retry(LINE_MULTICAST_API_URL, headers, payload)
+            print(f"LINE multicast API response: {response.status_code} {response.text} ({len(chunk)} recipients)")
+            sent_count += len(chunk)
+        except requests.exceptions.RequestException as e:
+            print(f"Error sending multicast message to LINE ({len(chunk)} recipients): {e}")
+
+    return sent_count
 
 def handle_line_event(event_body: str, signature: str, response_function):
     """
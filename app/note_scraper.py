@@ -1,7 +1,529 @@
+import json
 import os
 import requests
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Tuple
+from urllib.parse import quote, urlparse
+from app import http_session, validator
+from app.anomaly import update_anomaly_state, revert_anomaly_state, is_anomalous
+from app.cache import TTLCache
+from app.circuit_breaker import CircuitBreaker
+from app.rate_limiter import TokenBucket
+from app.retry import RetryPolicy
+from app.single_flight import SingleFlight
+
+# NumPyの読み込みには時間がかかるため、Webhookの処理（オンデマンド取得）では読み込まず、
+# スケジュール実行で履歴を扱う関数の中で読み込む
+if TYPE_CHECKING:
+    import numpy as np
+
+def create_note_rate_limiter() -> Optional[TokenBucket]:
+    """
+    環境変数からnote.comへのリクエスト用のレートリミッターを作成する
+    NOTE_REQUESTS_PER_SECONDが設定されていない場合は制限しない（Noneを返す）
+    """
+    rate = os.environ.get('NOTE_REQUESTS_PER_SECOND')
+    if not rate:
+        return None
+
+    try:
+        rate = float(rate)
+        burst = int(os.environ.get('NOTE_REQUEST_BURST') or max(1, int(rate)))
+        return TokenBucket(rate, burst)
+    except ValueError as e:
+        print(f"Invalid note.com rate limit settings: {e}")
+        return None
+
+# note.comへの全てのリクエスト（定期実行・オンデマンド取得）で共有するレートリミッター
+NOTE_RATE_LIMITER = create_note_rate_limiter()
+
+def create_note_dashboard_cache() -> Optional[TTLCache]:
+    """
+    環境変数からオンデマンド取得用のキャッシュを作成する
+    NOTE_CACHE_TTL_SECONDSが0の場合はキャッシュしない（Noneを返す）
+    """
+    try:
+        ttl = float(os.environ.get('NOTE_CACHE_TTL_SECONDS') or DEFAULT_NOTE_CACHE_TTL_SECONDS)
+        max_entries = int(os.environ.get('NOTE_CACHE_MAX_ENTRIES') or DEFAULT_NOTE_CACHE_MAX_ENTRIES)
+    except ValueError as e:
+        print(f"Invalid note.com cache settings: {e}")
+        return None
+
+    if ttl <= 0 or max_entries < 1:
+        return None
+    return TTLCache(max_entries, ttl)
+
+# オンデマンド取得用のキャッシュの有効期限（秒）と件数の上限のデフォルト値
+DEFAULT_NOTE_CACHE_TTL_SECONDS = 300
+DEFAULT_NOTE_CACHE_MAX_ENTRIES = 1000
+
+# オンデマンド取得で同じアカウントへの問い合わせが続いたときに使うキャッシュ（note.comユーザー名ごと）
+NOTE_DASHBOARD_CACHE = create_note_dashboard_cache()
+
+# note.comへの接続を使い回すセッション（接続プールのサイズはNOTE_HTTP_POOL_SIZEで変更できる）
+NOTE_SESSION = http_session.create_session(http_session.get_pool_size('NOTE_HTTP_POOL_SIZE'))
+
+# note.comへのリクエストのリトライポリシー
+NOTE_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=5.0)
+
+# note.comのクリエイター情報のAPI（リトライしない）とプロフィールページへのリクエストのタイムアウト（秒）
+NOTE_API_TIMEOUT_SECONDS = 5
+NOTE_PROFILE_TIMEOUT_SECONDS = 20
+
+# note.comの障害時に、タイムアウトを待たずに失敗させるためのサーキットブレーカー
+NOTE_CIRCUIT_BREAKER = CircuitBreaker(failure_rate_threshold=0.5, slow_call_seconds=10.0,
+                                      window_size=20, minimum_calls=5, open_duration=60.0)
+
+# 同じURLへの同時の取得を1回のリクエストにまとめる（スレッド・asyncioの両方から使われる）
+NOTE_SINGLE_FLIGHT = SingleFlight()
+
+# note.com側の障害とみなすHTTPステータスコード（404などはアカウント側の問題のため含めない）
+NOTE_OUTAGE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# サーキットブレーカーが開いている間に返す、最後に取得できた情報（URLごと）
+LAST_KNOWN_MAX_ENTRIES = 10000
+_last_known_dashboard_info = {}
+_last_known_lock = threading.Lock()
+
+# 条件付きGETの検証子（プロフィールページのURLごと）。ウォームスタート間ではメモリ上のものを使う
+_profile_validators = {}
+_profile_validators_lock = threading.Lock()
+
+# 取得したフォロワー数（スナップショット）と検証子を、全てのコンテナと以降の実行で共有するストア
+# Lambdaのハンドラーでset_note_account_storeにより設定する（DynamoDBHandler）
+NOTE_ACCOUNT_STORE = None
+
+# オンデマンド取得で、ストアのスナップショットをそのまま使う経過時間の上限（秒）
+DEFAULT_NOTE_SNAPSHOT_MAX_AGE_SECONDS = 600
+
+# 前日比の基準とする経過時間と、スケジュール実行の時刻のずれとして許容する幅（秒）
+FOLLOWER_CHANGE_DAY_SECONDS = 24 * 60 * 60
+FOLLOWER_CHANGE_TOLERANCE_SECONDS = 60 * 60
+
+# オンデマンド取得で古い値を返した後に、裏で取得し直すためのスレッドプール（取得中のものはアカウントごとに1つ）
+NOTE_REVALIDATION_MAX_WORKERS = 4
+_revalidation_executor = ThreadPoolExecutor(max_workers=NOTE_REVALIDATION_MAX_WORKERS)
+_revalidations = {}
+_revalidations_lock = threading.Lock()
+# 通知（LINEのプッシュなど）まで終わっていない取得し直し。wait_for_revalidationsはこれを待つ
+_revalidation_futures = set()
+
+NOTE_REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# クリエイター情報のJSON APIのベースURL（テストではローカルのサーバーに向けられる）
+NOTE_API_BASE_URL = os.environ.get('NOTE_API_BASE_URL') or 'https://note.com/api/v2'
+
+# JSON APIの応答として受け付けるサイズの上限
+NOTE_API_MAX_BYTES = 256 * 1024
+
+# プロフィールページを読み込む単位と、読み込むサイズの上限
+NOTE_PROFILE_CHUNK_SIZE = 16 * 1024
+NOTE_PROFILE_MAX_BYTES = 5 * 1024 * 1024
+
+# フォロワー数は生のHTMLから'\"followerCount\" :'の後に続く数値を取得する
+FOLLOWER_COUNT_MARKER = b'followerCount'
+FOLLOWER_COUNT_PATTERN = re.compile(rb'\\"followerCount\\"\s*:\s*(\d+)')
+
+# チャンクの境目で分かれた'followerCount'を見つけるために、前のチャンクの末尾を残す長さ
+FOLLOWER_COUNT_OVERLAP_BYTES = 64
+
+class ProfileTooLargeError(Exception):
+    """
+    プロフィールページがNOTE_PROFILE_MAX_BYTESを超えた場合に送出する例外
+    """
+
+def scan_follower_count(chunks: Iterable[bytes], max_bytes: int = NOTE_PROFILE_MAX_BYTES) -> Tuple[bool, Optional[int]]:
+    """
+    HTMLのチャンクを順に読み、フォロワー数が見つかった時点で読み込みをやめる
+    ('followerCount'が含まれていたか, フォロワー数)を返す。フォロワー数の形式が一致しない場合はNone
+    読み込んだサイズがmax_bytesを超えた場合はProfileTooLargeErrorを送出する
+    """
+    tail = b''
+    total_bytes = 0
+    marker_found = False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        total_bytes += len(chunk)
+        if total_bytes > max_bytes:
+            raise ProfileTooLargeError(f'profile page exceeds {max_bytes} bytes')
+
+        buffer = tail + chunk
+        marker_found = marker_found or FOLLOWER_COUNT_MARKER in buffer
+        match = FOLLOWER_COUNT_PATTERN.search(buffer)
+        if match and match.end() < len(buffer):
+            return True, int(match.group(1))
+
+        if match:
+            # 数値が次のチャンクに続いている可能性があるため、一致した位置から残す
+            tail = buffer[match.start():]
+        else:
+            tail = buffer[-FOLLOWER_COUNT_OVERLAP_BYTES:]
+
+    match = FOLLOWER_COUNT_PATTERN.search(tail)
+    if match:
+        return True, int(match.group(1))
+    return marker_found, None
+
+def get_note_username_from_url(note_url: str) -> Optional[str]:
+    """
+    プロフィールページのURL（https://note.com/ユーザー名）からユーザー名を取り出す
+    プロフィールページのURLでない場合はNoneを返す
+    """
+    path = urlparse(note_url).path.strip('/')
+    if not path or '/' in path:
+        return None
+    return path
+
+def get_creator_api_url(note_url: str) -> Optional[str]:
+    """
+    プロフィールページのURLから、クリエイター情報のJSON APIのURLを作成する
+    ユーザー名が取り出せない場合はNoneを返す
+    """
+    note_username = get_note_username_from_url(note_url)
+    if note_username is None:
+        return None
+    return f"{NOTE_API_BASE_URL.rstrip('/')}/creators/{quote(note_username)}"
+
+def set_note_account_store(store):
+    """
+    フォロワー数のスナップショットと条件付きGETの検証子を保持するストアを設定する
+    storeはget_profile_validators・get_follower_snapshot・save_follower_snapshotを持つもの
+    （DynamoDBHandler）で、Noneの場合はこのプロセスのメモリ上にのみ保持する
+    """
+    global NOTE_ACCOUNT_STORE
+    NOTE_ACCOUNT_STORE = store
+
+def get_profile_validators(note_url: str) -> Optional[dict]:
+    """
+    前回の取得時の検証子（ETag・Last-Modified）とその時のフォロワー数を返す
+    メモリ上になければストアから読み込む。どちらにもない場合はNone
+    """
+    with _profile_validators_lock:
+        validators = _profile_validators.get(note_url)
+    if validators is not None:
+        return validators
+
+    note_username = get_note_username_from_url(note_url)
+    store = NOTE_ACCOUNT_STORE
+    if store is None or note_username is None:
+        return None
+
+    validators = store.get_profile_validators(note_username.lower())
+    if not isinstance(validators, dict):
+        return None
+    with _profile_validators_lock:
+        _profile_validators[note_url] = validators
+    return validators
+
+def remember_profile_validators(note_url: str, request_url: str, response: requests.Response, followers_count: int):
+    """
+    応答の検証子とフォロワー数を、次回の条件付きGETのために保持する
+    検証子のない応答の場合は、以前の検証子を捨てる（ストアへの保存はsave_follower_snapshotで行う）
+    """
+    validators = {
+        'request_url': request_url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'followers_count': followers_count
+    }
+
+    with _profile_validators_lock:
+        _profile_validators.pop(note_url, None)
+        if not validators['etag'] and not validators['last_modified']:
+            return
+        if len(_profile_validators) >= LAST_KNOWN_MAX_ENTRIES:
+            _profile_validators.pop(next(iter(_profile_validators)))
+        _profile_validators[note_url] = validators
+
+def save_follower_snapshot(note_url: str, followers_count: int):
+    """
+    取得したフォロワー数を、その取得で得た検証子とともにストアに保存する
+    """
+    note_username = get_note_username_from_url(note_url)
+    store = NOTE_ACCOUNT_STORE
+    if store is None or note_username is None:
+        return
+
+    store.save_follower_snapshot(note_username.lower(), followers_count, int(time.time()),
+                                 get_snapshot_validators(note_url, followers_count))
+
+def get_snapshot_validators(note_url: str, followers_count: int) -> Optional[dict]:
+    """
+    フォロワー数とともにストアに保存する検証子を返す
+    メモリ上の検証子が別の取得結果（フォロワー数が異なる）のものの場合はNone
+    """
+    with _profile_validators_lock:
+        validators = _profile_validators.get(note_url)
+    if validators is not None and validators.get('followers_count') != followers_count:
+        return None
+    return validators
+
+def remember_stored_profile_validators(note_url: str, validators: Optional[dict]):
+    """
+    ストアから読み込んだ検証子を、メモリ上に検証子がない場合に保持する
+    """
+    if not isinstance(validators, dict):
+        return
+    with _profile_validators_lock:
+        if note_url in _profile_validators:
+            return
+        if len(_profile_validators) >= LAST_KNOWN_MAX_ENTRIES:
+            _profile_validators.pop(next(iter(_profile_validators)))
+        _profile_validators[note_url] = validators
+
+def get_follower_snapshot_info(note_url: str, max_age: Optional[float] = None) -> Optional[dict]:
+    """
+    ストアに保存されたフォロワー数のスナップショットを、取得結果と同じ形式で返す
+    max_ageを指定した場合は、それより古いスナップショットは使わない。使えるものがない場合はNone
+    """
+    note_username = get_note_username_from_url(note_url)
+    store = NOTE_ACCOUNT_STORE
+    if store is None or note_username is None:
+        return None
+
+    snapshot = store.get_follower_snapshot(note_username.lower())
+    if not isinstance(snapshot, dict):
+        return None
+    if max_age is not None and time.time() - snapshot['fetched_at'] > max_age:
+        return None
+
+    return {
+        'followers_count': snapshot['followers_count'],
+        'url': note_url,
+        'last_updated': datetime.fromtimestamp(snapshot['fetched_at']).strftime('%Y-%m-%d %H:%M:%S'),
+        'fetched_at': snapshot['fetched_at']
+    }
+
+def get_note_snapshot_max_age() -> float:
+    """
+    環境変数NOTE_SNAPSHOT_MAX_AGE_SECONDSから、オンデマンド取得でスナップショットを使う経過時間の上限を取得する
+    """
+    try:
+        return float(os.environ.get('NOTE_SNAPSHOT_MAX_AGE_SECONDS') or DEFAULT_NOTE_SNAPSHOT_MAX_AGE_SECONDS)
+    except ValueError:
+        print(f"Invalid NOTE_SNAPSHOT_MAX_AGE_SECONDS value: {os.environ.get('NOTE_SNAPSHOT_MAX_AGE_SECONDS')}")
+        return DEFAULT_NOTE_SNAPSHOT_MAX_AGE_SECONDS
+
+def summarize_follower_changes(timestamps: 'np.ndarray', counts: 'np.ndarray', followers_count: int, now: int) -> dict:
+    """
+    フォロワー数の履歴（古い順の取得日時とフォロワー数の配列）から、前回の取得と約1日前の取得からの増減を求める
+    比較できる履歴がない場合はNone
+    """
+    import numpy as np
+
+    previous_count = int(counts[-1]) if len(counts) else None
+
+    cutoff = now - FOLLOWER_CHANGE_DAY_SECONDS + FOLLOWER_CHANGE_TOLERANCE_SECONDS
+    index = int(np.searchsorted(timestamps, cutoff, side='right')) - 1
+    day_ago_count = int(counts[index]) if index >= 0 else None
+
+    return {
+        'previous_followers_count': previous_count,
+        'followers_change': None if previous_count is None else followers_count - previous_count,
+        'daily_followers_change': None if day_ago_count is None else followers_count - day_ago_count
+    }
+
+def record_follower_history(dashboard_info: dict, record: Optional[dict] = None) -> dict:
+    """
+    取得したフォロワー数をストアの履歴に追加し、前回・前日からの増減と履歴全体の傾向（trend）、
+    前回からの増減がいつもと比べて急かどうか（anomaly_score・anomaly）を加えた情報を返す
+    急な増減の判定はストアに保存した増減の指数移動平均・分散（app.anomaly）で行い、履歴は走査しない
+    recordには取得前にstore.get_follower_recordで読み込んだ項目を渡す（省略した場合はここで読み込む）
+    履歴の追加ではフォロワー数のスナップショットと検証子も同じ更新で保存するため、
+    ストアへの読み込みと更新はアカウントごとに1回ずつで、取得に失敗した情報や最後に取得できた値（stale）は記録しない
+    """
+    if 'error' in dashboard_info or dashboard_info.get('stale'):
+        return dashboard_info
+
+    note_username = get_note_username_from_url(dashboard_info.get('url', ''))
+    store = NOTE_ACCOUNT_STORE
+    if store is None or note_username is None:
+        return dashboard_info
+
+    import numpy as np
+    from app.trends import analyze_follower_trend
+
+    note_username = note_username.lower()
+    if record is None:
+        record = store.get_follower_record(note_username)
+    if not isinstance(record, dict):
+        record = {'history': (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)), 'anomaly_state': None}
+    history = record['history']
+    timestamps, counts = history
+
+    followers_count = dashboard_info['followers_count']
+    fetched_at = int(dashboard_info.get('fetched_at') or time.time())
+    changes = summarize_follower_changes(timestamps, counts, followers_count, fetched_at)
+
+    anomaly_state = record['anomaly_state']
+    anomaly_score = None
+    if changes['followers_change'] is not None:
+        anomaly_state, anomaly_score = update_anomaly_state(anomaly_state, changes['followers_change'])
+    store.append_follower_history(note_username, followers_count, fetched_at, history, anomaly_state,
+                                  get_snapshot_validators(dashboard_info['url'], followers_count))
+
+    trend = analyze_follower_trend(np.append(timestamps, fetched_at), np.append(counts, followers_count))
+    anomaly = is_anomalous(anomaly_score, changes['followers_change'], followers_count)
+    return dict(dashboard_info, trend=trend, anomaly_score=anomaly_score, anomaly=anomaly,
+                **changes)
+
+def get_recorded_follower_history(note_url: str, record: dict, run_started_at: int) -> Optional[dict]:
+    """
+    run_started_at以降に（同じスケジュール実行で中断する前に）履歴に記録済みのアカウントの場合は、
+    記録した最後の値から、record_follower_historyと同じ形式の情報を返す
+    履歴と異常検知の状態は更新せず、記録したときと同じ増減・傾向・Zスコアを返す。記録していない場合はNone
+    """
+    timestamps, counts = record['history']
+    if not len(timestamps) or int(timestamps[-1]) < run_started_at:
+        return None
+
+    from app.trends import analyze_follower_trend
+
+    fetched_at = int(timestamps[-1])
+    followers_count = int(counts[-1])
+    changes = summarize_follower_changes(timestamps[:-1], counts[:-1], followers_count, fetched_at)
+
+    anomaly_score = None
+    if changes['followers_change'] is not None:
+        # 記録したときの増減は状態に取り込み済みのため、取り込む前の状態に戻してZスコアを求める
+        previous_state = revert_anomaly_state(record['anomaly_state'], changes['followers_change'])
+        _, anomaly_score = update_anomaly_state(previous_state, changes['followers_change'])
+
+    dashboard_info = {
+        'followers_count': followers_count,
+        'url': note_url,
+        'last_updated': datetime.fromtimestamp(fetched_at).strftime('%Y-%m-%d %H:%M:%S'),
+        'fetched_at': fetched_at
+    }
+    trend = analyze_follower_trend(timestamps, counts)
+    anomaly = is_anomalous(anomaly_score, changes['followers_change'], followers_count)
+    return dict(dashboard_info, trend=trend, anomaly_score=anomaly_score, anomaly=anomaly, **changes)
+
+def build_conditional_headers(validators: Optional[dict], request_url: str) -> dict:
+    """
+    同じURLに対する前回の検証子があれば、If-None-Match・If-Modified-Sinceを付けたヘッダーを返す
+    """
+    headers = dict(NOTE_REQUEST_HEADERS)
+    if validators is None or validators.get('request_url') != request_url:
+        return headers
+
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+def is_not_modified(response: requests.Response, validators: Optional[dict], request_url: str) -> bool:
+    """
+    条件付きGETの結果、前回から変わっていない（304）かを返す
+    """
+    return (
+        response.status_code == 304
+        and validators is not None
+        and validators.get('request_url') == request_url
+        and validators.get('followers_count') is not None
+    )
+
+def read_limited_body(chunks: Iterable[bytes], max_bytes: int) -> Optional[bytes]:
+    """
+    応答の本文をチャンクごとに読み、max_bytesを超えた時点で読み込みをやめてNoneを返す
+    """
+    body = bytearray()
+    for chunk in chunks:
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            return None
+    return bytes(body)
+
+def request_note(url: str, request_durations: Optional[list] = None, **kwargs) -> requests.Response:
+    """
+    レート制限を守ってnote.comにGETリクエストを送る
+    request_durationsを指定した場合は、リクエストの所要時間（レート制限の待ち時間を除く）を追加する
+    """
+    # 同時実行中の全ての取得処理で、note.comへのリクエスト数の上限を守る（リトライ時も含む）
+    if NOTE_RATE_LIMITER is not None:
+        NOTE_RATE_LIMITER.acquire()
+
+    started_at = time.monotonic()
+    try:
+        return NOTE_SESSION.get(url, **kwargs)
+    finally:
+        if request_durations is not None:
+            request_durations.append(time.monotonic() - started_at)
+
+def fetch_follower_count_from_api(note_url: str, validators: Optional[dict] = None,
+                                  request_durations: Optional[list] = None) -> Optional[int]:
+    """
+    クリエイター情報のJSON APIからフォロワー数を取得する
+    HTMLよりもはるかに小さい応答で済むが、非公開のAPIのため、
+    取得できなかった場合はリトライせずにNoneを返し、呼び出し元でHTMLからの取得に切り替える
+    前回の検証子があれば条件付きGETを行い、変わっていなければ前回のフォロワー数を返す
+    """
+    api_url = get_creator_api_url(note_url)
+    if api_url is None:
+        return None
+
+    try:
+        response = request_note(
+            api_url, request_durations, headers=build_conditional_headers(validators, api_url), timeout=NOTE_API_TIMEOUT_SECONDS,
+            stream=True
+        )
+        try:
+            if is_not_modified(response, validators, api_url):
+                return int(validators['followers_count'])
+            if response.status_code != 200:
+                print(f'The note.com creator API is not available: {response.status_code}')
+                return None
+            # 上限を超える応答は全体を読み込まずに打ち切る
+            body = read_limited_body(
+                response.iter_content(chunk_size=min(NOTE_PROFILE_CHUNK_SIZE, NOTE_API_MAX_BYTES + 1)),
+                NOTE_API_MAX_BYTES
+            )
+            if body is None:
+                print(f'The note.com creator API response is larger than {NOTE_API_MAX_BYTES} bytes')
+                return None
+            follower_count = json.loads(body)['data']['followerCount']
+        finally:
+            response.close()
+    except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+        print(f'Failed to get the followers count from the note.com creator API: {e}')
+        return None
+
+    if isinstance(follower_count, bool) or not isinstance(follower_count, int) or follower_count < 0:
+        print(f'Unexpected followerCount in the note.com creator API: {follower_count!r}')
+        return None
+
+    remember_profile_validators(note_url, api_url, response, follower_count)
+    return follower_count
+
+def remember_dashboard_info(dashboard_info: dict):
+    """
+    取得に成功した情報を、サーキットブレーカーが開いている間の代替値として保持する
+    """
+    with _last_known_lock:
+        _last_known_dashboard_info.pop(dashboard_info['url'], None)
+        if len(_last_known_dashboard_info) >= LAST_KNOWN_MAX_ENTRIES:
+            _last_known_dashboard_info.pop(next(iter(_last_known_dashboard_info)))
+        _last_known_dashboard_info[dashboard_info['url']] = dashboard_info
+
+def get_last_known_dashboard_info(note_url: str) -> Optional[dict]:
+    """
+    最後に取得できた情報を返す。このプロセスで取得したことがなければストアのスナップショットを返し、
+    どちらにもない場合はNone
+    """
+    with _last_known_lock:
+        last_known = _last_known_dashboard_info.get(note_url)
+    if last_known is not None:
+        return last_known
+    return get_follower_snapshot_info(note_url)
 
 def get_dashboard_info_from_note():
     """
@@ -16,9 +538,11 @@ def get_dashboard_info_from_note():
 
     return get_dashboard_info_from_note_url(note_url)
 
-def get_dashboard_info_from_note_url(note_url: str):
+def get_dashboard_info_from_note_url(note_url: str, save_snapshot: bool = True):
     """
     指定されたnote.comのURLからフォロワー数を取得する
+    同じURLの取得が他のスレッドで実行中の場合は、新たにリクエストせずにその結果を共有する
+    save_snapshot=Falseの場合は、取得したフォロワー数をストアに保存しない（呼び出し元が履歴と一緒に保存する）
     """
     if not note_url:
         print('The note.com URL variable is empty.')
@@ -26,39 +550,98 @@ def get_dashboard_info_from_note_url(note_url: str):
             'error': 'note.comのURLが指定されていません。'
         }
 
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    return NOTE_SINGLE_FLIGHT.do(note_url, lambda: fetch_dashboard_info_from_note_url(note_url, save_snapshot))
+
+async def get_dashboard_info_from_note_url_async(note_url: str):
+    """
+    get_dashboard_info_from_note_urlのasyncio版
+    取得はスレッドプールで行い、スレッドからの同じURLの取得とも結果を共有する
+    """
+    if not note_url:
+        print('The note.com URL variable is empty.')
+        return {
+            'error': 'note.comのURLが指定されていません。'
         }
 
-        response = requests.get(note_url, headers=headers, timeout=20)
-        response.raise_for_status()
-
-        # フォロワー数は生のHTMLから'\"followerCount\" :'の後に続く数値を取得する
-        if 'followerCount' not in response.text:
-            print('"followerCount" is not found.')
-            print(response.text)
-            return {'error': 'フォロワー数の情報が見つかりません。URLが正しいか確認してください。'}
-        follower_count_match = re.search(r'\\"followerCount\\"\s*:\s*(\d+)', response.text)
-        if follower_count_match:
-            followers_count = int(follower_count_match.group(1))
+    return await NOTE_SINGLE_FLIGHT.do_async(note_url, lambda: fetch_dashboard_info_from_note_url(note_url))
+
+def fetch_dashboard_info_from_note_url(note_url: str, save_snapshot: bool = True):
+    """
+    note.comにリクエストしてフォロワー数を取得する
+    note.comの障害でサーキットブレーカーが開いている間はリクエストせず、
+    最後に取得できた情報（stale=True）か、エラーをすぐに返す
+    save_snapshot=Trueの場合は、取得したフォロワー数を検証子とともにストアに保存する
+    """
+    if not NOTE_CIRCUIT_BREAKER.allow_request():
+        print(f'The note.com circuit breaker is open. Skipping {note_url}.')
+        last_known = get_last_known_dashboard_info(note_url)
+        if last_known is not None:
+            return dict(last_known, stale=True)
+        return {'error': 'note.comが応答しないため、取得を一時停止しています。しばらく経ってから再度お試しください。'}
+
+    outage = True
+    # note.comへの各リクエストの所要時間（レート制限とリトライの待ち時間は含めない）
+    request_durations = []
+    try:
+        # まずJSON APIから取得し、取得できなかった場合はプロフィールページのHTMLから取得する
+        validators = get_profile_validators(note_url)
+        followers_count = fetch_follower_count_from_api(note_url, validators, request_durations)
+        if followers_count is not None:
+            outage = False
         else:
-            print('The followers count regex did not match.')
-            print(response.text)
-            followers_count = 0
+            headers = build_conditional_headers(validators, note_url)
+            response = NOTE_RETRY_POLICY.call(
+                lambda: request_note(note_url, request_durations, headers=headers, timeout=NOTE_PROFILE_TIMEOUT_SECONDS,
+                                     stream=True)
+            )
+            outage = response.status_code in NOTE_OUTAGE_STATUS_CODES
+            read_started_at = time.monotonic()
+            try:
+                if is_not_modified(response, validators, note_url):
+                    # 前回から変わっていないため、前回のフォロワー数を使う
+                    marker_found, followers_count = True, int(validators['followers_count'])
+                else:
+                    response.raise_for_status()
+                    # ページ全体を読み込まず、フォロワー数が見つかった時点で接続を閉じる
+                    marker_found, followers_count = scan_follower_count(
+                        response.iter_content(chunk_size=NOTE_PROFILE_CHUNK_SIZE), NOTE_PROFILE_MAX_BYTES
+                    )
+                    if followers_count is not None:
+                        remember_profile_validators(note_url, note_url, response, followers_count)
+            finally:
+                response.close()
+                # ストリームで読み込んだ本文の受信時間は、最後のリクエストの所要時間に含める
+                request_durations[-1] += time.monotonic() - read_started_at
+
+            if not marker_found:
+                print('"followerCount" is not found.')
+                return {'error': 'フォロワー数の情報が見つかりません。URLが正しいか確認してください。'}
+            if followers_count is None:
+                print('The followers count regex did not match.')
+                followers_count = 0
 
+    except ProfileTooLargeError as e:
+        print(f'The profile page is too large: {e}')
+        return {'error': 'ページのサイズが大きすぎるため、フォロワー数を取得できませんでした。'}
     except requests.exceptions.RequestException as e:
         print('A request error occurred.')
         return {'error': f'リクエストエラー: {str(e)}'}
     except Exception as e:
         print('A unexcepted error occurred.')
         return {'error': f'予期しないエラー: {str(e)}'}
+    finally:
+        NOTE_CIRCUIT_BREAKER.record(not outage, max(request_durations, default=0.0))
 
-    return {
+    dashboard_info = {
         'followers_count': followers_count,
         'url': note_url,
-        'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'fetched_at': int(time.time())
     }
+    remember_dashboard_info(dashboard_info)
+    if save_snapshot:
+        save_follower_snapshot(note_url, followers_count)
+    return dashboard_info
 
 
 def extract_number_from_text(text):
@@ -99,8 +682,53 @@ def format_dashboard_info_for_display(dashboard_info):
     message = f"""👤 アカウント: {account_name}
 👥 フォロワー数: {formatted_followers}人"""
 
+    if dashboard_info.get('followers_change') is not None:
+        message += f"\n📈 前回比: {format_change(dashboard_info['followers_change'])}人"
+        if dashboard_info.get('anomaly'):
+            message += f"\n⚠️ いつもと比べて急な変化です（Zスコア {dashboard_info['anomaly_score']:+.1f}）"
+    if dashboard_info.get('daily_followers_change') is not None:
+        message += f"\n📅 前日比: {format_change(dashboard_info['daily_followers_change'])}人"
+    if dashboard_info.get('trend'):
+        message += format_trend(dashboard_info['trend'])
+
+    if dashboard_info.get('revalidating'):
+        age = format_age(time.time() - dashboard_info.get('fetched_at', time.time()))
+        message += f"\n🕒 {age}前に取得した値です（最新の値を確認しています）"
+    elif dashboard_info.get('stale'):
+        message += f"\n⚠️ note.comに接続できないため、{dashboard_info.get('last_updated', '')}時点の値です"
+
     return message
 
+def format_trend(trend: dict) -> str:
+    """
+    フォロワー数の傾向（移動平均、1日あたりの増減、次の節目の到達予測）を表示用の行に整形する
+    """
+    lines = f"\n📊 7日移動平均: {trend['moving_average']:,.0f}人"
+    lines += f"\n🚀 1日あたり: {trend['daily_growth']:+,.1f}人"
+    if trend.get('daily_growth_rate') is not None:
+        lines += f"（{trend['daily_growth_rate']:+.2f}%）"
+    if trend.get('milestone_eta') is not None:
+        eta = datetime.fromtimestamp(trend['milestone_eta']).strftime('%Y年%m月%d日')
+        lines += f"\n🎯 {trend['next_milestone']:,}人到達予測: {eta}ごろ"
+    return lines
+
+def format_change(change: int) -> str:
+    """
+    フォロワー数の増減を「+37」「-2」「±0」のような表示に整形する
+    """
+    return f"{change:+,}" if change else "±0"
+
+def format_age(seconds: float) -> str:
+    """
+    経過秒数を「3分」「2時間」「1日」のような表示に整形する
+    """
+    seconds = max(0, int(seconds))
+    if seconds < 60 * 60:
+        return f"{max(1, seconds // 60)}分"
+    if seconds < 24 * 60 * 60:
+        return f"{seconds // (60 * 60)}時間"
+    return f"{seconds // (24 * 60 * 60)}日"
+
 def get_note_dashboard_response():
     """
     note.comのフォロワー数情報を取得し、整形された応答を返す
@@ -108,10 +736,139 @@ def get_note_dashboard_response():
     dashboard_info = get_dashboard_info_from_note()
     return format_dashboard_info_for_display(dashboard_info)
 
+def get_dashboard_info_with_history_for_user(note_username: str, run_started_at: Optional[int] = None) -> dict:
+    """
+    指定されたnote.comユーザーのフォロワー数情報を取得して履歴に記録し、前回・前日からの増減を加えて返す
+    スケジュール実行でアカウントごとに1回だけ呼び出す
+    履歴と一緒に読み込んだ検証子で条件付きGETを行い、取得したフォロワー数は履歴の追加と同じ更新で保存する
+    run_started_atにはスケジュール実行の開始日時（UNIX時間）を渡し、それ以降に記録済みのアカウント
+    （中断する前に処理したアカウント）は取得し直さずに記録した値を返す（同じ回の値を履歴に2回追加しない）
+    """
+    note_url = f"https://note.com/{note_username}"
+    store = NOTE_ACCOUNT_STORE
+    record = None
+    if store is not None:
+        record = store.get_follower_record(note_username.lower())
+        if isinstance(record, dict):
+            if run_started_at is not None:
+                recorded_info = get_recorded_follower_history(note_url, record, run_started_at)
+                if recorded_info is not None:
+                    return recorded_info
+            remember_stored_profile_validators(note_url, record.get('validators'))
+    return record_follower_history(get_dashboard_info_from_note_url(note_url, save_snapshot=False), record)
+
 def get_note_dashboard_response_for_user(note_username: str):
     """
     指定されたnote.comユーザーのフォロワー数情報を取得し、整形された応答を返す
+    履歴は一定間隔のスケジュール実行の値のみとするため、ここでは記録しない
     """
     note_url = f"https://note.com/{note_username}"
     dashboard_info = get_dashboard_info_from_note_url(note_url)
     return format_dashboard_info_for_display(dashboard_info)
+
+def get_cached_dashboard_info_for_user(note_username: str,
+                                       on_revalidated: Optional[Callable[[dict, dict], None]] = None) -> dict:
+    """
+    指定されたnote.comユーザーのフォロワー数情報を、キャッシュにあればそこから返す
+    キャッシュにない場合は、ストアに十分新しいスナップショット（定期実行などで取得したもの）があればそれを使う
+    古い値しかない場合はそれをすぐに返し（revalidating=True）、裏で取得し直してキャッシュを更新する
+    取得し直した後はon_revalidated(古い情報, 新しい情報)を呼び出す
+    値が全くない場合はその場で取得する。取得に成功した情報のみをキャッシュする
+    """
+    cache = NOTE_DASHBOARD_CACHE
+    cache_key = validator.normalize_note_username(note_username)
+    if cache is not None:
+        dashboard_info = cache.get(cache_key)
+        if dashboard_info is not None:
+            return dashboard_info
+
+    note_url = f"https://note.com/{note_username}"
+    snapshot_info = get_follower_snapshot_info(note_url)
+    if snapshot_info is not None and time.time() - snapshot_info['fetched_at'] <= get_note_snapshot_max_age():
+        if cache is not None:
+            cache.set(cache_key, snapshot_info)
+        return snapshot_info
+
+    with _last_known_lock:
+        stale_info = _last_known_dashboard_info.get(note_url)
+    if stale_info is None or (snapshot_info is not None and snapshot_info['fetched_at'] > stale_info.get('fetched_at', 0)):
+        stale_info = snapshot_info
+    if stale_info is not None:
+        start_revalidation(cache_key, note_url, stale_info, on_revalidated)
+        return dict(stale_info, revalidating=True)
+
+    dashboard_info = get_dashboard_info_from_note_url(note_url)
+    if cache is not None and 'error' not in dashboard_info and not dashboard_info.get('stale'):
+        cache.set(cache_key, dashboard_info)
+    return dashboard_info
+
+def start_revalidation(cache_key: str, note_url: str, stale_info: dict,
+                       on_revalidated: Optional[Callable[[dict, dict], None]] = None):
+    """
+    古い値を返した後に、裏でフォロワー数を取得し直してキャッシュを更新する
+    同じアカウントの取得し直しが既に動いている場合は、新たに取得せずにその結果を待つ
+    """
+    with _revalidations_lock:
+        revalidation = _revalidations.get(cache_key)
+        if revalidation is not None:
+            if on_revalidated is not None:
+                revalidation['callbacks'].append((stale_info, on_revalidated))
+            return
+
+        revalidation = {'callbacks': [(stale_info, on_revalidated)] if on_revalidated else []}
+        _revalidations[cache_key] = revalidation
+        future = _revalidation_executor.submit(revalidate, cache_key, note_url)
+        revalidation['future'] = future
+        _revalidation_futures.add(future)
+
+    # 既に終わっている場合はその場で呼び出されるため、ロックの外で登録する
+    future.add_done_callback(_discard_revalidation_future)
+
+def _discard_revalidation_future(future):
+    """
+    通知まで終わった取得し直しを、待つ対象から外す
+    """
+    with _revalidations_lock:
+        _revalidation_futures.discard(future)
+
+def revalidate(cache_key: str, note_url: str) -> dict:
+    """
+    フォロワー数を取得し直してキャッシュを更新し、取得し直しを待っている呼び出し元に通知する
+    通知の前に_revalidationsから外し、以降の呼び出し元は新しい取得し直しを始める
+    （通知が終わるまではwait_for_revalidationsの待つ対象に残る）
+    """
+    try:
+        dashboard_info = get_dashboard_info_from_note_url(note_url)
+        cache = NOTE_DASHBOARD_CACHE
+        if cache is not None and 'error' not in dashboard_info and not dashboard_info.get('stale'):
+            cache.set(cache_key, dashboard_info)
+    finally:
+        with _revalidations_lock:
+            callbacks = _revalidations.pop(cache_key)['callbacks']
+
+    for stale_info, on_revalidated in callbacks:
+        try:
+            on_revalidated(stale_info, dashboard_info)
+        except Exception as e:
+            print(f"Error notifying revalidated follower count: {e}")
+    return dashboard_info
+
+def wait_for_revalidations(timeout: Optional[float] = None) -> bool:
+    """
+    裏で動いている取得し直しが終わるまで待つ。timeout秒以内に全て終わった場合はTrueを返す
+    Lambdaは応答を返すと処理が止まるため、ハンドラーの最後に呼び出す
+    """
+    with _revalidations_lock:
+        futures = list(_revalidation_futures)
+    if not futures:
+        return True
+
+    _, not_done = wait(futures, timeout=timeout)
+    return not not_done
+
+def get_cached_note_dashboard_response_for_user(note_username: str,
+                                                on_revalidated: Optional[Callable[[dict, dict], None]] = None):
+    """
+    指定されたnote.comユーザーのフォロワー数情報を、キャッシュを使って取得し、整形された応答を返す
+    """
+    return format_dashboard_info_for_display(get_cached_dashboard_info_for_user(note_username, on_revalidated))
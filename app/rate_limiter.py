@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+from typing import Callable
+
+class TokenBucket:
+    """
+    トークンバケット方式のレートリミッター
+    1秒あたりrate個のトークンが補充され、最大burst個まで貯めておける
+    スレッドからはacquire、asyncioのコルーチンからはacquire_asyncで使用する
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        if burst < 1:
+            raise ValueError('burst must be at least 1')
+
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 1) -> float:
+        """
+        トークンを予約し、予約したトークンが使えるようになるまでの待ち時間（秒）を返す
+        予約は呼び出し順に積み上がるため、待ち時間が過ぎたら追加の確認なしで使用してよい
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: int = 1, sleep: Callable[[float], None] = time.sleep) -> float:
+        """
+        トークンが使えるようになるまでスレッドを待機させ、待機した秒数を返す
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        """
+        トークンが使えるようになるまでイベントループをブロックせずに待機し、待機した秒数を返す
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
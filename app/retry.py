@@ -0,0 +1,149 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import requests
+
+# リトライの対象とするHTTPステータスコード
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# 1回の実行（Lambdaの呼び出し）で使えるリトライ回数のデフォルト値
+DEFAULT_RETRY_BUDGET = 50
+
+class RetryBudget:
+    """
+    1回の実行全体で使えるリトライ回数の上限を管理するクラス
+    障害時にリトライが積み重なって実行時間を使い切らないようにする
+    """
+
+    def __init__(self, max_retries: int):
+        self.max_retries = max_retries
+        self._remaining = max_retries
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    def try_spend(self) -> bool:
+        """
+        リトライを1回分消費する。残りがない場合はFalseを返す
+        """
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+def create_retry_budget() -> RetryBudget:
+    """
+    環境変数RETRY_BUDGET_PER_RUNからリトライ予算を作成する
+    """
+    try:
+        max_retries = int(os.environ.get('RETRY_BUDGET_PER_RUN') or DEFAULT_RETRY_BUDGET)
+    except ValueError:
+        print(f"Invalid RETRY_BUDGET_PER_RUN value: {os.environ.get('RETRY_BUDGET_PER_RUN')}")
+        max_retries = DEFAULT_RETRY_BUDGET
+    return RetryBudget(max(0, max_retries))
+
+# note.comとLINEへのリクエストで共有するリトライ予算
+_retry_budget = create_retry_budget()
+
+def get_retry_budget() -> RetryBudget:
+    return _retry_budget
+
+def reset_retry_budget() -> RetryBudget:
+    """
+    実行の開始時にリトライ予算を満タンに戻す
+    """
+    global _retry_budget
+    _retry_budget = create_retry_budget()
+    return _retry_budget
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-Afterヘッダーの値（秒数またはHTTP日付）を待ち秒数に変換する
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class RetryPolicy:
+    """
+    指数バックオフ（フルジッター）でHTTPリクエストをリトライするポリシー
+    接続エラーとRETRYABLE_STATUS_CODESの応答をリトライし、Retry-Afterヘッダーがあればそれに従う
+    リトライのたびに共有のリトライ予算を消費し、予算がなくなったらそれ以上リトライしない
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 10.0,
+                 budget: Optional[RetryBudget] = None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 random_func: Callable[[], float] = random.random):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._sleep = sleep
+        self._random = random_func
+
+    def max_total_seconds(self, timeout: float) -> float:
+        """
+        各試行がtimeout秒でタイムアウトし、毎回最大の待ち時間でリトライした場合の合計秒数を返す
+        """
+        return self.max_attempts * timeout + (self.max_attempts - 1) * self.max_delay
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        attempt回目の失敗の後に待つ秒数を返す
+        Retry-Afterがmax_delayを超える場合は、待っても間に合わないためNoneを返す
+        """
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return self._random() * min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+
+    def call(self, request_func: Callable[[], requests.Response]) -> requests.Response:
+        """
+        request_funcを必要に応じてリトライしながら呼び出し、最後の応答を返す
+        リトライしても接続エラーが解消しない場合は最後の例外を送出する
+        """
+        budget = self.budget or get_retry_budget()
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = request_func()
+            except requests.exceptions.ConnectionError as e:
+                if attempt == self.max_attempts:
+                    raise
+                error, response, retry_after = e, None, None
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_attempts:
+                    return response
+                error = None
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+            delay = self.compute_delay(attempt, retry_after)
+            if delay is None or not budget.try_spend():
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                # 捨てる応答の接続をプールに戻す（stream=Trueの場合は読み込むまで接続が使われたままになる）
+                response.close()
+            print(f"Retrying request in {delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+            self._sleep(delay)
@@ -0,0 +1,128 @@
+import bisect
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+# 分割されたスケジュール実行のワーカー呼び出し（中断後の再開を含む）を表すイベントのsource
+SCHEDULED_WORKER_EVENT_SOURCE = 'note-monitor.scheduled-worker'
+
+# 1シャードあたりの仮想ノード数（多いほどシャード間の偏りが小さくなる）
+DEFAULT_VIRTUAL_NODES = 64
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+class ConsistentHashRing:
+    """
+    コンシステントハッシュでキーをシャードに割り当てるクラス
+    シャード数を変えても、大半のキーは同じシャードに割り当てられたままになる
+    """
+
+    def __init__(self, shard_count: int, virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        if shard_count < 1:
+            raise ValueError('shard_count must be at least 1')
+
+        self.shard_count = shard_count
+        ring = sorted(
+            (_hash(f'shard-{shard}-vnode-{vnode}'), shard)
+            for shard in range(shard_count)
+            for vnode in range(virtual_nodes)
+        )
+        self._points = [point for point, _ in ring]
+        self._shards = [shard for _, shard in ring]
+
+    def get_shard(self, key: str) -> int:
+        """
+        キーを担当するシャード番号（0始まり）を返す
+        """
+        if self.shard_count == 1:
+            return 0
+
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._shards[index]
+
+def build_worker_events(shard_count: int) -> List[Dict]:
+    """
+    各シャードのワーカーに送るイベントを作成する
+    """
+    return [
+        {
+            'source': SCHEDULED_WORKER_EVENT_SOURCE,
+            'shard_index': shard_index,
+            'shard_count': shard_count
+        }
+        for shard_index in range(shard_count)
+    ]
+
+def build_continuation_event(shard_index: int, shard_count: int, cursor: Dict) -> Dict:
+    """
+    締め切り前に中断したスケジュール実行の続きを処理するためのイベントを作成する
+    """
+    return {
+        'source': SCHEDULED_WORKER_EVENT_SOURCE,
+        'shard_index': shard_index,
+        'shard_count': shard_count,
+        'cursor': cursor
+    }
+
+class LambdaDispatcher:
+    """
+    ワーカーイベントをLambda関数の非同期呼び出しで送るディスパッチャ
+    """
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.client = boto3.client('lambda')
+
+    def dispatch(self, events: List[Dict]) -> int:
+        """
+        イベントごとにLambda関数を非同期で呼び出し、呼び出しに成功した数を返す
+        """
+        dispatched_count = 0
+        for event in events:
+            try:
+                self.client.invoke(
+                    FunctionName=self.function_name,
+                    InvocationType='Event',
+                    Payload=json.dumps(event).encode('utf-8')
+                )
+                dispatched_count += 1
+            except (BotoCoreError, ClientError) as e:
+                print(f"Error invoking scheduled worker {event.get('shard_index')}: {e}")
+        return dispatched_count
+
+class LocalDispatcher:
+    """
+    ワーカーイベントを同じプロセス内のスレッドで処理するディスパッチャ
+    テストやローカル実行でLambdaの並列呼び出しの代わりに使う
+    """
+
+    def __init__(self, handler: Callable, context=None):
+        self.handler = handler
+        self.context = context
+        self.responses = []
+
+    def dispatch(self, events: List[Dict]) -> int:
+        """
+        各イベントを並列にhandlerで処理し、正常に処理できた数を返す
+        handlerの戻り値はresponsesに保持する
+        """
+        if not events:
+            return 0
+
+        def run(event):
+            try:
+                return self.handler(event, self.context)
+            except Exception as e:
+                print(f"Error running scheduled worker {event.get('shard_index')}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=len(events)) as executor:
+            responses = list(executor.map(run, events))
+
+        self.responses.extend(responses)
+        return sum(1 for response in responses if response is not None)
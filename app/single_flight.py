@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+class SingleFlight:
+    """
+    同じキーに対する同時の呼び出しを1回にまとめるクラス
+    最初の呼び出し元だけが処理を実行し、その間に来た同じキーの呼び出し元は結果（または例外）を共有する
+    スレッドからはdo、asyncioのコルーチンからはdo_asyncで使用し、両者の間でも呼び出しはまとめられる
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared_count = 0
+
+    def _join(self, key: Hashable):
+        """
+        キーの実行中の呼び出しを返す。ない場合は新しく登録し、呼び出し元が実行する側になる
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared_count += 1
+                return future, False
+
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        funcを実行して結果を返す。同じキーの呼び出しが実行中の場合は、その結果を待って返す
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        doのasyncio版。待っている間もイベントループをブロックしない
+        funcがコルーチン関数の場合はawaitし、通常の関数の場合はスレッドプールで実行する
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            if asyncio.iscoroutinefunction(func):
+                result = await func()
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(None, func)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
@@ -0,0 +1,64 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+# 移動平均と増加ペースを求める期間（秒）
+TREND_WINDOW_SECONDS = 7 * 24 * 60 * 60
+
+# 傾向を求めるのに必要な履歴の期間（秒）。これより短い場合は求めない
+TREND_MIN_SPAN_SECONDS = 24 * 60 * 60
+
+# 到達予測を出すフォロワー数の節目
+FOLLOWER_MILESTONES = np.array([100, 1_000, 10_000, 100_000, 1_000_000], dtype=np.float64)
+
+# これより先になる到達予測は出さない（秒）
+MILESTONE_HORIZON_SECONDS = 5 * 365 * 24 * 60 * 60
+
+_DAY_SECONDS = 24 * 60 * 60
+
+def analyze_follower_trend(timestamps: Sequence[int], counts: Sequence[int],
+                           window_seconds: float = TREND_WINDOW_SECONDS) -> Optional[dict]:
+    """
+    フォロワー数の履歴（古い順の取得日時とフォロワー数の配列）から、直近window_seconds秒の傾向を求める
+    - moving_average: 期間内のフォロワー数の移動平均（取得間隔で重み付け）
+    - daily_growth: 期間内の最小二乗法による1日あたりの増減
+    - daily_growth_rate: 現在のフォロワー数に対する1日あたりの増減の割合（%）
+    - next_milestone / milestone_eta: 次の節目と、今の増加ペースで到達する見込みの日時（UNIX時間）
+    配列全体をNumPyでまとめて計算し、Pythonのループは使わない
+    履歴の期間がTREND_MIN_SPAN_SECONDSに満たない場合はNone
+    """
+    t = np.asarray(timestamps, dtype=np.float64)
+    c = np.asarray(counts, dtype=np.float64)
+    if t.size < 2 or t[-1] - t[0] < TREND_MIN_SPAN_SECONDS:
+        return None
+
+    start = min(int(np.searchsorted(t, t[-1] - window_seconds)), t.size - 2)
+    t = t[start:]
+    c = c[start:]
+
+    span = t[-1] - t[0]
+    moving_average = float(np.dot((c[1:] + c[:-1]) / 2, np.diff(t)) / span) if span > 0 else float(c[-1])
+
+    x = t - t.mean()
+    denominator = np.dot(x, x)
+    slope = float(np.dot(x, c - c.mean()) / denominator) if denominator > 0 else 0.0
+    daily_growth = slope * _DAY_SECONDS
+
+    current = c[-1]
+    next_milestone = None
+    milestone_eta = None
+    index = int(np.searchsorted(FOLLOWER_MILESTONES, current, side='right'))
+    if index < FOLLOWER_MILESTONES.size:
+        next_milestone = int(FOLLOWER_MILESTONES[index])
+        if slope > 0:
+            seconds = (next_milestone - current) / slope
+            if seconds <= MILESTONE_HORIZON_SECONDS:
+                milestone_eta = int(t[-1] + seconds)
+
+    return {
+        'moving_average': moving_average,
+        'daily_growth': daily_growth,
+        'daily_growth_rate': daily_growth / current * 100 if current > 0 else None,
+        'next_milestone': next_milestone,
+        'milestone_eta': milestone_eta
+    }
@@ -1,4 +1,5 @@
 import re
+from typing import Optional
 
 def validate_note_username(username: str) -> bool:
     """
@@ -16,6 +17,30 @@ def validate_note_username(username: str) -> bool:
     pattern = r'^[a-zA-Z0-9_]+$'
     return bool(re.match(pattern, username))
 
+# 通知するフォロワー数の変化の下限を設定するメッセージ（例：「通知 10」）
+NOTIFY_MIN_CHANGE_PATTERN = re.compile(r'^通知\s*(\d{1,6})$')
+
+def parse_notify_min_change(message: str) -> Optional[int]:
+    """
+    「通知 10」のようなメッセージから、通知するフォロワー数の変化の下限を取り出す
+    該当しないメッセージの場合はNone
+    """
+    if not message:
+        return None
+
+    match = NOTIFY_MIN_CHANGE_PATTERN.match(message.strip())
+    return int(match.group(1)) if match else None
+
+def normalize_note_username(username: str) -> str:
+    """
+    note.comのユーザー名を比較・集約用に正規化する
+    前後の空白を除去し、小文字に揃える
+    """
+    if not username:
+        return ""
+
+    return username.strip().lower()
+
 def extract_username_from_note_url(url: str) -> str:
     """
     note.comのURLからユーザー名を抽出する
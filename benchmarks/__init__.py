@@ -0,0 +1 @@
+# ベンチマークスクリプト
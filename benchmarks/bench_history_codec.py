@@ -0,0 +1,73 @@
+"""
+フォロワー数の履歴のバイナリ形式（app.history_codec）とJSONのサイズ・処理時間を比較するベンチマーク
+
+使い方:
+    python -m benchmarks.bench_history_codec --points 720 8760 --repeat 200
+"""
+import argparse
+import json
+import random
+import timeit
+
+from app.history_codec import encode_history, decode_history
+
+
+def make_history(points: int, interval: int = 3600, seed: int = 0) -> list:
+    """
+    1時間ごとのスケジュール実行を想定した履歴を作成する（実行時刻の数秒のずれ、たまの取得の抜け、増減を含む）
+    """
+    rng = random.Random(seed)
+    history = []
+    fetched_at = 1700000000
+    followers_count = 1000
+    for _ in range(points):
+        history.append({'fetched_at': fetched_at, 'followers_count': followers_count})
+        fetched_at += interval * (2 if rng.random() < 0.01 else 1) + rng.randint(-5, 5)
+        followers_count = max(0, followers_count + rng.randint(-2, 8))
+    return history
+
+
+def measure(func, repeat: int) -> float:
+    """
+    funcをrepeat回実行した1回あたりの秒数を返す
+    """
+    return timeit.timeit(func, number=repeat) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Follower history encoding benchmark')
+    parser.add_argument('--points', type=int, nargs='+', default=[720, 8760], help='history lengths to compare')
+    parser.add_argument('--repeat', type=int, default=200, help='iterations per measurement')
+    args = parser.parse_args()
+
+    for points in args.points:
+        history = make_history(points)
+        candidates = {
+            'json': (
+                lambda: json.dumps(history, separators=(',', ':')).encode(),
+                lambda data: json.loads(data)
+            ),
+            'packed': (
+                lambda: encode_history(history, compress=False),
+                decode_history
+            ),
+            'packed+zlib': (
+                lambda: encode_history(history),
+                decode_history
+            )
+        }
+
+        print(f"points={points}")
+        for name, (encode, decode) in candidates.items():
+            data = encode()
+            assert decode(data) == history
+            encode_time = measure(encode, args.repeat)
+            decode_time = measure(lambda: decode(data), args.repeat)
+            print(
+                f"  {name:<12} size={len(data):>8,} bytes ({len(data) / points:6.2f} B/point)  "
+                f"encode={encode_time * 1000:8.3f}ms  decode={decode_time * 1000:8.3f}ms"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+DynamoDBの全件スキャンの所要時間をmoto上で計測するベンチマーク
+boto3のリソースを使うDynamoDBHandlerと、クライアントを使うDynamoDBClientHandlerを比較する
+
+使い方:
+    python -m benchmarks.bench_scan --items 20000 --segments 1 2 4 8
+    python -m benchmarks.bench_scan --items 100000 --segments 1 --backends resource client
+"""
+import argparse
+import os
+import time
+
+import boto3
+from moto import mock_aws
+
+from app.db_handler import DynamoDBHandler, DynamoDBClientHandler
+
+TABLE_NAME = 'bench-note-monitor-users'
+
+BACKENDS = {
+    'resource': DynamoDBHandler,
+    'client': DynamoDBClientHandler
+}
+
+
+def create_table(item_count: int):
+    """
+    ベンチマーク用のテーブルを作成し、item_count件のユーザーマッピングを投入する
+    """
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[
+            {'AttributeName': 'line_user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'note_username', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'line_user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'note_username', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    with table.batch_writer() as batch:
+        for i in range(item_count):
+            batch.put_item(Item={
+                'line_user_id': f'U{i:032x}',
+                'note_username': f'note_user{i % 5000}'
+            })
+    return table
+
+
+def measure(func) -> tuple:
+    """
+    funcが返すイテレータを最後まで読み込み、(件数, 秒数) を返す
+    """
+    start = time.perf_counter()
+    count = sum(1 for _ in func())
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DynamoDB scan benchmark (moto)')
+    parser.add_argument('--items', type=int, default=20000, help='number of user mappings')
+    parser.add_argument('--segments', type=int, nargs='+', default=[1, 2, 4, 8], help='TotalSegments values to compare')
+    parser.add_argument('--page-size', type=int, default=None, help='Limit per scan request')
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=list(BACKENDS), help='DynamoDBHandler backends to compare')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ['DYNAMODB_TABLE_NAME'] = TABLE_NAME
+
+    with mock_aws():
+        create_table(args.items)
+
+        print(f"items={args.items} page_size={args.page_size}")
+        for backend in args.backends:
+            start = time.perf_counter()
+            handler = BACKENDS[backend]()
+            print(f"backend={backend}  init={(time.perf_counter() - start) * 1000:.1f}ms")
+            for segments in args.segments:
+                count, elapsed = measure(
+                    lambda: handler.iter_all_user_mappings_parallel(segments, page_size=args.page_size)
+                )
+                print(f"  segments={segments:>3}  items={count:>8}  elapsed={elapsed:8.3f}s  ({count / elapsed:,.0f} items/s)")
+
+
+if __name__ == '__main__':
+    main()
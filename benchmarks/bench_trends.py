@@ -0,0 +1,108 @@
+"""
+フォロワー数の傾向の計算（app.trends）を、スケジュール実行と同じくアカウントごとに
+保存された履歴の復元から行った場合の所要時間を計測するベンチマーク
+比較用に、履歴を辞書のリストに復元して同じ計算をPythonのループで行った場合の所要時間も計測する
+
+使い方:
+    python -m benchmarks.bench_trends --accounts 10000 --points 365
+    python -m benchmarks.bench_trends --accounts 1000 --points 8760 --interval-hours 1
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.history_codec import encode_history_arrays, decode_history, decode_history_arrays
+from app.trends import analyze_follower_trend, FOLLOWER_MILESTONES, TREND_WINDOW_SECONDS
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def make_histories(accounts: int, points: int, interval: int = DAY_SECONDS, seed: int = 0) -> list:
+    """
+    interval秒ごとの取得を想定した、アカウントごとの履歴（古い順の取得日時とフォロワー数）を作成する
+    """
+    rng = random.Random(seed)
+    histories = []
+    for _ in range(accounts):
+        fetched_at = 1700000000
+        followers_count = rng.randint(0, 50000)
+        timestamps = []
+        counts = []
+        for _ in range(points):
+            timestamps.append(fetched_at)
+            counts.append(followers_count)
+            fetched_at += interval + rng.randint(-60, 60)
+            followers_count = max(0, followers_count + rng.randint(-3, 10))
+        histories.append((timestamps, counts))
+    return histories
+
+
+def analyze_with_loops(history: list) -> dict:
+    """
+    analyze_follower_trendと同じ計算を、辞書のリストの履歴に対してPythonのループで行う（比較用）
+    """
+    timestamps = [entry['fetched_at'] for entry in history]
+    counts = [entry['followers_count'] for entry in history]
+    last = timestamps[-1]
+    start = next(i for i, fetched_at in enumerate(timestamps) if fetched_at >= last - TREND_WINDOW_SECONDS)
+    start = min(start, len(timestamps) - 2)
+    t = timestamps[start:]
+    c = counts[start:]
+
+    area = 0.0
+    for i in range(1, len(t)):
+        area += (c[i] + c[i - 1]) / 2 * (t[i] - t[i - 1])
+    moving_average = area / (t[-1] - t[0])
+
+    mean_t = sum(t) / len(t)
+    mean_c = sum(c) / len(c)
+    numerator = 0.0
+    denominator = 0.0
+    for fetched_at, followers_count in zip(t, c):
+        numerator += (fetched_at - mean_t) * (followers_count - mean_c)
+        denominator += (fetched_at - mean_t) ** 2
+    slope = numerator / denominator
+
+    next_milestone = next((int(m) for m in FOLLOWER_MILESTONES if m > c[-1]), None)
+    milestone_eta = None
+    if next_milestone is not None and slope > 0:
+        milestone_eta = int(t[-1] + (next_milestone - c[-1]) / slope)
+    return {
+        'moving_average': moving_average,
+        'daily_growth': slope * DAY_SECONDS,
+        'next_milestone': next_milestone,
+        'milestone_eta': milestone_eta
+    }
+
+
+def measure(label: str, func, items: list):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} total={elapsed:8.3f}s  per account={elapsed / len(items) * 1e6:8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Follower trend analytics benchmark')
+    parser.add_argument('--accounts', type=int, default=10000, help='number of note accounts')
+    parser.add_argument('--points', type=int, default=365, help='history points per account')
+    parser.add_argument('--interval-hours', type=float, default=24, help='hours between history points')
+    args = parser.parse_args()
+
+    histories = [
+        (np.array(timestamps), np.array(counts))
+        for timestamps, counts in make_histories(args.accounts, args.points, int(args.interval_hours * 3600))
+    ]
+    packed = [encode_history_arrays(timestamps, counts) for timestamps, counts in histories]
+
+    print(f"accounts={args.accounts} points={args.points} interval={args.interval_hours}h")
+    measure('numpy (arrays only)', lambda history: analyze_follower_trend(*history), histories)
+    measure('numpy (decode + analyze)', lambda data: analyze_follower_trend(*decode_history_arrays(data)), packed)
+    measure('python loops (decode + analyze)', lambda data: analyze_with_loops(decode_history(data)), packed)
+
+
+if __name__ == '__main__':
+    main()
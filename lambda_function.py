@@ -1,5 +1,44 @@
 import json
-from app import note_scraper, line_handler, db_handler, validator
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from app.circuit_breaker import CircuitBreaker
+from app import note_scraper, line_handler, db_handler, validator, sharding, retry
+
+# オンデマンド取得で古い値を返した後、新しい値をプッシュするフォロワー数の変化の下限
+DEFAULT_ON_DEMAND_PUSH_MIN_DELTA = 1
+
+# スケジュール実行で通知する、最後に通知した時点からのフォロワー数の変化の下限
+# ユーザーマッピングのnotify_min_changeで上書きでき、0の場合は変化がなくても毎回通知する
+DEFAULT_NOTIFY_MIN_CHANGE = 1
+
+# Webhookの処理で、取得し直しを待つのをやめるLambdaの残り実行時間（ミリ秒）
+WEBHOOK_DEADLINE_MARGIN_MS = 1000
+
+# スケジュール実行時の同時実行数（デフォルトは逐次実行）
+DEFAULT_SCHEDULED_MAX_WORKERS = 1
+
+# スケジュール実行時にスキャン結果をまとめて処理する件数
+SCHEDULED_BATCH_SIZE = 1000
+
+# スケジュール実行時のDynamoDB並列スキャンのセグメント数（デフォルトは並列化しない）
+DEFAULT_SCHEDULED_SCAN_SEGMENTS = 1
+
+# スケジュール実行を分割するワーカー数（デフォルトは分割しない）
+DEFAULT_SCHEDULED_SHARD_COUNT = 1
+
+# Lambdaの残り実行時間がこの値（ミリ秒）を下回ったら、スケジュール実行を中断して続きを引き継ぐ
+# デフォルトは1アカウントの最長の処理時間（get_account_max_duration_ms、100秒）に、続きの呼び出しの分を加えた値
+# それより短い値を設定した場合も、1アカウントの最長の処理時間を下回らないようにする
+DEFAULT_SCHEDULED_DEADLINE_MARGIN_MS = 120000
+
+# スケジュール実行でアカウントを並列に処理するスレッドプールと、その同時実行数
+# バッチやウォームスタートをまたいで同じスレッドを使い、スレッドごとのboto3のリソースを作り直さない
+_scheduled_executor = None
+_scheduled_executor_workers = 0
+_scheduled_executor_lock = threading.Lock()
 
 def get_note_dashboard_response() -> str:
     """
@@ -7,12 +46,52 @@ def get_note_dashboard_response() -> str:
     """
     return note_scraper.get_note_dashboard_response()
 
-def get_note_dashboard_response_for_user(note_username: str) -> str:
+def get_note_dashboard_response_for_user(note_username: str, use_cache: bool = False,
+                                          notify_user_id: str = None) -> str:
     """
     指定されたnote.comユーザーのダッシュボード情報を取得し、整形された応答を返す
+    use_cacheがTrueの場合は、有効期限内に取得した情報があればそれを使う（オンデマンド取得用）
+    古い情報を返した場合は裏で取得し直し、notify_user_idを指定していれば、
+    フォロワー数がON_DEMAND_PUSH_MIN_DELTA以上変わっていたときに新しい情報をプッシュする
     """
+    if use_cache:
+        on_revalidated = build_revalidation_notifier(notify_user_id) if notify_user_id else None
+        return note_scraper.get_cached_note_dashboard_response_for_user(note_username, on_revalidated)
     return note_scraper.get_note_dashboard_response_for_user(note_username)
 
+def build_revalidation_notifier(user_id: str):
+    """
+    取得し直したフォロワー数が、返信した古い値から十分に変わっていた場合にプッシュする関数を作成する
+    """
+    min_delta = get_positive_int_env('ON_DEMAND_PUSH_MIN_DELTA', DEFAULT_ON_DEMAND_PUSH_MIN_DELTA)
+
+    def notify(stale_info: dict, fresh_info: dict):
+        if 'error' in fresh_info or fresh_info.get('stale'):
+            return
+        if abs(fresh_info['followers_count'] - stale_info['followers_count']) < min_delta:
+            return
+        message = note_scraper.format_dashboard_info_for_display(fresh_info)
+        line_handler.send_push_message(user_id, f"🔄 最新のフォロワー数情報\n\n{message}")
+
+    return notify
+
+def get_note_account_update_for_user(note_username: str, run_started_at: int = None) -> dict:
+    """
+    スケジュール実行用に、指定されたnote.comユーザーの情報を取得して履歴に記録し、
+    送信用メッセージと取得したフォロワー数、前回の取得からのフォロワー数の増減を返す
+    run_started_at（スケジュール実行の開始日時）以降に記録済みのアカウントは、記録した値を返す
+    戻り値は {'message': 送信用メッセージ, 'followers_count': フォロワー数, 'followers_change': 増減,
+    'anomaly': いつもと比べて急な増減か} の形式で、取得に失敗した場合はfollowers_countがNone、
+    増減を比較できない場合（初回の取得や取得の失敗）はfollowers_changeがNone
+    """
+    dashboard_info = note_scraper.get_dashboard_info_with_history_for_user(note_username, run_started_at)
+    return {
+        'message': note_scraper.format_dashboard_info_for_display(dashboard_info),
+        'followers_count': dashboard_info.get('followers_count') if 'error' not in dashboard_info else None,
+        'followers_change': dashboard_info.get('followers_change'),
+        'anomaly': bool(dashboard_info.get('anomaly'))
+    }
+
 def handle_user_message(user_id: str, message: str) -> str:
     """
     ユーザーからのメッセージを処理する
@@ -20,15 +99,29 @@ def handle_user_message(user_id: str, message: str) -> str:
     - note.comのユーザー名で登録数制限に達している場合：オンデマンドでフォロワー数を取得・表示
     - note.comのユーザー名で既に登録済みの場合：既に登録済みメッセージを表示
     - unfollow の場合：DynamoDBから削除
+    - 「通知 10」のようなメッセージの場合：通知するフォロワー数の変化の下限を設定
     - その他の場合：現在の登録情報を表示
     """
-    db = db_handler.DynamoDBHandler()
+    db = db_handler.get_db_handler()
+    # note.comの条件付きGETの検証子を、他のコンテナや以降の実行と共有する
+    note_scraper.set_note_account_store(db)
 
     # アンフォローイベントの処理
     if message == 'unfollow':
         db.delete_user_mapping(user_id)
         return "User unregistered"
 
+    # 通知するフォロワー数の変化の下限の設定
+    notify_min_change = validator.parse_notify_min_change(message)
+    if notify_min_change is not None:
+        if not db.get_user_mappings(user_id):
+            return "📝 先にnote.comのユーザー名を登録してください。"
+        if not db.update_notify_min_change(user_id, notify_min_change):
+            return "❌ 設定に失敗しました。しばらく経ってから再度お試しください。"
+        if notify_min_change == 0:
+            return "✅ フォロワー数が変わらなくても毎回通知します。"
+        return f"✅ フォロワー数が前回の通知から{notify_min_change}人以上変わったときに通知します。"
+
     # note.comのユーザー名として有効かチェック
     if validator.validate_note_username(message):
         # 登録数制限チェック（1個まで）
@@ -41,7 +134,8 @@ def handle_user_message(user_id: str, message: str) -> str:
 
         # 1個制限チェック - 制限に達している場合は、オンデマンドでフォロワー数を取得
         if current_count >= 1:
-            follower_info = get_note_dashboard_response_for_user(message)
+            # 同じアカウントへの問い合わせが続くことが多いため、キャッシュを使う
+            follower_info = get_note_dashboard_response_for_user(message, use_cache=True, notify_user_id=user_id)
             return f"📊 現在のフォロワー数情報\n\n{follower_info}"
 
         # DynamoDBに保存
@@ -66,10 +160,19 @@ def lambda_handler(event, context):
     AWS Lambdaのメインハンドラ関数。
     スケジュール実行またはLINEからのWebhookイベントを処理する。
     """
+    # リトライ予算は呼び出しごとに満タンに戻す
+    retry.reset_retry_budget()
+
     # スケジュール実行の場合（EventBridgeからの呼び出し）
     if 'source' in event and event['source'] == 'aws.events':
+        if get_scheduled_shard_count() > 1:
+            return handle_scheduled_coordination(context)
         return handle_scheduled_execution(context)
 
+    # 分割されたスケジュール実行のワーカー、または中断したスケジュール実行の続きとしての呼び出しの場合
+    if event.get('source') == sharding.SCHEDULED_WORKER_EVENT_SOURCE:
+        return handle_scheduled_execution(context, event['shard_index'], event['shard_count'], event.get('cursor'))
+
     # API Gateway経由のLINEからのWebhookの場合
     if 'headers' in event and 'body' in event:
         return handle_line_webhook(event, context)
@@ -79,38 +182,477 @@ def lambda_handler(event, context):
         'body': json.dumps('Invalid event type')
     }
 
-def handle_scheduled_execution(context):
+def get_positive_int_env(name: str, default: int) -> int:
+    """
+    環境変数から1以上の整数を取得する
+    未設定または不正な値の場合はデフォルト値を返す
+    """
+    value = os.environ.get(name)
+    if not value:
+        return default
+
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"Invalid {name} value: {value}")
+        return default
+
+def get_scheduled_max_workers() -> int:
+    """
+    スケジュール実行時の同時実行数を環境変数から取得する
+    """
+    return get_positive_int_env('SCHEDULED_MAX_WORKERS', DEFAULT_SCHEDULED_MAX_WORKERS)
+
+def get_scheduled_scan_segments() -> int:
+    """
+    スケジュール実行時のDynamoDB並列スキャンのセグメント数を環境変数から取得する
+    """
+    return get_positive_int_env('SCHEDULED_SCAN_SEGMENTS', DEFAULT_SCHEDULED_SCAN_SEGMENTS)
+
+def get_scheduled_shard_count() -> int:
+    """
+    スケジュール実行を分割するワーカー数を環境変数から取得する
+    各ワーカーはテーブル全体をスキャンして担当外の項目を捨てるため、スキャンの読み込み量はワーカー数倍になる
+    （分割で減るのはnote.comへの取得とLINEへの送信で、スキャンは減らない）
+    """
+    return get_positive_int_env('SCHEDULED_SHARD_COUNT', DEFAULT_SCHEDULED_SHARD_COUNT)
+
+def iter_scheduled_user_mappings(db, shard_index: int = 0, shard_count: int = 1,
+                                 scan_segments: int = 1, exclusive_start_key: dict = None):
+    """
+    スケジュール実行で処理するユーザーマッピングを返すイテレータを作成する
+    scan_segmentsが2以上の場合は並列スキャン、それ以外はexclusive_start_keyの次から順にスキャンする
+    shard_countが2以上の場合は、note.comユーザー名が担当シャードに割り当てられたものだけを返す
+    """
+    if scan_segments > 1:
+        user_mappings = db.iter_all_user_mappings_parallel(scan_segments)
+    else:
+        user_mappings = db.iter_all_user_mappings(exclusive_start_key=exclusive_start_key)
+
+    if shard_count <= 1:
+        return user_mappings
+
+    # シャードはnote.comユーザー名で分けるため、パーティションキー（LINEユーザーID）で分かれる
+    # 並列スキャンのセグメントをワーカーに割り当てることはできない（同じアカウントが複数のワーカーで処理される）
+    # そのため各ワーカーは全件をスキャンし、担当シャード以外の項目を捨てる
+    ring = sharding.ConsistentHashRing(shard_count)
+    return (
+        mapping for mapping in user_mappings
+        if ring.get_shard(validator.normalize_note_username(mapping['note_username'])) == shard_index
+    )
+
+def run_concurrently(func, items: list, max_workers: int) -> list:
+    """
+    itemsの各要素に対してfuncを実行し、結果を入力順のリストで返す
+    max_workersが1以下の場合は逐次実行する
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    return list(get_scheduled_executor(max_workers).map(func, items))
+
+def get_scheduled_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    プロセス全体で共有する、同時実行数max_workersのスレッドプールを返す（初回の呼び出し時に作成する）
+    同時実行数が変わった場合は作成し直す
+    """
+    global _scheduled_executor, _scheduled_executor_workers
+    with _scheduled_executor_lock:
+        if _scheduled_executor is None or _scheduled_executor_workers != max_workers:
+            if _scheduled_executor is not None:
+                _scheduled_executor.shutdown(wait=False)
+            _scheduled_executor = ThreadPoolExecutor(max_workers=max_workers)
+            _scheduled_executor_workers = max_workers
+        return _scheduled_executor
+
+def iter_batches(items, batch_size: int):
+    """
+    イテレータからbatch_size件ずつ取り出してリストで返すジェネレータ
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def group_mappings_by_note_username(user_mappings: list) -> dict:
+    """
+    ユーザーマッピングを正規化したnote.comユーザー名ごとにまとめる
+    戻り値は {note_username: [line_user_id, ...]} の形式で、登場順を保持する
+    """
+    groups = {}
+    for mapping in user_mappings:
+        note_username = validator.normalize_note_username(mapping['note_username'])
+        subscribers = groups.setdefault(note_username, {})
+        subscribers[mapping['line_user_id']] = None
+    return {note_username: list(subscribers) for note_username, subscribers in groups.items()}
+
+def get_notify_min_change(mapping: dict) -> int:
+    """
+    ユーザーマッピングに設定された、通知するフォロワー数の変化の下限を返す
+    未設定または不正な値の場合はDEFAULT_NOTIFY_MIN_CHANGE
+    """
+    value = mapping.get('notify_min_change')
+    if value is None:
+        return DEFAULT_NOTIFY_MIN_CHANGE
+
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_NOTIFY_MIN_CHANGE
+
+def group_notify_min_changes(user_mappings: list) -> dict:
+    """
+    ユーザーマッピングから、{(正規化したnote.comユーザー名, line_user_id): 通知する変化の下限} を作成する
+    同じ組み合わせが複数ある場合は小さい方を使う
+    """
+    min_changes = {}
+    for mapping in user_mappings:
+        key = (validator.normalize_note_username(mapping['note_username']), mapping['line_user_id'])
+        min_change = get_notify_min_change(mapping)
+        min_changes[key] = min(min_change, min_changes.get(key, min_change))
+    return min_changes
+
+def group_last_notified_followers_counts(user_mappings: list) -> dict:
+    """
+    ユーザーマッピングから、{(正規化したnote.comユーザー名, line_user_id): 最後に通知したフォロワー数} を作成する
+    まだ通知していない場合はNone
+    """
+    last_notified = {}
+    for mapping in user_mappings:
+        key = (validator.normalize_note_username(mapping['note_username']), mapping['line_user_id'])
+        value = mapping.get('last_notified_followers_count')
+        if value is not None or key not in last_notified:
+            last_notified[key] = int(value) if value is not None else None
+    return last_notified
+
+def group_mapping_note_usernames(user_mappings: list) -> dict:
+    """
+    ユーザーマッピングから、{(正規化したnote.comユーザー名, line_user_id): [保存されているnote.comユーザー名, ...]} を作成する
+    最後に通知したフォロワー数を、保存されているキーのマッピングに書き込むために使う
+    """
+    note_usernames = {}
+    for mapping in user_mappings:
+        key = (validator.normalize_note_username(mapping['note_username']), mapping['line_user_id'])
+        note_usernames.setdefault(key, []).append(mapping['note_username'])
+    return note_usernames
+
+def get_subscriber_followers_change(update: dict, last_notified_count):
+    """
+    ユーザーに最後に通知した時点からのフォロワー数の増減を返す
+    まだ通知していない場合は前回の取得からの増減、比較できない場合はNone
+    """
+    if last_notified_count is None or update.get('followers_count') is None:
+        return update['followers_change']
+    return update['followers_count'] - last_notified_count
+
+def should_notify(followers_change, min_change: int, anomaly: bool = False) -> bool:
+    """
+    最後に通知した時点からのフォロワー数の増減がmin_change以上の場合に通知する
+    増減を比較できない場合（初回の取得や取得の失敗）は、変化があったものとして通知する
+    いつもと比べて急な増減（anomaly）の場合は、min_changeに関わらず通知する
+    """
+    return anomaly or followers_change is None or abs(followers_change) >= min_change
+
+def fetch_account_update(note_username: str, run_started_at: int = None) -> dict:
+    """
+    1アカウント分のnote.comの情報を取得し、送信用メッセージとフォロワー数の増減を返す
+    他のアカウントの処理に影響しないよう、失敗した場合は例外を握りつぶしてNoneを返す
+    """
+    try:
+        return get_note_account_update_for_user(note_username, run_started_at)
+    except Exception as e:
+        print(f"Error fetching note.com account {note_username}: {e}")
+        return None
+
+def deliver_message(delivery: tuple) -> int:
+    """
+    同じメッセージを送信先のLINEユーザー全員に送信し、送信に失敗した人数を返す
+    送信先が1人の場合はプッシュ、複数の場合はマルチキャストで送信する
+    他の送信に影響しないよう、例外はここで握りつぶして結果のみを返す
+    """
+    line_user_ids, message = delivery
+
+    try:
+        if len(line_user_ids) == 1:
+            sent = line_handler.send_push_message(line_user_ids[0], message)
+            return 0 if sent is not False else 1
+
+        sent_count = line_handler.send_multicast_message(line_user_ids, message)
+        return len(line_user_ids) - sent_count
+    except Exception as e:
+        print(f"Error notifying users {line_user_ids}: {e}")
+        return len(line_user_ids)
+
+def notify_account(note_username: str, line_user_ids: list, updates_by_account: dict,
+                   min_changes: dict = None, last_notified: dict = None, store=None,
+                   mapping_note_usernames: dict = None, run_started_at: int = None) -> tuple:
+    """
+    1アカウント分の情報を、そのアカウントの登録ユーザーのうち、最後に通知した時点からのフォロワー数の変化が
+    各ユーザーの下限（min_changes）以上の人に送信する
+    updates_by_accountは実行全体で共有する取得結果で、取得済みのアカウントは再取得しない
+    run_started_atはスケジュール実行の開始日時で、中断する前に記録済みのアカウントは取得し直さない
+    last_notifiedは各ユーザーに最後に通知したフォロワー数で、送信できたユーザーの値はstoreに保存する
+    （まだ通知していないユーザーは、送信しなかった場合も今回のフォロワー数を保存して以降の比較の基準にする）
+    戻り値は (送信に失敗した人数, 変化が下限未満のため送信しなかった人数)
+    """
+    if note_username not in updates_by_account:
+        updates_by_account[note_username] = fetch_account_update(note_username, run_started_at)
+
+    update = updates_by_account[note_username]
+    if update is None:
+        return len(line_user_ids), 0
+
+    min_changes = min_changes or {}
+    last_notified = last_notified or {}
+    recipients = []
+    new_baselines = []
+    for line_user_id in line_user_ids:
+        key = (note_username, line_user_id)
+        last_notified_count = last_notified.get(key)
+        followers_change = get_subscriber_followers_change(update, last_notified_count)
+        if should_notify(followers_change, min_changes.get(key, DEFAULT_NOTIFY_MIN_CHANGE), update.get('anomaly', False)):
+            recipients.append(line_user_id)
+        elif last_notified_count is None:
+            new_baselines.append(line_user_id)
+    skipped_count = len(line_user_ids) - len(recipients)
+
+    # マルチキャストの上限ごとに分割して送信する（送信先がいない場合はLINEのAPIを呼び出さない）
+    # 一部の送信に失敗したチャンクは誰に届いたか分からないため、最後に通知したフォロワー数を更新しない
+    chunk_size = line_handler.LINE_MULTICAST_MAX_RECIPIENTS
+    failed_count = 0
+    for i in range(0, len(recipients), chunk_size):
+        chunk = recipients[i:i + chunk_size]
+        chunk_failed_count = deliver_message((chunk, update['message']))
+        failed_count += chunk_failed_count
+        if chunk_failed_count == 0:
+            new_baselines.extend(chunk)
+
+    if store is not None and update.get('followers_count') is not None:
+        mapping_note_usernames = mapping_note_usernames or {}
+        for line_user_id in new_baselines:
+            for mapping_note_username in mapping_note_usernames.get((note_username, line_user_id), [note_username]):
+                store.update_last_notified_followers_count(line_user_id, mapping_note_username, update['followers_count'])
+    return failed_count, skipped_count
+
+def process_mapping_batch(user_mappings: list, updates_by_account: dict, max_workers: int,
+                          has_time_remaining=None, skip_accounts=(), store=None, run_started_at: int = None) -> tuple:
+    """
+    ユーザーマッピングの1バッチ分をアカウント単位で処理する
+    storeを指定した場合は、各ユーザーに最後に通知したフォロワー数を保存する
+    has_time_remainingがFalseを返した後は新しいアカウントの処理を始めない
+    skip_accountsに含まれるアカウントは処理済みとして扱う
+    戻り値は (処理したユーザー数, 送信に失敗した人数, 変化がなく送信しなかった人数,
+              処理済みのアカウント一覧, バッチ内の全アカウントを処理したか)
+    """
+    subscribers_by_account = group_mappings_by_note_username(user_mappings)
+    min_changes = group_notify_min_changes(user_mappings)
+    last_notified = group_last_notified_followers_counts(user_mappings)
+    mapping_note_usernames = group_mapping_note_usernames(user_mappings)
+    pending = [
+        (note_username, line_user_ids)
+        for note_username, line_user_ids in subscribers_by_account.items()
+        if note_username not in skip_accounts
+    ]
+
+    def process_account(account: tuple):
+        note_username, line_user_ids = account
+        if has_time_remaining is not None and not has_time_remaining():
+            return None
+        return notify_account(note_username, line_user_ids, updates_by_account, min_changes,
+                              last_notified, store, mapping_note_usernames, run_started_at)
+
+    results = run_concurrently(process_account, pending, max_workers)
+
+    processed_accounts = [note_username for note_username in subscribers_by_account if note_username in skip_accounts]
+    user_count = 0
+    failed_count = 0
+    skipped_count = 0
+    for (note_username, line_user_ids), result in zip(pending, results):
+        if result is None:
+            continue
+        processed_accounts.append(note_username)
+        user_count += len(line_user_ids)
+        failed_count += result[0]
+        skipped_count += result[1]
+
+    completed = len(processed_accounts) == len(subscribers_by_account)
+    return user_count, failed_count, skipped_count, processed_accounts, completed
+
+def build_deadline_check(context):
+    """
+    Lambdaの残り実行時間がSCHEDULED_DEADLINE_MARGIN_MSより多い間はTrueを返す関数を作成する
+    contextから残り実行時間を取得できない場合はNoneを返す
+    """
+    get_remaining_time_in_millis = getattr(context, 'get_remaining_time_in_millis', None)
+    if not callable(get_remaining_time_in_millis):
+        return None
+
+    # 締め切りは新しいアカウントを始める前にのみ確認するため、始めたアカウントが最長の時間かかっても間に合うようにする
+    margin_ms = max(get_positive_int_env('SCHEDULED_DEADLINE_MARGIN_MS', DEFAULT_SCHEDULED_DEADLINE_MARGIN_MS),
+                    get_account_max_duration_ms())
+    return lambda: get_remaining_time_in_millis() > margin_ms
+
+def get_account_max_duration_ms() -> int:
+    """
+    スケジュール実行で1アカウントの処理にかかりうる最長の時間（ミリ秒）を返す
+    note.comのAPIとプロフィールページの取得、LINEへの送信が、リトライの上限までタイムアウトした場合の合計
+    """
+    fetch_seconds = (note_scraper.NOTE_API_TIMEOUT_SECONDS
+                     + note_scraper.NOTE_RETRY_POLICY.max_total_seconds(note_scraper.NOTE_PROFILE_TIMEOUT_SECONDS))
+    push_seconds = line_handler.LINE_RETRY_POLICY.max_total_seconds(line_handler.LINE_API_TIMEOUT_SECONDS)
+    return int((fetch_seconds + push_seconds) * 1000)
+
+def get_mapping_key(mapping: dict) -> dict:
+    """
+    ユーザーマッピングの主キーを返す（スキャン再開時のExclusiveStartKeyに使用）
+    """
+    return {
+        'line_user_id': mapping['line_user_id'],
+        'note_username': mapping['note_username']
+    }
+
+def get_scheduled_dispatcher(context):
+    """
+    ワーカーイベントを送るディスパッチャを作成する
+    呼び出し先はSCHEDULED_WORKER_FUNCTION_NAME、未設定の場合は自分自身の関数
+    """
+    function_name = os.environ.get('SCHEDULED_WORKER_FUNCTION_NAME') or context.function_name
+    return sharding.LambdaDispatcher(function_name)
+
+def handle_scheduled_coordination(context, dispatcher=None):
+    """
+    分割されたスケジュール実行のコーディネーター処理
+    ユーザーをnote.comユーザー名のコンシステントハッシュでSCHEDULED_SHARD_COUNT個のシャードに分け、
+    シャードごとにワーカーを呼び出す
+    """
+    if dispatcher is None:
+        dispatcher = get_scheduled_dispatcher(context)
+
+    events = sharding.build_worker_events(get_scheduled_shard_count())
+    dispatched_count = dispatcher.dispatch(events)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(f'Dispatched {dispatched_count}/{len(events)} scheduled workers')
+    }
+
+def handle_scheduled_execution(context, shard_index: int = 0, shard_count: int = 1,
+                               cursor: dict = None, dispatcher=None):
     """
     スケジュール実行時の処理
-    DynamoDBから全ユーザーを取得し、各ユーザーに対してnote.comの情報を送信
+    DynamoDBの全ユーザーをスキャンしながらSCHEDULED_BATCH_SIZE件ずつ処理し、
+    note.comのアカウントごとに1度だけ情報を取得して
+    そのアカウントを登録している全ユーザーに送信する（複数人の場合はマルチキャスト）
+    各ユーザーに最後に通知した時点からのフォロワー数の変化が、そのユーザーの下限（notify_min_change）未満の場合は送信しない
+    ただし、いつもと比べて急な増減の場合は下限に関わらず送信する
+    SCHEDULED_MAX_WORKERSが2以上の場合は、その数を上限に並列で処理する
+    SCHEDULED_SCAN_SEGMENTSが2以上の場合は、DynamoDBを並列スキャンする
+    shard_countが2以上の場合は、担当シャードのnote.comアカウントのみを処理する
+
+    Lambdaの残り実行時間が少なくなった場合は、処理中のバッチの先頭キー、そのバッチで処理済みのアカウント、
+    実行の開始日時をカーソルとして保存し、続きを処理する呼び出しを行う
+    cursorを指定した場合は、そのカーソルから処理を再開する
+    （開始日時以降に履歴に記録済みのアカウントは取得し直さず、履歴にも追加し直さずに、記録した値を送信する）
+    続きの呼び出しに失敗した場合は、カーソルをDynamoDBに保存し、次のスケジュール実行がそこから再開する
+    並列スキャンは順序が一定でないため、中断・再開は通常のスキャンのときのみ行う
     """
-    db = db_handler.DynamoDBHandler()
+    db = db_handler.get_db_handler()
+    note_scraper.set_note_account_store(db)
+    rejected_before = note_scraper.NOTE_CIRCUIT_BREAKER.snapshot()['rejected_count']
+
+    if cursor:
+        run_started_at = cursor.get('run_started_at')
+    else:
+        run_started_at = int(time.time())
+        # 前回のスケジュール実行が続きの呼び出しに失敗していた場合は、保存したカーソルの位置から再開する
+        # 中断した実行とは別の回のため、中断前に処理したアカウントも取得し直して履歴に追加する
+        saved_cursor = db.pop_scheduled_cursor(shard_index, shard_count)
+        if isinstance(saved_cursor, dict):
+            print(f"Resuming the scheduled execution from the saved cursor: {json.dumps(saved_cursor)}")
+            cursor = dict(saved_cursor, run_started_at=run_started_at)
+
+    max_workers = get_scheduled_max_workers()
+    scan_segments = 1 if cursor else get_scheduled_scan_segments()
+    has_time_remaining = build_deadline_check(context) if scan_segments == 1 else None
+    # 中断前に処理したアカウントは、履歴に記録した値から送信する（run_started_atで判定する）
+    updates_by_account = {}
+    user_count = 0
+    failed_count = 0
+    skipped_count = 0
+
+    batch_start_key = cursor.get('exclusive_start_key') if cursor else None
+    skip_accounts = set(cursor.get('processed_accounts', [])) if cursor else set()
+    paused_cursor = None
+
+    # スキャン結果のページを待たずに、届いた分からバッチ単位で処理する
+    user_mappings_stream = iter_scheduled_user_mappings(
+        db, shard_index, shard_count, scan_segments, batch_start_key
+    )
+    for user_mappings in iter_batches(user_mappings_stream, SCHEDULED_BATCH_SIZE):
+        batch_user_count, batch_failed_count, batch_skipped_count, processed_accounts, completed = process_mapping_batch(
+            user_mappings, updates_by_account, max_workers, has_time_remaining, skip_accounts, db, run_started_at
+        )
+        user_count += batch_user_count
+        failed_count += batch_failed_count
+        skipped_count += batch_skipped_count
 
-    # 全ユーザーマッピングを取得
-    user_mappings = db.get_all_user_mappings()
+        if not completed:
+            paused_cursor = {
+                'exclusive_start_key': batch_start_key,
+                'processed_accounts': processed_accounts,
+                'run_started_at': run_started_at
+            }
+            break
 
-    if not user_mappings:
+        batch_start_key = get_mapping_key(user_mappings[-1])
+        skip_accounts = set()
+
+    if user_count == 0 and paused_cursor is None:
         return {
             'statusCode': 200,
             'body': json.dumps('No registered users found')
         }
 
-    # 各ユーザーに対してnote.comの情報を取得・送信
-    for mapping in user_mappings:
-        line_user_id = mapping['line_user_id']
-        note_username = mapping['note_username']
-
-        # note.comの情報を取得
-        message = get_note_dashboard_response_for_user(note_username)
+    summary = (
+        f'Scheduled execution completed for {user_count} users '
+        f'across {len(updates_by_account)} accounts ({failed_count} failed)'
+    )
+    if skipped_count > 0:
+        summary += f', {skipped_count} not notified without follower changes'
+    if shard_count > 1:
+        summary += f' in shard {shard_index + 1}/{shard_count}'
 
-        # LINEで送信
-        line_handler.send_push_message(line_user_id, message)
+    # note.comの障害でサーキットブレーカーが働いた場合は、その状態を結果に含める
+    breaker = note_scraper.NOTE_CIRCUIT_BREAKER.snapshot()
+    rejected_count = breaker['rejected_count'] - rejected_before
+    if rejected_count > 0 or breaker['state'] != CircuitBreaker.CLOSED:
+        summary += f" [note.com circuit breaker {breaker['state']}, {rejected_count} requests rejected]"
 
-    return {
+    response = {
         'statusCode': 200,
-        'body': json.dumps(f'Scheduled execution completed for {len(user_mappings)} users')
+        'body': json.dumps(summary)
     }
 
+    if paused_cursor is not None:
+        # 締め切り前に中断したため、カーソルを渡して続きを処理する呼び出しを行う
+        if dispatcher is None:
+            dispatcher = get_scheduled_dispatcher(context)
+        event = sharding.build_continuation_event(shard_index, shard_count, paused_cursor)
+        if dispatcher.dispatch([event]) == 1:
+            summary += ' (paused before the deadline, continuation dispatched)'
+        else:
+            print(f"Failed to dispatch scheduled continuation: {json.dumps(paused_cursor)}")
+            if db.save_scheduled_cursor(shard_index, shard_count, paused_cursor):
+                summary += ' (paused before the deadline, continuation failed, resuming in the next run)'
+            else:
+                summary += ' (paused before the deadline, continuation failed)'
+        response['body'] = json.dumps(summary)
+        response['cursor'] = paused_cursor
+
+    return response
+
 def handle_line_webhook(event, context):
     """
     LINEからのWebhookイベントを処理
@@ -135,6 +677,14 @@ def handle_line_webhook(event, context):
     # LINEイベント処理（ユーザー名の登録・削除処理）
     line_handler.handle_line_event(body, signature, handle_user_message)
 
+    # 返信の後、古い値を返したオンデマンド取得の取得し直しを、Lambdaが止まる前に終わらせる
+    timeout = None
+    remaining_ms = getattr(context, 'get_remaining_time_in_millis', lambda: None)()
+    if isinstance(remaining_ms, (int, float)):
+        timeout = max(0, remaining_ms - WEBHOOK_DEADLINE_MARGIN_MS) / 1000
+    if not note_scraper.wait_for_revalidations(timeout):
+        print("Timed out waiting for on-demand follower count revalidation.")
+
     return {
         'statusCode': 200,
         'body': json.dumps('OK')
@@ -5,6 +5,28 @@ import sys
 # プロジェクトのルートディレクトリをPythonパスに追加
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+@pytest.fixture(autouse=True)
+def reset_note_circuit_breaker(monkeypatch):
+    """テスト間でnote.comのサーキットブレーカーと最後に取得した情報・検証子・キャッシュを共有しないようにする"""
+    from app import note_scraper
+    from app.circuit_breaker import CircuitBreaker
+    monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', CircuitBreaker())
+    monkeypatch.setattr(note_scraper, '_last_known_dashboard_info', {})
+    monkeypatch.setattr(note_scraper, '_profile_validators', {})
+    monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', None)
+    monkeypatch.setattr(note_scraper, 'NOTE_DASHBOARD_CACHE', note_scraper.create_note_dashboard_cache())
+    yield
+    # 裏で動いている取得し直しが次のテストに影響しないように待つ
+    note_scraper.wait_for_revalidations(timeout=5)
+
+@pytest.fixture(autouse=True)
+def reset_db_handler():
+    """テスト間でプロセス全体のDynamoDBHandlerを共有しないようにする（各テストでパッチしたクラスから作成し直す）"""
+    from app import db_handler
+    db_handler.set_db_handler(None)
+    yield
+    db_handler.set_db_handler(None)
+
 @pytest.fixture
 def sample_note_url():
     """テスト用のnote.com URL"""
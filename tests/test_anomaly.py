@@ -0,0 +1,93 @@
+import pytest
+from app import anomaly
+from app.anomaly import update_anomaly_state, revert_anomaly_state, is_anomalous
+
+
+def learn(changes, state=None):
+    """増減を順に学習させ、最後の状態とZスコアの一覧を返す"""
+    scores = []
+    for change in changes:
+        state, score = update_anomaly_state(state, change)
+        scores.append(score)
+    return state, scores
+
+
+class TestUpdateAnomalyState:
+    """増減の指数移動平均・分散による急な増減の判定のテスト"""
+
+    def test_初回は増減をそのまま平均にする(self):
+        state, score = update_anomaly_state(None, 5)
+
+        assert state == {'mean': 5.0, 'variance': 0.0, 'samples': 1}
+        assert score is None
+
+    def test_学習が足りない間は判定しない(self):
+        _, scores = learn([3] * anomaly.ANOMALY_MIN_SAMPLES)
+
+        assert scores == [None] * anomaly.ANOMALY_MIN_SAMPLES
+
+    def test_いつも通りの増減は急な増減とみなさない(self):
+        state, _ = learn([2, 4, 3, 5, 2, 3, 4, 3, 2, 4, 3, 5, 3, 4, 2, 3])
+
+        _, score = update_anomaly_state(state, 4)
+
+        assert not is_anomalous(score)
+
+    def test_急な減少を検知する(self):
+        state, _ = learn([2, 4, 3, 5, 2, 3, 4, 3, 2, 4, 3, 5, 3, 4, 2, 3])
+
+        _, score = update_anomaly_state(state, -50)
+
+        assert score < -anomaly.ANOMALY_Z_THRESHOLD
+        assert is_anomalous(score)
+
+    def test_増減がないアカウントの1人の増減は急な増減とみなさない(self):
+        state, _ = learn([0] * 20)
+
+        _, score = update_anomaly_state(state, 1)
+
+        # 標準偏差の下限により、Zスコアは増減の人数を超えない
+        assert score == pytest.approx(1)
+        assert not is_anomalous(score)
+
+    def test_Zスコアが大きくても小さな増減は急な増減とみなさない(self):
+        state, _ = learn([0] * 20)
+
+        _, score = update_anomaly_state(state, 5)
+
+        assert is_anomalous(score)
+        assert not is_anomalous(score, 5, 300)
+        assert is_anomalous(score, anomaly.ANOMALY_MIN_CHANGE, 300)
+        # フォロワー数が多いアカウントでは、フォロワー数に対する割合で下限が決まる
+        assert anomaly.get_min_anomalous_change(50000) == 500
+        assert not is_anomalous(score, -100, 50000)
+        assert is_anomalous(score, -500, 50000)
+
+    def test_増減の水準が変わった場合は追従する(self):
+        state, _ = learn([0] * 20)
+        state, scores = learn([100] * 60, state)
+
+        assert is_anomalous(scores[0])
+        assert not is_anomalous(scores[-1])
+        assert state['mean'] == pytest.approx(100, abs=1)
+        assert state['samples'] == 80
+
+    def test_更新前の状態を復元して同じZスコアを求められる(self):
+        previous, _ = learn([2, 4, 3, 5, 2, 3, 4, 3, 2, 4, 3, 5, 3])
+        state, score = update_anomaly_state(previous, -60)
+
+        restored = revert_anomaly_state(state, -60)
+
+        assert restored['mean'] == pytest.approx(previous['mean'])
+        assert restored['variance'] == pytest.approx(previous['variance'])
+        assert restored['samples'] == previous['samples']
+        assert update_anomaly_state(restored, -60)[1] == pytest.approx(score)
+
+    def test_初回の更新で作成された状態は復元するとNone(self):
+        state, _ = update_anomaly_state(None, 5)
+
+        assert revert_anomaly_state(state, 5) is None
+        assert revert_anomaly_state(None, 5) is None
+
+    def test_判定できない場合は急な増減とみなさない(self):
+        assert is_anomalous(None) is False
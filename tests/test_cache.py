@@ -0,0 +1,69 @@
+import pytest
+from app.cache import TTLCache
+
+
+class FakeClock:
+    """テスト用の進めることのできる時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """TTLCacheのテスト"""
+
+    def test_保存した値を取得できる(self):
+        cache = TTLCache(max_entries=2, ttl=10, clock=FakeClock())
+
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'evictions': 0, 'expirations': 0}
+
+    def test_有効期限を過ぎた値は返さない(self):
+        clock = FakeClock()
+        cache = TTLCache(max_entries=2, ttl=10, clock=clock)
+        cache.set('a', 1)
+
+        clock.now = 9.9
+        assert cache.get('a') == 1
+        clock.now = 10.0
+        assert cache.get('a') is None
+
+        assert len(cache) == 0
+        assert cache.stats()['expirations'] == 1
+
+    def test_上限を超えると最も長く使われていない値を捨てる(self):
+        cache = TTLCache(max_entries=2, ttl=10, clock=FakeClock())
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # aを使ったため、bが最も長く使われていない値になる
+        cache.get('a')
+
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_同じキーに保存すると有効期限が延びる(self):
+        clock = FakeClock()
+        cache = TTLCache(max_entries=2, ttl=10, clock=clock)
+        cache.set('a', 1)
+
+        clock.now = 8.0
+        cache.set('a', 2)
+        clock.now = 15.0
+
+        assert cache.get('a') == 2
+
+    def test_不正な設定(self):
+        with pytest.raises(ValueError):
+            TTLCache(max_entries=0, ttl=10)
+        with pytest.raises(ValueError):
+            TTLCache(max_entries=1, ttl=0)
@@ -0,0 +1,102 @@
+import pytest
+from app.circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    """テスト用の進めることのできる時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **kwargs):
+    options = dict(failure_rate_threshold=0.5, slow_call_seconds=10.0,
+                   window_size=4, minimum_calls=4, open_duration=60.0)
+    options.update(kwargs)
+    return CircuitBreaker(clock=clock, **options)
+
+
+class TestCircuitBreaker:
+    """CircuitBreakerのテスト"""
+
+    def test_最小呼び出し数に満たないうちは開かない(self):
+        breaker = make_breaker(FakeClock())
+
+        for _ in range(3):
+            assert breaker.allow_request()
+            breaker.record(False)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_失敗率が閾値以上になると開いて呼び出しを拒否する(self):
+        breaker = make_breaker(FakeClock())
+
+        for success in [True, False, True, False]:
+            breaker.record(success)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert not breaker.allow_request()
+        assert breaker.snapshot() == {'state': CircuitBreaker.OPEN, 'rejected_count': 2}
+
+    def test_失敗率が閾値未満なら閉じたまま(self):
+        breaker = make_breaker(FakeClock())
+
+        for success in [True, True, True, False]:
+            breaker.record(success)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_遅い呼び出しは失敗として扱われる(self):
+        breaker = make_breaker(FakeClock())
+
+        for _ in range(4):
+            breaker.record(True, duration=12.0)
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_一定時間後に半開になり試行は1件だけ許可される(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(4):
+            breaker.record(False)
+
+        clock.now = 60.0
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+    def test_半開で試行が成功すると閉じる(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(4):
+            breaker.record(False)
+        clock.now = 60.0
+
+        assert breaker.allow_request()
+        breaker.record(True)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        # 過去の失敗は持ち越されない
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_半開で試行が失敗すると再び開く(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(4):
+            breaker.record(False)
+        clock.now = 60.0
+
+        assert breaker.allow_request()
+        breaker.record(False)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 119.0
+        assert not breaker.allow_request()
+        clock.now = 120.0
+        assert breaker.allow_request()
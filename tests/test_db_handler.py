@@ -1,8 +1,11 @@
 import pytest
 import boto3
+from decimal import Decimal
 from unittest.mock import patch, Mock
+from boto3.dynamodb.types import Binary
 from moto import mock_aws
-from app.db_handler import DynamoDBHandler
+from app import db_handler
+from app.db_handler import DynamoDBHandler, DynamoDBClientHandler
 
 
 @mock_aws
@@ -42,6 +45,17 @@ class TestDynamoDBHandler:
         # テーブルが作成されるまで待機
         self.table.wait_until_exists()
     
+    def create_account_table(self):
+        """note.comアカウントごとの情報を保存するテスト用のテーブルを作成"""
+        table = self.dynamodb.create_table(
+            TableName='test-note-monitor-note-accounts',
+            KeySchema=[{'AttributeName': 'note_username', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'note_username', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        table.wait_until_exists()
+        return table
+    
     @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
     @patch('app.db_handler.boto3.resource')
     def test_save_user_mapping_success(self, mock_resource):
@@ -361,4 +375,669 @@ class TestDynamoDBHandler:
         assert len(mappings) == 2
         assert 'note_user1' in mappings
         assert 'note_user3' in mappings
-        assert 'note_user2' not in mappings
\ No newline at end of file
+        assert 'note_user2' not in mappings
+    
+    @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_follows_pagination(self, mock_resource):
+        """複数ページにまたがる場合もLastEvaluatedKeyをたどって全件取得できること"""
+        mock_resource.return_value = self.dynamodb
+        handler = DynamoDBHandler()
+        
+        for i in range(5):
+            handler.save_user_mapping(f'user{i}', f'note_user{i}')
+        
+        # 1ページ2件でスキャン
+        result = list(handler.iter_all_user_mappings(page_size=2))
+        
+        assert len(result) == 5
+        assert {item['line_user_id'] for item in result} == {f'user{i}' for i in range(5)}
+    
+    @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_projects_key_attributes(self, mock_resource):
+        """キー属性以外の属性は取得しないこと"""
+        mock_resource.return_value = self.dynamodb
+        handler = DynamoDBHandler()
+        
+        self.table.put_item(Item={'line_user_id': 'user1', 'note_username': 'note_user1', 'extra': 'ignored'})
+        
+        result = list(handler.iter_all_user_mappings())
+        
+        assert result == [{'line_user_id': 'user1', 'note_username': 'note_user1'}]
+    
+    @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
+    @patch('app.db_handler.boto3.resource')
+    def test_update_notify_min_change(self, mock_resource):
+        """LINEユーザーの全てのマッピングに通知の下限を設定し、スキャンで取得できること"""
+        mock_resource.return_value = self.dynamodb
+        handler = DynamoDBHandler()
+        handler.save_user_mapping('user1', 'note_user1')
+        handler.save_user_mapping('user2', 'note_user2')
+        
+        assert handler.update_notify_min_change('user1', 10) is True
+        
+        result = sorted(handler.iter_all_user_mappings(), key=lambda item: item['line_user_id'])
+        assert result == [
+            {'line_user_id': 'user1', 'note_username': 'note_user1', 'notify_min_change': 10},
+            {'line_user_id': 'user2', 'note_username': 'note_user2'}
+        ]
+    
+    @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
+    @patch('app.db_handler.boto3.resource')
+    def test_update_last_notified_followers_count(self, mock_resource):
+        """最後に通知したフォロワー数が保存され、全件スキャンで取得できること"""
+        mock_resource.return_value = self.dynamodb
+        handler = DynamoDBHandler()
+        handler.save_user_mapping('user123', 'Test_User')
+        
+        assert handler.update_last_notified_followers_count('user123', 'Test_User', 112) is True
+        
+        assert list(handler.iter_all_user_mappings()) == [
+            {'line_user_id': 'user123', 'note_username': 'Test_User', 'last_notified_followers_count': 112}
+        ]
+    
+    @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_resumes_from_key(self, mock_resource):
+        """exclusive_start_keyを指定した場合はその次の項目から再開できること"""
+        mock_resource.return_value = self.dynamodb
+        handler = DynamoDBHandler()
+        
+        for i in range(4):
+            handler.save_user_mapping(f'user{i}', f'note_user{i}')
+        all_items = list(handler.iter_all_user_mappings())
+        
+        result = list(handler.iter_all_user_mappings(exclusive_start_key=all_items[1]))
+        
+        assert result == all_items[2:]
+    
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_is_lazy(self, mock_resource):
+        """次のページは前のページを読み終えるまで取得しないこと"""
+        mock_table = Mock()
+        mock_table.scan.side_effect = [
+            {'Items': [{'line_user_id': 'user1', 'note_username': 'note_user1'}],
+             'LastEvaluatedKey': {'line_user_id': 'user1', 'note_username': 'note_user1'}},
+            {'Items': [{'line_user_id': 'user2', 'note_username': 'note_user2'}]}
+        ]
+        mock_resource.return_value.Table.return_value = mock_table
+        
+        handler = DynamoDBHandler()
+        iterator = handler.iter_all_user_mappings()
+        
+        first = next(iterator)
+        assert first['line_user_id'] == 'user1'
+        assert mock_table.scan.call_count == 1
+        
+        rest = list(iterator)
+        assert [item['line_user_id'] for item in rest] == ['user2']
+        assert mock_table.scan.call_count == 2
+        _, kwargs = mock_table.scan.call_args
+        assert kwargs['ExclusiveStartKey'] == {'line_user_id': 'user1', 'note_username': 'note_user1'}
+    
+    @patch('app.db_handler.boto3.resource')
+    def test_get_all_line_user_ids_follows_pagination(self, mock_resource):
+        """LINEユーザーIDの取得も全ページをたどること"""
+        mock_table = Mock()
+        mock_table.scan.side_effect = [
+            {'Items': [{'line_user_id': 'user1'}], 'LastEvaluatedKey': {'line_user_id': 'user1', 'note_username': 'a'}},
+            {'Items': [{'line_user_id': 'user2'}]}
+        ]
+        mock_resource.return_value.Table.return_value = mock_table
+        
+        handler = DynamoDBHandler()
+        result = handler.get_all_line_user_ids()
+        
+        assert result == ['user1', 'user2']
+        assert mock_table.scan.call_count == 2
+    
+    @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_parallel_returns_all_items_once(self, mock_resource):
+        """並列スキャンで全件を重複なく取得できること"""
+        mock_resource.return_value = self.dynamodb
+        handler = DynamoDBHandler()
+        
+        for i in range(20):
+            handler.save_user_mapping(f'user{i}', f'note_user{i}')
+        
+        result = list(handler.iter_all_user_mappings_parallel(4, page_size=3))
+        
+        assert len(result) == 20
+        assert {item['line_user_id'] for item in result} == {f'user{i}' for i in range(20)}
+    
+    @patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'})
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_parallel_can_be_closed_early(self, mock_resource):
+        """途中で読み込みを打ち切ってもスキャンのスレッドが終了すること"""
+        mock_resource.return_value = self.dynamodb
+        handler = DynamoDBHandler()
+        
+        for i in range(20):
+            handler.save_user_mapping(f'user{i}', f'note_user{i}')
+        
+        with patch('app.db_handler.PARALLEL_SCAN_BUFFER_SIZE', 1):
+            iterator = handler.iter_all_user_mappings_parallel(4, page_size=2)
+            first = next(iterator)
+            iterator.close()
+        
+        assert first['line_user_id'].startswith('user')
+    
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_parallel_uses_segments(self, mock_resource):
+        """各セグメントをSegment/TotalSegmentsを指定してスキャンすること"""
+        segment_tables = [Mock() for _ in range(3)]
+        for segment, table in enumerate(segment_tables):
+            table.scan.return_value = {'Items': [{'line_user_id': f'user{segment}', 'note_username': 'note'}]}
+        # ユーザーテーブルとアカウントテーブルの後に、セグメントごとのテーブルが作成される
+        mock_resource.return_value.Table.side_effect = [Mock(), Mock()] + segment_tables
+        
+        handler = DynamoDBHandler()
+        result = list(handler.iter_all_user_mappings_parallel(3))
+        
+        assert sorted(item['line_user_id'] for item in result) == ['user0', 'user1', 'user2']
+        for segment, table in enumerate(segment_tables):
+            _, kwargs = table.scan.call_args
+            assert kwargs['Segment'] == segment
+            assert kwargs['TotalSegments'] == 3
+        
+        # 2回目以降のスキャンでは、セグメントごとのテーブルを作成し直さない
+        assert len(list(handler.iter_all_user_mappings_parallel(3))) == 3
+        assert mock_resource.return_value.Table.call_count == 5
+    
+    @patch('app.db_handler.boto3.session.Session')
+    @patch('app.db_handler.boto3.resource')
+    def test_boto3のリソースはスレッドごとに作成される(self, mock_resource, mock_session):
+        """共有したハンドラーを複数のスレッドから使っても、boto3のリソースとセッションを共有しないこと"""
+        import threading
+        mock_resource.side_effect = lambda *args, **kwargs: Mock()
+        mock_session.side_effect = lambda *args, **kwargs: Mock(resource=Mock(side_effect=lambda *a, **k: Mock()))
+        handler = DynamoDBHandler()
+        main_table = handler.table
+        tables = {}
+        
+        def use_handler(name):
+            tables[name] = (handler.table, handler.table, handler.account_table)
+        threads = [threading.Thread(target=use_handler, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert handler.table is main_table
+        assert tables['a'][0] is tables['a'][1]
+        assert len({id(main_table), id(tables['a'][0]), id(tables['b'][0])}) == 3
+        assert tables['a'][2] is not handler.account_table
+        # デフォルトセッションを使うのはハンドラーを作成したスレッドのみ
+        assert mock_resource.call_count == 1
+        assert mock_session.call_count == 2
+    
+    @patch('app.db_handler.boto3.resource')
+    def test_iter_all_user_mappings_parallel_single_segment(self, mock_resource):
+        """セグメント数が1の場合は通常のスキャンを行うこと"""
+        mock_table = Mock()
+        mock_table.scan.return_value = {'Items': [{'line_user_id': 'user1', 'note_username': 'note'}]}
+        mock_resource.return_value.Table.return_value = mock_table
+        
+        handler = DynamoDBHandler()
+        result = list(handler.iter_all_user_mappings_parallel(1))
+        
+        assert result == [{'line_user_id': 'user1', 'note_username': 'note'}]
+        _, kwargs = mock_table.scan.call_args
+        assert 'Segment' not in kwargs
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_save_follower_snapshot_with_validators(self, mock_resource):
+        """フォロワー数のスナップショットを検証子とともに保存して取得できること"""
+        mock_resource.return_value = self.dynamodb
+        table = self.create_account_table()
+        handler = DynamoDBHandler()
+        validators = {
+            'request_url': 'https://note.com/api/v2/creators/test_user',
+            'etag': '"abc"',
+            'last_modified': None,
+            'followers_count': 1234
+        }
+        
+        assert handler.save_follower_snapshot('test_user', 1234, 1700000000, validators) is True
+        
+        assert handler.get_follower_snapshot('test_user') == {'followers_count': 1234, 'fetched_at': 1700000000}
+        assert handler.get_profile_validators('test_user') == validators
+        item = table.get_item(Key={'note_username': 'test_user'})['Item']
+        assert item['expires_at'] == 1700000000 + db_handler.FOLLOWER_SNAPSHOT_TTL_SECONDS
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_save_follower_snapshot_without_validators_removes_old_validators(self, mock_resource):
+        """検証子なしで保存した場合は以前の検証子が削除され、他の属性は残ること"""
+        mock_resource.return_value = self.dynamodb
+        table = self.create_account_table()
+        table.put_item(Item={'note_username': 'test_user', 'other': 'value'})
+        handler = DynamoDBHandler()
+        handler.save_follower_snapshot('test_user', 10, 1700000000, {
+            'request_url': 'https://note.com/test_user',
+            'etag': None,
+            'last_modified': 'Wed, 21 Oct 2026 07:28:00 GMT',
+            'followers_count': 10
+        })
+        
+        handler.save_follower_snapshot('test_user', 11, 1700003600)
+        
+        item = table.get_item(Key={'note_username': 'test_user'})['Item']
+        assert item['other'] == 'value'
+        assert item['followers_count'] == 11
+        assert 'last_modified' not in item
+        assert handler.get_profile_validators('test_user') is None
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_get_follower_snapshot_nonexistent(self, mock_resource):
+        """スナップショットや検証子が保存されていない場合はNoneを返すこと"""
+        mock_resource.return_value = self.dynamodb
+        self.create_account_table()
+        handler = DynamoDBHandler()
+        
+        assert handler.get_follower_snapshot('unknown') is None
+        assert handler.get_profile_validators('unknown') is None
+    
+    @patch('app.db_handler.boto3.resource')
+    def test_get_profile_validators_client_error(self, mock_resource):
+        """DynamoDB ClientErrorが発生した場合はNoneを返すこと"""
+        from botocore.exceptions import ClientError
+        
+        mock_table = Mock()
+        mock_table.get_item.side_effect = ClientError(
+            {'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Test error'}},
+            'get_item'
+        )
+        mock_resource.return_value.Table.return_value = mock_table
+        
+        handler = DynamoDBHandler()
+        
+        assert handler.get_profile_validators('test_user') is None
+    
+    @patch('app.db_handler.boto3.resource')
+    def test_save_follower_snapshot_client_error(self, mock_resource):
+        """DynamoDB ClientErrorが発生した場合はFalseを返すこと"""
+        from botocore.exceptions import ClientError
+        
+        mock_table = Mock()
+        mock_table.update_item.side_effect = ClientError(
+            {'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Test error'}},
+            'update_item'
+        )
+        mock_resource.return_value.Table.return_value = mock_table
+        
+        handler = DynamoDBHandler()
+        
+        assert handler.save_follower_snapshot('test_user', 1, 1700000000) is False
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_append_follower_history(self, mock_resource):
+        """フォロワー数の履歴に追加した順で取得でき、スナップショットと検証子も同じ更新で保存されること"""
+        mock_resource.return_value = self.dynamodb
+        self.create_account_table()
+        handler = DynamoDBHandler()
+        validators = {
+            'request_url': 'https://note.com/api/v2/creators/test_user',
+            'etag': '"abc"',
+            'last_modified': None,
+            'followers_count': 12
+        }
+        handler.save_follower_snapshot('test_user', 10, 1700000000)
+        
+        assert handler.get_follower_history('test_user') == []
+        assert handler.append_follower_history('test_user', 10, 1700000000) is True
+        record = handler.get_follower_record('test_user')
+        assert handler.append_follower_history('test_user', 12, 1700003600, record['history'], validators=validators) is True
+        
+        assert handler.get_follower_history('test_user') == [
+            {'fetched_at': 1700000000, 'followers_count': 10},
+            {'fetched_at': 1700003600, 'followers_count': 12}
+        ]
+        assert handler.get_follower_snapshot('test_user') == {'followers_count': 12, 'fetched_at': 1700003600}
+        assert handler.get_follower_record('test_user')['validators'] == validators
+        
+        # 検証子のない取得では以前の検証子を削除する
+        handler.append_follower_history('test_user', 13, 1700007200)
+        assert handler.get_profile_validators('test_user') is None
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_append_follower_history_does_not_overwrite_concurrent_update(self, mock_resource):
+        """履歴を読み込んだ後に他の実行が追加していた場合は、上書きせずにFalseを返すこと"""
+        mock_resource.return_value = self.dynamodb
+        self.create_account_table()
+        handler = DynamoDBHandler()
+        handler.append_follower_history('test_user', 10, 1700000000)
+        history = handler.get_follower_history_arrays('test_user')
+        
+        assert handler.append_follower_history('test_user', 12, 1700003600, history) is True
+        assert handler.append_follower_history('test_user', 12, 1700003601, history) is False
+        # 履歴がない状態で読み込んだ実行も、他の実行が追加した履歴を上書きしない
+        assert handler.append_follower_history('test_user', 11, 1700000001, tuple(array[:0] for array in history)) is False
+        
+        assert [entry['fetched_at'] for entry in handler.get_follower_history('test_user')] == [1700000000, 1700003600]
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_append_follower_history_drops_oldest_entries(self, mock_resource, monkeypatch):
+        """履歴が上限に達している場合は古いものから捨てること"""
+        monkeypatch.setattr(db_handler, 'FOLLOWER_HISTORY_MAX_ENTRIES', 3)
+        mock_resource.return_value = self.dynamodb
+        self.create_account_table()
+        handler = DynamoDBHandler()
+        for i in range(5):
+            handler.append_follower_history('test_user', i, 1700000000 + i, handler.get_follower_history_arrays('test_user'))
+        
+        assert [entry['followers_count'] for entry in handler.get_follower_history('test_user')] == [2, 3, 4]
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_follower_history_is_stored_as_packed_binary(self, mock_resource):
+        """履歴はまとめたBinary属性として保存され、以前のリスト形式の履歴も読み込めること"""
+        mock_resource.return_value = self.dynamodb
+        table = self.create_account_table()
+        table.put_item(Item={
+            'note_username': 'test_user',
+            'follower_history': [{'fetched_at': 1700000000, 'followers_count': 10}]
+        })
+        handler = DynamoDBHandler()
+        
+        assert handler.get_follower_history('test_user') == [{'fetched_at': 1700000000, 'followers_count': 10}]
+        handler.append_follower_history('test_user', 12, 1700003600)
+        
+        item = table.get_item(Key={'note_username': 'test_user'})['Item']
+        assert isinstance(item['follower_history'], Binary)
+        assert handler.get_follower_history('test_user') == [
+            {'fetched_at': 1700000000, 'followers_count': 10},
+            {'fetched_at': 1700003600, 'followers_count': 12}
+        ]
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_follower_record_includes_anomaly_state(self, mock_resource):
+        """増減の異常検知の状態は履歴と同じ更新で保存され、履歴と一緒に取得できること"""
+        mock_resource.return_value = self.dynamodb
+        self.create_account_table()
+        handler = DynamoDBHandler()
+        
+        assert handler.get_follower_record('test_user')['anomaly_state'] is None
+        handler.append_follower_history('test_user', 10, 1700000000)
+        assert handler.get_follower_record('test_user')['anomaly_state'] is None
+        
+        state = {'mean': 2.5, 'variance': 0.1 + 0.2, 'samples': 13}
+        handler.append_follower_history('test_user', 12, 1700003600, anomaly_state=state)
+        handler.append_follower_history('test_user', 15, 1700007200)
+        
+        record = handler.get_follower_record('test_user')
+        assert record['anomaly_state'] == state
+        assert record['history'][1].tolist() == [10, 12, 15]
+    
+    @patch('app.db_handler.boto3.resource')
+    def test_append_follower_history_client_error(self, mock_resource):
+        """DynamoDB ClientErrorが発生した場合は、取得は空のリスト、追加はFalseを返すこと"""
+        from botocore.exceptions import ClientError
+        
+        mock_table = Mock()
+        error = ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Test error'}}, 'update_item')
+        mock_table.get_item.side_effect = error
+        mock_table.update_item.side_effect = error
+        mock_resource.return_value.Table.return_value = mock_table
+        
+        handler = DynamoDBHandler()
+        
+        assert handler.get_follower_history('test_user') == []
+        assert handler.append_follower_history('test_user', 1, 1700000000) is False
+    
+    @patch.dict('os.environ', {'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'})
+    @patch('app.db_handler.boto3.resource')
+    def test_scheduled_cursor(self, mock_resource):
+        """スケジュール実行のカーソルはシャードごとに保存され、1回だけ取り出せること"""
+        mock_resource.return_value = self.dynamodb
+        self.create_account_table()
+        handler = DynamoDBHandler()
+        cursor = {
+            'exclusive_start_key': {'line_user_id': 'user3', 'note_username': 'test_user'},
+            'processed_accounts': ['test_user'],
+            'run_started_at': 1700000000
+        }
+        
+        assert handler.pop_scheduled_cursor(0, 2) is None
+        assert handler.save_scheduled_cursor(0, 2, cursor) is True
+        
+        assert handler.pop_scheduled_cursor(1, 2) is None
+        assert handler.pop_scheduled_cursor(0, 2) == cursor
+        assert handler.pop_scheduled_cursor(0, 2) is None
+
+
+@mock_aws
+class TestDynamoDBClientHandler:
+    """boto3のクライアントを使うDynamoDBHandlerのテスト（DynamoDBHandlerと同じ結果になること）"""
+    
+    def setup_method(self, method):
+        """テスト前の準備"""
+        self.client = boto3.client('dynamodb', region_name='us-east-1')
+        self.dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.table = self.dynamodb.create_table(
+            TableName='test-note-monitor-users',
+            KeySchema=[
+                {'AttributeName': 'line_user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'note_username', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'line_user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'note_username', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.account_table = self.dynamodb.create_table(
+            TableName='test-note-monitor-note-accounts',
+            KeySchema=[{'AttributeName': 'note_username', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'note_username', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+    
+    def create_handler(self):
+        with patch('app.db_handler.boto3.client', return_value=self.client), \
+                patch.dict('os.environ', {
+                    'DYNAMODB_TABLE_NAME': 'test-note-monitor-users',
+                    'NOTE_ACCOUNT_TABLE_NAME': 'test-note-monitor-note-accounts'
+                }):
+            return DynamoDBClientHandler()
+    
+    def test_user_mappings(self):
+        """ユーザーマッピングの保存・取得・カウント・削除ができること"""
+        handler = self.create_handler()
+        
+        assert handler.save_user_mapping('user123', 'test_user') is True
+        assert handler.save_user_mapping('user123', 'other_user') is True
+        
+        assert handler.count_user_mappings('user123') == 2
+        assert sorted(handler.get_user_mappings('user123')) == ['other_user', 'test_user']
+        assert handler.delete_user_mapping('user123', 'other_user') is True
+        assert handler.get_user_mappings('user123') == ['test_user']
+        assert handler.delete_user_mapping('user123') is True
+        assert handler.count_user_mappings('user123') == 0
+    
+    def test_iter_all_user_mappings_matches_resource_handler(self):
+        """全件スキャンの結果が、リソースを使うDynamoDBHandlerと同じ値・型になること"""
+        for i in range(5):
+            self.table.put_item(Item={'line_user_id': f'user{i}', 'note_username': f'note_user{i}'})
+        handler = self.create_handler()
+        handler.update_notify_min_change('user3', 10)
+        with patch('app.db_handler.boto3.resource', return_value=self.dynamodb), \
+                patch.dict('os.environ', {'DYNAMODB_TABLE_NAME': 'test-note-monitor-users'}):
+            resource_handler = DynamoDBHandler()
+        
+        items = list(handler.iter_all_user_mappings(page_size=2))
+        
+        assert items == list(resource_handler.iter_all_user_mappings())
+        assert {'line_user_id': 'user3', 'note_username': 'note_user3', 'notify_min_change': Decimal(10)} in items
+        assert sorted(handler.get_all_line_user_ids()) == [f'user{i}' for i in range(5)]
+    
+    def test_iter_all_user_mappings_resumes_from_key(self):
+        """指定したキーの次の項目からスキャンを再開できること"""
+        for i in range(5):
+            self.table.put_item(Item={'line_user_id': f'user{i}', 'note_username': f'note_user{i}'})
+        handler = self.create_handler()
+        items = list(handler.iter_all_user_mappings())
+        start_key = {'line_user_id': items[1]['line_user_id'], 'note_username': items[1]['note_username']}
+        
+        assert list(handler.iter_all_user_mappings(exclusive_start_key=start_key)) == items[2:]
+    
+    def test_iter_all_user_mappings_parallel_returns_all_items_once(self):
+        """並列スキャンで全件を1回ずつ返し、全セグメントで同じクライアントを使うこと"""
+        for i in range(20):
+            self.table.put_item(Item={'line_user_id': f'user{i}', 'note_username': f'note_user{i}'})
+        handler = self.create_handler()
+        
+        items = list(handler.iter_all_user_mappings_parallel(4, page_size=3))
+        
+        assert sorted(item['line_user_id'] for item in items) == sorted(f'user{i}' for i in range(20))
+        assert handler._acquire_segment_tables(4) == [handler.table] * 4
+    
+    def test_follower_snapshot_and_history(self):
+        """スナップショット・検証子・履歴・異常検知の状態を保存して取得できること"""
+        handler = self.create_handler()
+        validators = {
+            'request_url': 'https://note.com/api/v2/creators/test_user',
+            'etag': '"abc"',
+            'last_modified': None,
+            'followers_count': 10
+        }
+        state = {'mean': 2.5, 'variance': 0.1 + 0.2, 'samples': 13}
+        
+        assert handler.save_follower_snapshot('test_user', 10, 1700000000, validators) is True
+        assert handler.get_profile_validators('test_user') == validators
+        assert handler.append_follower_history('test_user', 10, 1700000000) is True
+        validators = dict(validators, followers_count=12)
+        assert handler.append_follower_history('test_user', 12, 1700003600, anomaly_state=state, validators=validators) is True
+        
+        assert handler.get_follower_snapshot('test_user') == {'followers_count': 12, 'fetched_at': 1700003600}
+        record = handler.get_follower_record('test_user')
+        assert record['validators'] == validators
+        assert record['anomaly_state'] == state
+        assert record['history'][1].tolist() == [10, 12]
+        # リソースから読み込んでも同じ型で保存されている
+        item = self.account_table.get_item(Key={'note_username': 'test_user'})['Item']
+        assert isinstance(item['follower_history'], Binary)
+        assert item['expires_at'] == 1700003600 + db_handler.FOLLOWER_SNAPSHOT_TTL_SECONDS
+        
+        handler.save_follower_snapshot('test_user', 11, 1700007200)
+        assert handler.get_profile_validators('test_user') is None
+    
+    def test_scheduled_cursor(self):
+        """スケジュール実行のカーソルを保存して取り出せること"""
+        handler = self.create_handler()
+        cursor = {'exclusive_start_key': None, 'processed_accounts': [], 'run_started_at': 1700000000}
+        
+        assert handler.save_scheduled_cursor(0, 1, cursor) is True
+        assert handler.pop_scheduled_cursor(0, 1) == cursor
+        assert handler.pop_scheduled_cursor(0, 1) is None
+    
+    def test_client_error(self):
+        """DynamoDB ClientErrorが発生した場合は、DynamoDBHandlerと同じく失敗を表す値を返すこと"""
+        self.client.delete_table(TableName='test-note-monitor-users')
+        self.client.delete_table(TableName='test-note-monitor-note-accounts')
+        handler = self.create_handler()
+        
+        assert handler.save_user_mapping('user123', 'test_user') is False
+        assert handler.get_user_mappings('user123') == []
+        assert list(handler.iter_all_user_mappings()) == []
+        assert handler.get_follower_snapshot('test_user') is None
+        assert handler.append_follower_history('test_user', 1, 1700000000) is False
+        assert handler.save_scheduled_cursor(0, 1, {'run_started_at': 1700000000}) is False
+        assert handler.pop_scheduled_cursor(0, 1) is None
+
+
+class TestAttributeMarshalling:
+    """boto3のクライアント用の属性値の変換のテスト"""
+    
+    def test_リソースの変換と同じ形式に変換して元に戻せる(self):
+        from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+        item = {
+            'line_user_id': 'user123',
+            'notify_min_change': 10,
+            'mean': Decimal('2.5'),
+            'etag': None,
+            'enabled': True,
+            'follower_history': Binary(b'\x00\x01'),
+            'follower_anomaly': {'mean': Decimal('0.5'), 'samples': 3},
+            'tags': ['a', 1]
+        }
+        
+        marshalled = db_handler._marshal_item(item)
+        
+        serializer = TypeSerializer()
+        assert marshalled == {name: serializer.serialize(value) for name, value in item.items()}
+        deserializer = TypeDeserializer()
+        expected = {name: deserializer.deserialize(value) for name, value in marshalled.items()}
+        assert db_handler._unmarshal_item(marshalled) == expected
+    
+    def test_対応していない型はTypeError(self):
+        with pytest.raises(TypeError):
+            db_handler._marshal_item({'followers_count': 1.5})
+
+
+class TestGetDbHandler:
+    """プロセス全体で共有するDynamoDBHandlerのテスト"""
+
+    @patch('app.db_handler.DynamoDBHandler')
+    def test_初回の呼び出し時に作成して以降は再利用する(self, mock_handler_class):
+        first = db_handler.get_db_handler()
+        second = db_handler.get_db_handler()
+
+        assert first is second is mock_handler_class.return_value
+        mock_handler_class.assert_called_once_with()
+
+    @patch('app.db_handler.DynamoDBHandler')
+    def test_複数のスレッドから同時に呼び出しても作成は1回だけ(self, mock_handler_class):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        # 作成に時間がかかる間に、他のスレッドからも呼び出される
+        started = threading.Barrier(8)
+
+        def create():
+            time.sleep(0.05)
+            return Mock()
+        mock_handler_class.side_effect = create
+
+        def get():
+            started.wait()
+            return db_handler.get_db_handler()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            handlers = list(executor.map(lambda _: get(), range(8)))
+
+        assert len({id(handler) for handler in handlers}) == 1
+        mock_handler_class.assert_called_once_with()
+
+    @patch('app.db_handler.DynamoDBHandler')
+    def test_差し替えたハンドラーを返す(self, mock_handler_class):
+        override = Mock()
+        db_handler.set_db_handler(override)
+
+        assert db_handler.get_db_handler() is override
+        mock_handler_class.assert_not_called()
+
+        # Noneに戻すと次の呼び出しで作成し直す
+        db_handler.set_db_handler(None)
+        assert db_handler.get_db_handler() is mock_handler_class.return_value
+
+    @patch('app.db_handler.DynamoDBClientHandler')
+    @patch('app.db_handler.DynamoDBHandler')
+    def test_DYNAMODB_BACKENDでクライアントを使うハンドラーを選択できる(self, mock_handler_class, mock_client_handler_class, monkeypatch):
+        monkeypatch.setenv('DYNAMODB_BACKEND', 'client')
+        assert db_handler.get_db_handler() is mock_client_handler_class.return_value
+        mock_handler_class.assert_not_called()
+
+        # 不正な値の場合はリソースを使うハンドラー
+        db_handler.set_db_handler(None)
+        monkeypatch.setenv('DYNAMODB_BACKEND', 'unknown')
+        assert db_handler.get_db_handler() is mock_handler_class.return_value
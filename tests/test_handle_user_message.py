@@ -121,7 +121,7 @@ class TestHandleUserMessage:
             result = handle_user_message(user_id, username)
             
             # Then: オンデマンド取得が実行され、フォロワー数情報が返される
-            mock_get_response.assert_called_once_with(username)
+            mock_get_response.assert_called_once_with(username, use_cache=True, notify_user_id=user_id)
             mock_db.save_user_mapping.assert_not_called()  # DBには保存されない
             expected_message = "📊 現在のフォロワー数情報\n\n👤 アカウント: other_user\n👥 フォロワー数: 1,234人"
             assert result == expected_message
@@ -147,7 +147,7 @@ class TestHandleUserMessage:
             result = handle_user_message(user_id, username)
             
             # Then: エラー情報が含まれたメッセージが返される
-            mock_get_response.assert_called_once_with(username)
+            mock_get_response.assert_called_once_with(username, use_cache=True, notify_user_id=user_id)
             expected_message = "📊 現在のフォロワー数情報\n\n❌ エラー: フォロワー数の情報が見つかりません。URLが正しいか確認してください。"
             assert result == expected_message
 
@@ -202,6 +202,48 @@ class TestHandleUserMessage:
             assert result == expected_message
 
 
+    class TestNotifyMinChange:
+        """通知するフォロワー数の変化の下限の設定のテスト"""
+
+        @patch('lambda_function.db_handler.DynamoDBHandler')
+        def test_通知の下限を送信した場合_全ての登録に設定される(self, mock_db_handler):
+            # Given: 登録済みのユーザー
+            mock_db = Mock()
+            mock_db.get_user_mappings.return_value = ['registered_user']
+            mock_db.update_notify_min_change.return_value = True
+            mock_db_handler.return_value = mock_db
+
+            # When: 「通知 10」を送信
+            result = handle_user_message('user_010', '通知 10')
+
+            # Then: 下限が設定される
+            mock_db.update_notify_min_change.assert_called_once_with('user_010', 10)
+            assert result == "✅ フォロワー数が前回の通知から10人以上変わったときに通知します。"
+
+        @patch('lambda_function.db_handler.DynamoDBHandler')
+        def test_下限に0を送信した場合_毎回通知する設定になる(self, mock_db_handler):
+            mock_db = Mock()
+            mock_db.get_user_mappings.return_value = ['registered_user']
+            mock_db.update_notify_min_change.return_value = True
+            mock_db_handler.return_value = mock_db
+
+            result = handle_user_message('user_010', '通知 0')
+
+            mock_db.update_notify_min_change.assert_called_once_with('user_010', 0)
+            assert result == "✅ フォロワー数が変わらなくても毎回通知します。"
+
+        @patch('lambda_function.db_handler.DynamoDBHandler')
+        def test_登録がない場合_登録を案内する(self, mock_db_handler):
+            mock_db = Mock()
+            mock_db.get_user_mappings.return_value = []
+            mock_db_handler.return_value = mock_db
+
+            result = handle_user_message('user_011', '通知 10')
+
+            mock_db.update_notify_min_change.assert_not_called()
+            assert result == "📝 先にnote.comのユーザー名を登録してください。"
+
+
     class TestBoundaryValues:
         """境界値テスト"""
 
@@ -225,7 +267,7 @@ class TestHandleUserMessage:
                 result = handle_user_message(user_id, username)
                 
                 # Then: オンデマンド取得が実行される
-                mock_get_response.assert_called_once_with(username)
+                mock_get_response.assert_called_once_with(username, use_cache=True, notify_user_id=user_id)
                 assert "📊 現在のフォロワー数情報" in result
 
         @patch('lambda_function.db_handler.DynamoDBHandler')
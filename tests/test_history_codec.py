@@ -0,0 +1,71 @@
+import pytest
+import json
+from app import history_codec
+from app.history_codec import encode_history, decode_history, decode_history_arrays
+
+
+def make_history(length, start=1700000000, interval=3600, first_count=1000):
+    return [
+        {'fetched_at': start + i * interval + (i * 7) % 13, 'followers_count': first_count + i * 3 - (i % 5)}
+        for i in range(length)
+    ]
+
+
+class TestHistoryCodec:
+    """フォロワー数の履歴のバイナリ形式のテスト"""
+
+    @pytest.mark.parametrize('compress', [True, False])
+    def test_エンコードした履歴を元に戻せる(self, compress):
+        history = make_history(500)
+
+        assert decode_history(encode_history(history, compress=compress)) == history
+
+    def test_空の履歴や1件の履歴も元に戻せる(self):
+        assert decode_history(encode_history([])) == []
+        assert decode_history(encode_history([{'fetched_at': 1700000000, 'followers_count': 5}])) == [
+            {'fetched_at': 1700000000, 'followers_count': 5}
+        ]
+
+    def test_取得の抜けや減少や大きな値も元に戻せる(self):
+        history = [
+            {'fetched_at': 1700000000, 'followers_count': 3_000_000_000},
+            {'fetched_at': 1700003600, 'followers_count': 12},
+            {'fetched_at': 1700090000, 'followers_count': 70_000},
+            {'fetched_at': 1700093601, 'followers_count': 69_999}
+        ]
+
+        assert decode_history(encode_history(history)) == history
+
+    def test_配列として取得日時とフォロワー数を取り出せる(self):
+        history = make_history(3)
+
+        timestamps, counts = decode_history_arrays(encode_history(history))
+
+        assert list(timestamps) == [entry['fetched_at'] for entry in history]
+        assert list(counts) == [entry['followers_count'] for entry in history]
+
+    def test_一定間隔の履歴はJSONより十分に小さい(self):
+        history = make_history(24 * 365)
+
+        packed = encode_history(history)
+
+        assert len(packed) * 10 < len(json.dumps(history))
+        # 差分は小さな整数型に詰めるため、圧縮しなくても1件あたり数バイトに収まる
+        assert len(encode_history(history, compress=False)) <= history_codec.HISTORY_HEADER.size + len(history) * 2
+
+    def test_圧縮しても小さくならない場合は圧縮しない(self):
+        data = encode_history(make_history(2))
+
+        assert data[1] & history_codec.FLAG_ZLIB == 0
+
+    def test_不正なデータの場合はValueErrorを送出する(self):
+        data = encode_history(make_history(10), compress=False)
+
+        with pytest.raises(ValueError):
+            decode_history(b'\x01')
+        with pytest.raises(ValueError):
+            decode_history(b'\x09' + data[1:])
+        with pytest.raises(ValueError):
+            decode_history(data[:-1])
+        with pytest.raises(ValueError):
+            decode_history(data[:1] + bytes([history_codec.FLAG_ZLIB]) + data[2:])
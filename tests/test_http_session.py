@@ -0,0 +1,79 @@
+import pytest
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from app import http_session
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """接続元のポートを記録して空の応答を返すkeep-alive対応のハンドラー"""
+
+    protocol_version = 'HTTP/1.1'
+    client_ports = []
+
+    def do_GET(self):
+        self.client_ports.append(self.client_address[1])
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    KeepAliveHandler.client_ports = []
+    server = HTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestGetPoolSize:
+    """接続プールのサイズの設定のテスト"""
+
+    def test_未設定の場合はデフォルト値(self, monkeypatch):
+        monkeypatch.delenv('NOTE_HTTP_POOL_SIZE', raising=False)
+        monkeypatch.delenv('SCHEDULED_MAX_WORKERS', raising=False)
+
+        assert http_session.get_pool_size('NOTE_HTTP_POOL_SIZE') == http_session.DEFAULT_HTTP_POOL_SIZE
+
+    def test_未設定の場合はスケジュール実行の同時実行数に合わせる(self, monkeypatch):
+        monkeypatch.delenv('NOTE_HTTP_POOL_SIZE', raising=False)
+        monkeypatch.setenv('SCHEDULED_MAX_WORKERS', '32')
+
+        assert http_session.get_pool_size('NOTE_HTTP_POOL_SIZE') == 32
+
+    def test_環境変数で指定できる(self, monkeypatch):
+        monkeypatch.setenv('NOTE_HTTP_POOL_SIZE', '4')
+        monkeypatch.setenv('SCHEDULED_MAX_WORKERS', '32')
+
+        assert http_session.get_pool_size('NOTE_HTTP_POOL_SIZE') == 4
+
+    def test_不正な値の場合はデフォルト値(self, monkeypatch):
+        monkeypatch.setenv('NOTE_HTTP_POOL_SIZE', 'abc')
+        monkeypatch.delenv('SCHEDULED_MAX_WORKERS', raising=False)
+
+        assert http_session.get_pool_size('NOTE_HTTP_POOL_SIZE') == http_session.DEFAULT_HTTP_POOL_SIZE
+
+
+class TestCreateSession:
+    """接続を使い回すセッションのテスト"""
+
+    def test_接続プールのサイズが設定される(self):
+        session = http_session.create_session(7)
+
+        adapter = session.get_adapter('https://api.line.me/')
+        assert adapter._pool_maxsize == 7
+        assert adapter.max_retries.total == 0
+
+    def test_同じセッションの連続したリクエストは同じ接続を使う(self, local_server):
+        session = http_session.create_session(2)
+
+        for _ in range(3):
+            assert session.get(local_server, timeout=5).status_code == 200
+
+        assert len(KeepAliveHandler.client_ports) == 3
+        assert len(set(KeepAliveHandler.client_ports)) == 1
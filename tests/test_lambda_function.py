@@ -1,6 +1,6 @@
 import pytest
 import json
-from unittest.mock import patch, Mock
+from unittest.mock import ANY, patch, Mock
 import lambda_function
 
 
@@ -52,14 +52,14 @@ class TestLambdaFunction:
         # DynamoDBのモックを設定
         mock_db_instance = Mock()
         mock_db_handler.return_value = mock_db_instance
-        mock_db_instance.get_all_user_mappings.return_value = [
+        mock_db_instance.iter_all_user_mappings.return_value = [
             {'line_user_id': 'user1', 'note_username': 'note_user1'},
             {'line_user_id': 'user2', 'note_username': 'note_user2'}
         ]
         
         # note_scraperのモックを設定
-        with patch('lambda_function.get_note_dashboard_response_for_user') as mock_get_response:
-            mock_get_response.return_value = "test dashboard info"
+        with patch('lambda_function.get_note_account_update_for_user') as mock_get_response:
+            mock_get_response.return_value = {'message': "test dashboard info", 'followers_change': None}
             
             result = lambda_function.handle_scheduled_execution(sample_lambda_context)
             
@@ -71,8 +71,8 @@ class TestLambdaFunction:
             assert mock_send_push.call_count == 2
             
             # 呼び出し引数を確認
-            mock_get_response.assert_any_call('note_user1')
-            mock_get_response.assert_any_call('note_user2')
+            mock_get_response.assert_any_call('note_user1', ANY)
+            mock_get_response.assert_any_call('note_user2', ANY)
             mock_send_push.assert_any_call('user1', 'test dashboard info')
             mock_send_push.assert_any_call('user2', 'test dashboard info')
     
@@ -81,7 +81,7 @@ class TestLambdaFunction:
         """登録ユーザーがいない場合は適切なメッセージを返すこと"""
         mock_db_instance = Mock()
         mock_db_handler.return_value = mock_db_instance
-        mock_db_instance.get_all_user_mappings.return_value = []
+        mock_db_instance.iter_all_user_mappings.return_value = []
         
         result = lambda_function.handle_scheduled_execution(sample_lambda_context)
         
@@ -104,6 +104,17 @@ class TestLambdaFunction:
         # 3番目の引数は関数オブジェクト
         assert callable(args[2])
     
+    @patch('lambda_function.note_scraper.wait_for_revalidations')
+    @patch('lambda_function.line_handler.handle_line_event')
+    def test_handle_line_webhook_waits_for_revalidations(self, mock_handle_event, mock_wait, sample_line_webhook_event, sample_lambda_context):
+        """返信の後、Lambdaの残り時間の範囲でオンデマンド取得の取得し直しを待つこと"""
+        sample_lambda_context.get_remaining_time_in_millis = lambda: 11000
+        mock_wait.return_value = True
+        
+        lambda_function.handle_line_webhook(sample_line_webhook_event, sample_lambda_context)
+        
+        mock_wait.assert_called_once_with(10.0)
+    
     def test_handle_line_webhook_missing_signature(self, sample_lambda_context):
         """署名が不足している場合は400エラーを返すこと"""
         event_without_signature = {
@@ -141,7 +152,7 @@ class TestIntegration:
         # DynamoDBのモック設定
         mock_db_instance = Mock()
         mock_db_handler.return_value = mock_db_instance
-        mock_db_instance.get_all_user_mappings.return_value = [
+        mock_db_instance.iter_all_user_mappings.return_value = [
             {'line_user_id': 'user1', 'note_username': 'test_user'}
         ]
         
@@ -159,7 +170,7 @@ class TestIntegration:
         result = lambda_function.lambda_handler(scheduled_event, sample_lambda_context)
         
         assert result['statusCode'] == 200
-        mock_get_dashboard.assert_called_once_with('https://note.com/test_user')
+        mock_get_dashboard.assert_called_once_with('https://note.com/test_user', save_snapshot=False)
         mock_send_push.assert_called_once()
         
         # 送信されたメッセージの内容を確認
@@ -26,7 +26,7 @@ class TestLambdaFunctionLimit:
         expected_result = "📊 現在のフォロワー数情報\n\n👤 アカウント: new_user\n👥 フォロワー数: 5,678人"
         assert result == expected_result
         mock_db.save_user_mapping.assert_not_called()
-        mock_get_response.assert_called_once_with('new_user')
+        mock_get_response.assert_called_once_with('new_user', use_cache=True, notify_user_id='test_user')
     
     @patch('lambda_function.db_handler.DynamoDBHandler')
     @patch('lambda_function.validator.validate_note_username')
@@ -118,4 +118,4 @@ class TestLambdaFunctionLimit:
         # 期待される結果
         expected_result = "📊 現在のフォロワー数情報\n\n❌ エラー: フォロワー数の情報が見つかりません。URLが正しいか確認してください。"
         assert result == expected_result
-        mock_get_response.assert_called_once_with('error_user')
\ No newline at end of file
+        mock_get_response.assert_called_once_with('error_user', use_cache=True, notify_user_id='test_user')
\ No newline at end of file
@@ -1,6 +1,6 @@
 import pytest
 import json
-from unittest.mock import patch, Mock
+from unittest.mock import ANY, patch, Mock
 import lambda_function
 
 
@@ -115,20 +115,87 @@ class TestGetNoteResponseForUser:
         
         assert result == "test response for user"
         mock_get_response.assert_called_once_with('test_user')
+    
+    @patch('lambda_function.note_scraper.get_cached_note_dashboard_response_for_user')
+    def test_get_note_dashboard_response_for_user_with_cache(self, mock_get_cached):
+        """キャッシュを使う指定の場合はキャッシュ経由で取得すること"""
+        mock_get_cached.return_value = "cached response"
+        
+        result = lambda_function.get_note_dashboard_response_for_user('test_user', use_cache=True)
+        
+        assert result == "cached response"
+        mock_get_cached.assert_called_once_with('test_user', None)
+    
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.note_scraper.get_cached_note_dashboard_response_for_user')
+    def test_古い値を返した後に値が変わっていればプッシュする(self, mock_get_cached, mock_send_push):
+        """取得し直したフォロワー数が変わっていた場合は新しい値をプッシュすること"""
+        lambda_function.get_note_dashboard_response_for_user('test_user', use_cache=True, notify_user_id='user123')
+        on_revalidated = mock_get_cached.call_args.args[1]
+        
+        on_revalidated({'followers_count': 10}, {'followers_count': 12, 'url': 'https://note.com/test_user'})
+        
+        mock_send_push.assert_called_once()
+        target_id, text = mock_send_push.call_args.args
+        assert target_id == 'user123'
+        assert '12人' in text
+    
+    @patch.dict('os.environ', {'ON_DEMAND_PUSH_MIN_DELTA': '5'})
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.note_scraper.get_cached_note_dashboard_response_for_user')
+    def test_古い値を返した後の変化が小さい場合やエラーの場合はプッシュしない(self, mock_get_cached, mock_send_push):
+        """変化がON_DEMAND_PUSH_MIN_DELTA未満の場合や取得に失敗した場合はプッシュしないこと"""
+        lambda_function.get_note_dashboard_response_for_user('test_user', use_cache=True, notify_user_id='user123')
+        on_revalidated = mock_get_cached.call_args.args[1]
+        
+        on_revalidated({'followers_count': 10}, {'followers_count': 14, 'url': 'https://note.com/test_user'})
+        on_revalidated({'followers_count': 10}, {'error': 'リクエストエラー'})
+        on_revalidated({'followers_count': 10}, {'followers_count': 20, 'url': 'https://note.com/test_user', 'stale': True})
+        
+        mock_send_push.assert_not_called()
+
+
+class TestGetNoteAccountUpdateForUser:
+    """get_note_account_update_for_user関数のテスト"""
+
+    @patch('lambda_function.note_scraper.get_dashboard_info_with_history_for_user')
+    def test_送信用メッセージと前回からの増減を返す(self, mock_get_info):
+        mock_get_info.return_value = {
+            'followers_count': 105, 'url': 'https://note.com/test_user', 'followers_change': 5
+        }
+
+        result = lambda_function.get_note_account_update_for_user('test_user')
+
+        mock_get_info.assert_called_once_with('test_user', None)
+        assert result['followers_count'] == 105
+        assert result['followers_change'] == 5
+        assert '105人' in result['message']
+        assert '前回比: +5人' in result['message']
+
+    @patch('lambda_function.note_scraper.get_dashboard_info_with_history_for_user')
+    def test_取得に失敗した場合は増減がNoneになる(self, mock_get_info):
+        mock_get_info.return_value = {'error': 'リクエストエラー'}
+
+        result = lambda_function.get_note_account_update_for_user('test_user')
+
+        assert result == {
+            'message': '❌ エラー: リクエストエラー', 'followers_count': None, 'followers_change': None, 'anomaly': False
+        }
 
 
 class TestIntegrationWithNewFeatures:
     """新機能の統合テスト"""
     
     @patch('lambda_function.line_handler.send_push_message')
-    @patch('lambda_function.note_scraper.get_note_dashboard_response_for_user')
+    @patch('lambda_function.note_scraper.format_dashboard_info_for_display', side_effect=lambda info: info['message'])
+    @patch('lambda_function.note_scraper.get_dashboard_info_with_history_for_user')
     @patch('lambda_function.db_handler.DynamoDBHandler')
-    def test_scheduled_execution_multiple_users(self, mock_db_handler, mock_get_response, mock_send_push, sample_lambda_context):
+    def test_scheduled_execution_multiple_users(self, mock_db_handler, mock_get_response, mock_format, mock_send_push, sample_lambda_context):
         """複数ユーザーへのスケジュール実行が正しく動作すること"""
         # 複数ユーザーのモックデータ
         mock_db_instance = Mock()
         mock_db_handler.return_value = mock_db_instance
-        mock_db_instance.get_all_user_mappings.return_value = [
+        mock_db_instance.iter_all_user_mappings.return_value = [
             {'line_user_id': 'user1', 'note_username': 'note_user1'},
             {'line_user_id': 'user2', 'note_username': 'note_user2'},
             {'line_user_id': 'user3', 'note_username': 'note_user3'}
@@ -136,9 +203,9 @@ class TestIntegrationWithNewFeatures:
         
         # 各ユーザーに対して異なるレスポンスを設定
         mock_get_response.side_effect = [
-            "Response for user1",
-            "Response for user2", 
-            "Response for user3"
+            {'message': "Response for user1"},
+            {'message': "Response for user2"},
+            {'message': "Response for user3"}
         ]
         
         scheduled_event = {
@@ -156,9 +223,9 @@ class TestIntegrationWithNewFeatures:
         assert mock_send_push.call_count == 3
         
         # 各呼び出しの引数を確認
-        mock_get_response.assert_any_call('note_user1')
-        mock_get_response.assert_any_call('note_user2')
-        mock_get_response.assert_any_call('note_user3')
+        mock_get_response.assert_any_call('note_user1', ANY)
+        mock_get_response.assert_any_call('note_user2', ANY)
+        mock_get_response.assert_any_call('note_user3', ANY)
         
         mock_send_push.assert_any_call('user1', 'Response for user1')
         mock_send_push.assert_any_call('user2', 'Response for user2')
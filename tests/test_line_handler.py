@@ -64,7 +64,7 @@ class TestLineHandler:
         
         assert result is False
     
-    @patch('requests.post')
+    @patch('app.line_handler.LINE_SESSION.post')
     def test_reply_message_success(self, mock_post, mock_environment_variables):
         """メッセージ返信が正常に動作すること"""
         mock_response = Mock()
@@ -88,7 +88,7 @@ class TestLineHandler:
         assert payload['messages'][0]['type'] == 'text'
         assert payload['messages'][0]['text'] == 'test message'
     
-    @patch('requests.post')
+    @patch('app.line_handler.LINE_SESSION.post')
     def test_reply_message_request_error(self, mock_post, mock_environment_variables):
         """リクエストエラーが発生した場合も正常に処理されること"""
         mock_post.side_effect = requests.exceptions.RequestException("Connection error")
@@ -105,7 +105,7 @@ class TestLineHandler:
         # エラーが発生しても例外が発生しないことを確認
         line_handler.reply_message("test_reply_token", "test message")
     
-    @patch('requests.post')
+    @patch('app.line_handler.LINE_SESSION.post')
     def test_send_push_message_success(self, mock_post, mock_environment_variables):
         """プッシュメッセージ送信が正常に動作すること"""
         mock_response = Mock()
@@ -129,7 +129,7 @@ class TestLineHandler:
         assert payload['messages'][0]['type'] == 'text'
         assert payload['messages'][0]['text'] == 'test message'
     
-    @patch('requests.post')
+    @patch('app.line_handler.LINE_SESSION.post')
     def test_send_push_message_request_error(self, mock_post, mock_environment_variables):
         """プッシュメッセージ送信でリクエストエラーが発生した場合"""
         mock_post.side_effect = requests.exceptions.RequestException("Connection error")
@@ -1,5 +1,6 @@
 import pytest
 import json
+import requests
 from unittest.mock import patch, Mock
 from app import line_handler
 
@@ -267,4 +268,111 @@ class TestLineHandlerNewFeatures:
         
         mock_validate.assert_called_once()
         mock_response_function.assert_not_called()
-        mock_reply.assert_not_called()
\ No newline at end of file
+        mock_reply.assert_not_called()
+        
+    @patch('app.line_handler.LINE_SESSION.post')
+    def test_send_multicast_message_success(self, mock_post, mock_environment_variables):
+        """マルチキャスト送信が正常に動作すること"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = "{}"
+        mock_response.raise_for_status = Mock()
+        mock_post.return_value = mock_response
+        
+        result = line_handler.send_multicast_message(["user1", "user2"], "test message")
+        
+        assert result == 2
+        mock_post.assert_called_once()
+        args, kwargs = mock_post.call_args
+        
+        assert args[0] == "https://api.line.me/v2/bot/message/multicast"
+        assert kwargs['headers']['Authorization'] == 'Bearer test_access_token'
+        
+        payload = json.loads(kwargs['data'].decode('utf-8'))
+        assert payload['to'] == ["user1", "user2"]
+        assert payload['messages'][0]['text'] == 'test message'
+    
+    @patch('app.line_handler.LINE_SESSION.post')
+    def test_send_multicast_message_splits_recipients(self, mock_post, mock_environment_variables):
+        """送信先が上限を超える場合は500件ごとに分割して送信されること"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = "{}"
+        mock_response.raise_for_status = Mock()
+        mock_post.return_value = mock_response
+        target_ids = [f"user{i}" for i in range(1201)]
+        
+        result = line_handler.send_multicast_message(target_ids, "test message")
+        
+        assert result == 1201
+        assert mock_post.call_count == 3
+        sizes = [len(json.loads(call.kwargs['data'].decode('utf-8'))['to']) for call in mock_post.call_args_list]
+        assert sizes == [500, 500, 201]
+    
+    @patch('app.line_handler.LINE_SESSION.post')
+    def test_send_multicast_message_partial_failure(self, mock_post, mock_environment_variables):
+        """一部の分割送信が失敗した場合は成功した送信先の数のみを返すこと"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = "{}"
+        mock_response.raise_for_status = Mock()
+        mock_post.side_effect = [mock_response, requests.exceptions.RequestException("Connection error")]
+        target_ids = [f"user{i}" for i in range(600)]
+        
+        result = line_handler.send_multicast_message(target_ids, "test message")
+        
+        assert result == 500
+    
+    def test_send_multicast_message_no_access_token(self, monkeypatch):
+        """アクセストークンが設定されていない場合は送信されないこと"""
+        monkeypatch.delenv('LINE_CHANNEL_ACCESS_TOKEN', raising=False)
+        
+        assert line_handler.send_multicast_message(["user1"], "test message") == 0
+    
+    @patch('app.line_handler.LINE_RETRY_POLICY.call')
+    @patch('app.line_handler.LINE_SESSION.post')
+    def test_send_push_message_sets_retry_key(self, mock_post, mock_call, mock_environment_variables):
+        """リトライしても二重送信されないようにリトライキーを付けること"""
+        mock_call.side_effect = lambda request_func: request_func()
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = Mock()
+        mock_post.return_value = mock_response
+        
+        line_handler.send_push_message("test_target_id", "test message")
+        line_handler.send_push_message("test_target_id", "test message")
+        
+        retry_keys = [call.kwargs['headers']['X-Line-Retry-Key'] for call in mock_post.call_args_list]
+        assert len(set(retry_keys)) == 2
+    
+    @patch('app.line_handler.LINE_RETRY_POLICY._sleep')
+    @patch('app.line_handler.LINE_SESSION.post')
+    def test_send_push_message_retries_server_error(self, mock_post, mock_sleep, mock_environment_variables):
+        """5xxの場合は同じリトライキーでリトライすること"""
+        error_response = Mock()
+        error_response.status_code = 503
+        error_response.headers = {}
+        ok_response = Mock()
+        ok_response.status_code = 200
+        ok_response.raise_for_status = Mock()
+        mock_post.side_effect = [error_response, ok_response]
+        
+        result = line_handler.send_push_message("test_target_id", "test message")
+        
+        assert result is True
+        assert mock_post.call_count == 2
+        retry_keys = {call.kwargs['headers']['X-Line-Retry-Key'] for call in mock_post.call_args_list}
+        assert len(retry_keys) == 1
+    
+    @patch('app.line_handler.LINE_SESSION.post')
+    def test_send_push_message_already_accepted(self, mock_post, mock_environment_variables):
+        """同じリトライキーのリクエストが受け付け済み（409）の場合は成功として扱うこと"""
+        mock_response = Mock()
+        mock_response.status_code = 409
+        mock_response.headers = {'X-Line-Accepted-Request-Id': 'accepted-id'}
+        mock_response.raise_for_status = Mock(side_effect=requests.exceptions.HTTPError("409 Conflict"))
+        mock_post.return_value = mock_response
+        
+        result = line_handler.send_push_message("test_target_id", "test message")
+        
+        assert result is True
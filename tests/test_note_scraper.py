@@ -36,11 +36,11 @@ class TestNoteScraper:
         result = note_scraper.extract_number_from_text(None)
         assert result == 0
 
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_success(self, mock_get, mock_environment_variables, sample_html_with_followers):
         """正常にフォロワー数を取得できること"""
         mock_response = Mock()
-        mock_response.text = sample_html_with_followers
+        mock_response.iter_content.return_value = [sample_html_with_followers.encode('utf-8')]
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
         
@@ -53,11 +53,11 @@ class TestNoteScraper:
         
         mock_get.assert_called_once()
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_no_followers(self, mock_get, mock_environment_variables, sample_html_without_followers):
         """フォロワー数が見つからない場合は0を返すこと"""
         mock_response = Mock()
-        mock_response.text = sample_html_without_followers
+        mock_response.iter_content.return_value = [sample_html_without_followers.encode('utf-8')]
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
         
@@ -76,7 +76,7 @@ class TestNoteScraper:
         assert 'error' in result
         assert 'NOTE_URLが設定されていません' in result['error']
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_request_error(self, mock_get, mock_environment_variables):
         """リクエストエラーが発生した場合はエラーを返すこと"""
         mock_get.side_effect = requests.exceptions.RequestException("Connection error")
@@ -86,7 +86,7 @@ class TestNoteScraper:
         assert 'error' in result
         assert 'リクエストエラー' in result['error']
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_timeout(self, mock_get, mock_environment_variables):
         """タイムアウトが発生した場合はエラーを返すこと"""
         mock_get.side_effect = requests.exceptions.Timeout("Timeout error")
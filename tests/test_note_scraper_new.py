@@ -1,17 +1,28 @@
 import pytest
+import asyncio
+import json
+import numpy as np
+import os
 import requests
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, Mock
 from app import note_scraper
+from app.anomaly import ANOMALY_Z_THRESHOLD
+from app.circuit_breaker import CircuitBreaker
 
 
 class TestNoteScraperNewFeatures:
     """note_scraperの新機能のテスト"""
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_success(self, mock_get, sample_html_with_followers):
         """指定URLからフォロワー数を取得できること"""
         mock_response = Mock()
-        mock_response.text = sample_html_with_followers
+        mock_response.iter_content.return_value = [sample_html_with_followers.encode('utf-8')]
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
         
@@ -28,7 +39,7 @@ class TestNoteScraperNewFeatures:
             timeout=10
         )
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_empty_url(self, mock_get):
         """空のURLの場合はエラーを返すこと"""
         result = note_scraper.get_dashboard_info_from_note_url('')
@@ -37,7 +48,7 @@ class TestNoteScraperNewFeatures:
         assert 'note.comのURLが指定されていません' in result['error']
         mock_get.assert_not_called()
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_none(self, mock_get):
         """NoneのURLの場合はエラーを返すこと"""
         result = note_scraper.get_dashboard_info_from_note_url(None)
@@ -46,7 +57,7 @@ class TestNoteScraperNewFeatures:
         assert 'note.comのURLが指定されていません' in result['error']
         mock_get.assert_not_called()
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_request_error(self, mock_get):
         """リクエストエラーが発生した場合はエラーを返すこと"""
         mock_get.side_effect = requests.exceptions.RequestException("Connection error")
@@ -69,6 +80,16 @@ class TestNoteScraperNewFeatures:
         mock_get_info.assert_called_once_with('https://note.com/test_user')
         mock_format.assert_called_once_with({'followers_count': 5678})
     
+    @patch('app.note_scraper.record_follower_history')
+    @patch('app.note_scraper.get_dashboard_info_from_note_url')
+    def test_get_note_dashboard_response_for_user_does_not_record_history(self, mock_get_info, mock_record):
+        """オンデマンドの取得ではフォロワー数の履歴に記録しないこと"""
+        mock_get_info.return_value = {'followers_count': 5678, 'url': 'https://note.com/test_user'}
+        
+        note_scraper.get_note_dashboard_response_for_user('test_user')
+        
+        mock_record.assert_not_called()
+    
     @patch('app.note_scraper.get_dashboard_info_from_note')
     def test_get_note_dashboard_response_legacy_compatibility(self, mock_get_info):
         """既存のget_note_dashboard_response関数が正しく動作すること"""
@@ -84,11 +105,11 @@ class TestNoteScraperNewFeatures:
         assert '1,234人' in result
         mock_get_info.assert_called_once()
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_calls_url_version(self, mock_get, mock_environment_variables, sample_html_with_followers):
         """get_dashboard_info_from_noteが内部でget_dashboard_info_from_note_urlを呼び出すこと"""
         mock_response = Mock()
-        mock_response.text = sample_html_with_followers
+        mock_response.iter_content.return_value = [sample_html_with_followers.encode('utf-8')]
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
         
@@ -125,7 +146,7 @@ class TestNoteScraperNewFeatures:
         assert '👤 アカウント: Unknown' in result
         assert '🔗 URL: ' in result
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_complex_html(self, mock_get):
         """複雑なHTMLからフォロワー数を抽出できること"""
         complex_html = """
@@ -151,7 +172,7 @@ class TestNoteScraperNewFeatures:
         """
         
         mock_response = Mock()
-        mock_response.text = complex_html
+        mock_response.iter_content.return_value = [complex_html.encode('utf-8')]
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
         
@@ -160,7 +181,7 @@ class TestNoteScraperNewFeatures:
         assert 'error' not in result
         assert result['followers_count'] == 12345
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_no_followers_html(self, mock_get):
         """フォロワー数が見つからないHTMLの場合"""
         no_followers_html = """
@@ -176,7 +197,7 @@ class TestNoteScraperNewFeatures:
         """
         
         mock_response = Mock()
-        mock_response.text = no_followers_html
+        mock_response.iter_content.return_value = [no_followers_html.encode('utf-8')]
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
         
@@ -185,7 +206,7 @@ class TestNoteScraperNewFeatures:
         assert 'error' not in result
         assert result['followers_count'] == 0
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_timeout(self, mock_get):
         """タイムアウトエラーが正しく処理されること"""
         mock_get.side_effect = requests.exceptions.Timeout("Request timeout")
@@ -196,7 +217,7 @@ class TestNoteScraperNewFeatures:
         assert 'リクエストエラー' in result['error']
         assert 'Request timeout' in result['error']
     
-    @patch('requests.get')
+    @patch('app.note_scraper.NOTE_SESSION.get')
     def test_get_dashboard_info_from_note_url_http_error(self, mock_get):
         """HTTPエラーが正しく処理されること"""
         mock_response = Mock()
@@ -241,4 +262,962 @@ class TestNoteScraperNewFeatures:
         assert note_scraper.extract_number_from_text('１２３４') == 0  # 全角数字は抽出されない
         
         # 負の数値
-        assert note_scraper.extract_number_from_text('-1,234') == 1234  # 負号は無視される
\ No newline at end of file
+        assert note_scraper.extract_number_from_text('-1,234') == 1234  # 負号は無視される
+
+    def test_import_does_not_load_numpy(self):
+        """note_scraperとdb_handlerを読み込むだけではNumPyを読み込まないこと"""
+        code = "import sys, app.note_scraper, app.db_handler; sys.exit('numpy' in sys.modules)"
+        result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        assert result.returncode == 0
+
+class TestNoteRateLimiter:
+    """note.comへのリクエストのレートリミットのテスト"""
+    
+    def test_create_note_rate_limiter_not_configured(self, monkeypatch):
+        """環境変数が設定されていない場合は制限しないこと"""
+        monkeypatch.delenv('NOTE_REQUESTS_PER_SECOND', raising=False)
+        
+        assert note_scraper.create_note_rate_limiter() is None
+    
+    def test_create_note_rate_limiter_from_env(self, monkeypatch):
+        """環境変数からレートとバースト数を設定できること"""
+        monkeypatch.setenv('NOTE_REQUESTS_PER_SECOND', '2.5')
+        monkeypatch.setenv('NOTE_REQUEST_BURST', '4')
+        
+        limiter = note_scraper.create_note_rate_limiter()
+        
+        assert limiter.rate == 2.5
+        assert limiter.burst == 4
+    
+    def test_create_note_rate_limiter_invalid(self, monkeypatch):
+        """不正な値の場合は制限しないこと"""
+        monkeypatch.setenv('NOTE_REQUESTS_PER_SECOND', 'fast')
+        
+        assert note_scraper.create_note_rate_limiter() is None
+    
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_get_dashboard_info_from_note_url_acquires_rate_limiter(self, mock_get, monkeypatch):
+        """note.comへのリクエスト前にレートリミッターを取得すること"""
+        mock_limiter = Mock()
+        monkeypatch.setattr(note_scraper, 'NOTE_RATE_LIMITER', mock_limiter)
+        mock_get.side_effect = requests.exceptions.RequestException("Connection error")
+        
+        note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+        note_scraper.get_dashboard_info_from_note_url('https://note.com/other_user')
+        
+        # JSON APIとHTMLのどちらのリクエストでも取得する
+        assert mock_limiter.acquire.call_count == mock_get.call_count == 4
+
+
+class TestNoteScraperRetry:
+    """note.comへのリクエストのリトライのテスト"""
+    
+    @patch('app.note_scraper.fetch_follower_count_from_api', return_value=None)
+    @patch('app.note_scraper.NOTE_RETRY_POLICY._sleep')
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_get_dashboard_info_from_note_url_retries_too_many_requests(self, mock_get, mock_sleep, mock_api):
+        """429の場合はRetry-Afterに従ってリトライすること"""
+        throttled = Mock()
+        throttled.status_code = 429
+        throttled.headers = {'Retry-After': '1'}
+        ok = Mock()
+        ok.status_code = 200
+        ok.iter_content.return_value = ['<script>{\\"followerCount\\":321}</script>'.encode('utf-8')]
+        ok.raise_for_status = Mock()
+        mock_get.side_effect = [throttled, ok]
+        
+        result = note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+        
+        assert result['followers_count'] == 321
+        assert mock_get.call_count == 2
+        mock_sleep.assert_called_once_with(1.0)
+
+
+class TestNoteCircuitBreaker:
+    """note.comへのリクエストのサーキットブレーカーのテスト"""
+
+    @pytest.fixture
+    def open_breaker(self, monkeypatch):
+        breaker = CircuitBreaker(minimum_calls=1)
+        breaker.record(False)
+        monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        return breaker
+
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_サーキットブレーカーが開いている間はリクエストせずにエラーを返す(self, mock_get, open_breaker):
+        result = note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+
+        assert 'error' in result
+        assert '一時停止' in result['error']
+        mock_get.assert_not_called()
+        assert open_breaker.rejected_count == 1
+
+    @patch('app.note_scraper.fetch_follower_count_from_api', return_value=None)
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_サーキットブレーカーが開いている間は最後に取得した値を返す(self, mock_get, mock_api, monkeypatch):
+        ok = Mock()
+        ok.status_code = 200
+        ok.iter_content.return_value = ['<script>{\\"followerCount\\":321}</script>'.encode('utf-8')]
+        ok.raise_for_status = Mock()
+        mock_get.return_value = ok
+        note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+
+        breaker = CircuitBreaker(minimum_calls=1)
+        breaker.record(False)
+        monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        result = note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+
+        assert result['followers_count'] == 321
+        assert result['stale'] is True
+        assert mock_get.call_count == 1
+        assert '時点の値です' in note_scraper.format_dashboard_info_for_display(result)
+
+    @patch('app.note_scraper.NOTE_RETRY_POLICY._sleep')
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_サーバーエラーが続くとサーキットブレーカーが開く(self, mock_get, mock_sleep, monkeypatch):
+        breaker = CircuitBreaker(minimum_calls=2)
+        monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        unavailable = Mock()
+        unavailable.status_code = 503
+        unavailable.headers = {}
+        unavailable.raise_for_status.side_effect = requests.exceptions.HTTPError('503 Server Error')
+        mock_get.return_value = unavailable
+
+        note_scraper.get_dashboard_info_from_note_url('https://note.com/a')
+        note_scraper.get_dashboard_info_from_note_url('https://note.com/b')
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def make_api_response(self, followers_count):
+        response = Mock()
+        response.status_code = 200
+        response.headers = {}
+        response.iter_content.return_value = [json.dumps({'data': {'followerCount': followers_count}}).encode('utf-8')]
+        return response
+
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_レート制限の待ち時間はnote_comの遅延として扱わない(self, mock_get, monkeypatch):
+        breaker = CircuitBreaker(slow_call_seconds=0.05, minimum_calls=1)
+        monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        slow_limiter = Mock()
+        slow_limiter.acquire.side_effect = lambda: time.sleep(0.1)
+        monkeypatch.setattr(note_scraper, 'NOTE_RATE_LIMITER', slow_limiter)
+        mock_get.return_value = self.make_api_response(321)
+
+        results = [note_scraper.get_dashboard_info_from_note_url(f'https://note.com/user{i}') for i in range(5)]
+
+        assert [result['followers_count'] for result in results] == [321] * 5
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_note_comの応答が遅い場合はサーキットブレーカーが開く(self, mock_get, monkeypatch):
+        breaker = CircuitBreaker(slow_call_seconds=0.05, minimum_calls=1)
+        monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        response = self.make_api_response(321)
+
+        def slow_get(*args, **kwargs):
+            time.sleep(0.1)
+            return response
+        mock_get.side_effect = slow_get
+
+        note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_アカウントが見つからない場合はnote_comの障害として扱わない(self, mock_get, monkeypatch):
+        breaker = CircuitBreaker(minimum_calls=1)
+        monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        not_found = Mock()
+        not_found.status_code = 404
+        not_found.raise_for_status.side_effect = requests.exceptions.HTTPError('404 Client Error')
+        mock_get.return_value = not_found
+
+        note_scraper.get_dashboard_info_from_note_url('https://note.com/missing')
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestStreamingFollowerCount:
+    """フォロワー数をチャンクごとに読み込んで取得する処理のテスト"""
+
+    html = b'<html><body>' + b'x' * 100 + b'<script>{\\"followerCount\\": 12345,\\"name\\":\\"a\\"}</script></body></html>'
+
+    def test_チャンクの境目がどこにあってもフォロワー数を取得できる(self):
+        for split_at in range(1, len(self.html)):
+            chunks = [self.html[:split_at], self.html[split_at:]]
+
+            assert note_scraper.scan_follower_count(chunks) == (True, 12345)
+
+    def test_1バイトずつ届いてもフォロワー数を取得できる(self):
+        chunks = [self.html[i:i + 1] for i in range(len(self.html))]
+
+        assert note_scraper.scan_follower_count(chunks) == (True, 12345)
+
+    def test_フォロワー数が見つかったら残りのチャンクは読まない(self):
+        read_chunks = []
+
+        def chunks():
+            for chunk in [self.html, b'<div>rest</div>', b'<div>more</div>']:
+                read_chunks.append(chunk)
+                yield chunk
+
+        assert note_scraper.scan_follower_count(chunks()) == (True, 12345)
+        assert read_chunks == [self.html]
+
+    def test_本文の末尾がフォロワー数で終わる場合も取得できる(self):
+        chunks = [b'{\\"followerCount\\":', b'98', b'7']
+
+        assert note_scraper.scan_follower_count(chunks) == (True, 987)
+
+    def test_followerCountの形式が一致しない場合はNone(self):
+        chunks = [b'<p>followerCount</p>', b'<p>none</p>']
+
+        assert note_scraper.scan_follower_count(chunks) == (True, None)
+
+    def test_followerCountがない場合(self):
+        assert note_scraper.scan_follower_count([b'<html></html>']) == (False, None)
+
+    def test_サイズの上限を超えたら読み込みをやめる(self):
+        chunks = [b'x' * 10, b'x' * 10, b'{\\"followerCount\\":1}']
+
+        with pytest.raises(note_scraper.ProfileTooLargeError):
+            note_scraper.scan_follower_count(chunks, max_bytes=15)
+
+    @patch('app.note_scraper.fetch_follower_count_from_api', return_value=None)
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_ストリーミングで取得して接続を閉じる(self, mock_get, mock_api):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = iter([self.html])
+        mock_get.return_value = mock_response
+
+        result = note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+
+        assert result['followers_count'] == 12345
+        assert mock_get.call_args.kwargs['stream'] is True
+        mock_response.close.assert_called_once()
+
+    @patch('app.note_scraper.NOTE_PROFILE_MAX_BYTES', 10)
+    @patch('app.note_scraper.fetch_follower_count_from_api', return_value=None)
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_ページが大きすぎる場合はエラーを返す(self, mock_get, mock_api):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = iter([self.html])
+        mock_get.return_value = mock_response
+
+        result = note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+
+        assert 'error' in result
+        mock_response.close.assert_called_once()
+
+
+class NoteStandInHandler(BaseHTTPRequestHandler):
+    """note.comのクリエイターAPIとプロフィールページの代わりに応答するハンドラー"""
+
+    api_status = 200
+    api_body = b''
+    html_body = b''
+    etag = None
+    last_modified = None
+    paths = []
+    statuses = []
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        if self.path.startswith('/api/v2/creators/'):
+            status, body, content_type = self.api_status, self.api_body, 'application/json'
+        else:
+            status, body, content_type = 200, self.html_body, 'text/html; charset=utf-8'
+
+        if status == 200 and (
+            (self.etag and self.headers.get('If-None-Match') == self.etag)
+            or (self.last_modified and self.headers.get('If-Modified-Since') == self.last_modified)
+        ):
+            status, body = 304, b''
+        self.statuses.append(status)
+
+        self.send_response(status)
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        if self.last_modified:
+            self.send_header('Last-Modified', self.last_modified)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def note_stand_in(monkeypatch):
+    NoteStandInHandler.api_status = 200
+    NoteStandInHandler.api_body = json.dumps({'data': {'urlname': 'test_user', 'followerCount': 4321}}).encode('utf-8')
+    NoteStandInHandler.html_body = b'<script>{\\"followerCount\\":1234}</script>'
+    NoteStandInHandler.etag = None
+    NoteStandInHandler.last_modified = None
+    NoteStandInHandler.paths = []
+    NoteStandInHandler.statuses = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), NoteStandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    monkeypatch.setattr(note_scraper, 'NOTE_API_BASE_URL', f'{base_url}/api/v2')
+    monkeypatch.setattr(note_scraper.NOTE_RETRY_POLICY, '_sleep', lambda seconds: None)
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+class TestNoteCreatorApi:
+    """クリエイター情報のJSON APIからのフォロワー数取得のテスト"""
+
+    def test_プロフィールページのURLからAPIのURLを作成する(self, monkeypatch):
+        monkeypatch.setattr(note_scraper, 'NOTE_API_BASE_URL', 'https://note.com/api/v2')
+
+        assert note_scraper.get_creator_api_url('https://note.com/test_user') == 'https://note.com/api/v2/creators/test_user'
+        assert note_scraper.get_creator_api_url('https://note.com/test_user/') == 'https://note.com/api/v2/creators/test_user'
+        assert note_scraper.get_creator_api_url('https://note.com/') is None
+        assert note_scraper.get_creator_api_url('https://note.com/test_user/n/abc') is None
+
+    def test_APIから取得できた場合はHTMLを取得しない(self, note_stand_in):
+        result = note_scraper.get_dashboard_info_from_note_url(f'{note_stand_in}/test_user')
+
+        assert result['followers_count'] == 4321
+        assert NoteStandInHandler.paths == ['/api/v2/creators/test_user']
+
+    def test_APIがエラーを返した場合はHTMLから取得する(self, note_stand_in):
+        NoteStandInHandler.api_status = 500
+        NoteStandInHandler.api_body = b'{}'
+
+        result = note_scraper.get_dashboard_info_from_note_url(f'{note_stand_in}/test_user')
+
+        assert result['followers_count'] == 1234
+        assert NoteStandInHandler.paths == ['/api/v2/creators/test_user', '/test_user']
+
+    def test_APIの応答の形式が違う場合はHTMLから取得する(self, note_stand_in):
+        NoteStandInHandler.api_body = b'{"data": {"followerCount": "many"}}'
+
+        result = note_scraper.get_dashboard_info_from_note_url(f'{note_stand_in}/test_user')
+
+        assert result['followers_count'] == 1234
+
+    def test_APIの応答がJSONでない場合はHTMLから取得する(self, note_stand_in):
+        NoteStandInHandler.api_body = b'<html>not json</html>'
+
+        result = note_scraper.get_dashboard_info_from_note_url(f'{note_stand_in}/test_user')
+
+        assert result['followers_count'] == 1234
+
+    def test_APIの応答が上限を超える場合は読み込みを打ち切ってHTMLから取得する(self, note_stand_in, monkeypatch):
+        monkeypatch.setattr(note_scraper, 'NOTE_API_MAX_BYTES', 64)
+        NoteStandInHandler.api_body = json.dumps({'data': {'followerCount': 4321, 'profile': 'x' * 1000}}).encode('utf-8')
+
+        result = note_scraper.get_dashboard_info_from_note_url(f'{note_stand_in}/test_user')
+
+        assert result['followers_count'] == 1234
+
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_APIの応答は上限を超えた時点で読み込みをやめる(self, mock_get, monkeypatch):
+        monkeypatch.setattr(note_scraper, 'NOTE_API_MAX_BYTES', 10)
+        read_chunks = []
+
+        def chunks(chunk_size):
+            for i in range(100):
+                read_chunks.append(i)
+                yield b'x' * chunk_size
+        response = Mock()
+        response.status_code = 200
+        response.iter_content.side_effect = chunks
+        mock_get.return_value = response
+
+        assert note_scraper.fetch_follower_count_from_api('https://note.com/test_user') is None
+        assert read_chunks == [0]
+        response.close.assert_called_once_with()
+        assert mock_get.call_args.kwargs['stream'] is True
+
+    def test_APIに接続できない場合はNone(self, monkeypatch):
+        monkeypatch.setattr(note_scraper, 'NOTE_API_BASE_URL', 'http://127.0.0.1:1/api/v2')
+
+        assert note_scraper.fetch_follower_count_from_api('https://note.com/test_user') is None
+
+
+class FakeAccountStore:
+    """フォロワー数のスナップショットと条件付きGETの検証子を保持するストア（DynamoDBHandler）の代わり"""
+
+    def __init__(self):
+        self.items = {}
+        self.record_reads = 0
+
+    def get_profile_validators(self, note_username):
+        return self._get_validators(note_username)
+
+    def _get_validators(self, note_username):
+        item = self.items.get(note_username, {})
+        if 'request_url' not in item:
+            return None
+        return {key: item[key] for key in ('request_url', 'etag', 'last_modified', 'followers_count')}
+
+    def get_follower_snapshot(self, note_username):
+        item = self.items.get(note_username)
+        if item is None:
+            return None
+        return {'followers_count': item['followers_count'], 'fetched_at': item['fetched_at']}
+
+    def save_follower_snapshot(self, note_username, followers_count, fetched_at, validators=None):
+        item = {'followers_count': followers_count, 'fetched_at': fetched_at}
+        if validators:
+            item.update({key: validators[key] for key in ('request_url', 'etag', 'last_modified')})
+        self.items[note_username] = item
+        return True
+
+    def get_follower_history(self, note_username):
+        return list(self.items.get(note_username, {}).get('follower_history', []))
+
+    def get_follower_history_arrays(self, note_username):
+        history = self.get_follower_history(note_username)
+        return (
+            np.array([entry['fetched_at'] for entry in history], dtype=np.int64),
+            np.array([entry['followers_count'] for entry in history], dtype=np.int64)
+        )
+
+    def get_follower_record(self, note_username):
+        self.record_reads += 1
+        return {
+            'history': self.get_follower_history_arrays(note_username),
+            'anomaly_state': self.items.get(note_username, {}).get('follower_anomaly'),
+            'validators': self._get_validators(note_username)
+        }
+
+    def append_follower_history(self, note_username, followers_count, fetched_at, history=None, anomaly_state=None,
+                                validators=None):
+        item = self.items.setdefault(note_username, {})
+        for key in ('request_url', 'etag', 'last_modified'):
+            item.pop(key, None)
+        item.update({'followers_count': followers_count, 'fetched_at': fetched_at})
+        if validators:
+            item.update({key: validators[key] for key in ('request_url', 'etag', 'last_modified')})
+        item.setdefault('follower_history', []).append({'fetched_at': fetched_at, 'followers_count': followers_count})
+        if anomaly_state is not None:
+            item['follower_anomaly'] = anomaly_state
+        return True
+
+
+class TestConditionalGet:
+    """ETag・Last-Modifiedによる条件付きGETのテスト"""
+
+    def test_APIの応答が変わっていない場合は前回のフォロワー数を使う(self, note_stand_in):
+        NoteStandInHandler.etag = '"v1"'
+        url = f'{note_stand_in}/test_user'
+
+        first = note_scraper.get_dashboard_info_from_note_url(url)
+        second = note_scraper.get_dashboard_info_from_note_url(url)
+
+        assert first['followers_count'] == second['followers_count'] == 4321
+        assert NoteStandInHandler.statuses == [200, 304]
+
+    def test_HTMLの応答が変わっていない場合は前回のフォロワー数を使う(self, note_stand_in):
+        NoteStandInHandler.api_status = 404
+        NoteStandInHandler.last_modified = 'Wed, 21 Oct 2026 07:28:00 GMT'
+        url = f'{note_stand_in}/test_user'
+
+        first = note_scraper.get_dashboard_info_from_note_url(url)
+        second = note_scraper.get_dashboard_info_from_note_url(url)
+
+        assert first['followers_count'] == second['followers_count'] == 1234
+        assert NoteStandInHandler.statuses == [404, 200, 404, 304]
+
+    def test_検証子が変わった場合は新しいフォロワー数を使う(self, note_stand_in):
+        NoteStandInHandler.etag = '"v1"'
+        url = f'{note_stand_in}/test_user'
+        note_scraper.get_dashboard_info_from_note_url(url)
+
+        NoteStandInHandler.etag = '"v2"'
+        NoteStandInHandler.api_body = json.dumps({'data': {'followerCount': 5000}}).encode('utf-8')
+        result = note_scraper.get_dashboard_info_from_note_url(url)
+
+        assert result['followers_count'] == 5000
+        assert NoteStandInHandler.statuses == [200, 200]
+
+    def test_検証子はストアに保存され別のプロセスからも使える(self, note_stand_in, monkeypatch):
+        NoteStandInHandler.etag = '"v1"'
+        store = FakeAccountStore()
+        note_scraper.set_note_account_store(store)
+        url = f'{note_stand_in}/Test_User'
+        note_scraper.get_dashboard_info_from_note_url(url)
+
+        # 別のコンテナ（メモリ上の検証子がない状態）からの取得
+        monkeypatch.setattr(note_scraper, '_profile_validators', {})
+        result = note_scraper.get_dashboard_info_from_note_url(url)
+
+        assert store.items['test_user']['etag'] == '"v1"'
+        assert result['followers_count'] == 4321
+        assert NoteStandInHandler.statuses == [200, 304]
+
+    def test_検証子のない応答の場合はフォロワー数のみ保存する(self, note_stand_in):
+        store = FakeAccountStore()
+        note_scraper.set_note_account_store(store)
+
+        note_scraper.get_dashboard_info_from_note_url(f'{note_stand_in}/test_user')
+
+        assert store.items['test_user']['followers_count'] == 4321
+        assert 'etag' not in store.items['test_user']
+        assert store.get_profile_validators('test_user') is None
+
+    def test_検証子のない応答の後は以前の検証子を使わない(self, note_stand_in):
+        NoteStandInHandler.etag = '"v1"'
+        url = f'{note_stand_in}/test_user'
+        note_scraper.get_dashboard_info_from_note_url(url)
+
+        NoteStandInHandler.etag = None
+        NoteStandInHandler.api_body = json.dumps({'data': {'followerCount': 5000}}).encode('utf-8')
+        note_scraper.get_dashboard_info_from_note_url(url)
+        NoteStandInHandler.etag = '"v1"'
+        result = note_scraper.get_dashboard_info_from_note_url(url)
+
+        assert result['followers_count'] == 5000
+        assert NoteStandInHandler.statuses == [200, 200, 200]
+
+
+class TestNoteDashboardCache:
+    """オンデマンド取得用のキャッシュのテスト"""
+
+    def test_create_note_dashboard_cache_from_env(self, monkeypatch):
+        monkeypatch.setenv('NOTE_CACHE_TTL_SECONDS', '60')
+        monkeypatch.setenv('NOTE_CACHE_MAX_ENTRIES', '10')
+
+        cache = note_scraper.create_note_dashboard_cache()
+
+        assert cache.ttl == 60
+        assert cache.max_entries == 10
+
+    def test_create_note_dashboard_cache_disabled(self, monkeypatch):
+        monkeypatch.setenv('NOTE_CACHE_TTL_SECONDS', '0')
+
+        assert note_scraper.create_note_dashboard_cache() is None
+
+    @patch('app.note_scraper.get_dashboard_info_from_note_url')
+    def test_同じアカウントの2回目はキャッシュから返す(self, mock_get_info):
+        mock_get_info.return_value = {'followers_count': 10, 'url': 'https://note.com/Test_User'}
+
+        first = note_scraper.get_cached_dashboard_info_for_user('Test_User')
+        second = note_scraper.get_cached_dashboard_info_for_user('test_user')
+
+        assert first == second
+        mock_get_info.assert_called_once_with('https://note.com/Test_User')
+        assert note_scraper.NOTE_DASHBOARD_CACHE.stats()['hits'] == 1
+
+    @patch('app.note_scraper.get_dashboard_info_from_note_url')
+    def test_エラーと古い値はキャッシュしない(self, mock_get_info):
+        mock_get_info.side_effect = [
+            {'error': 'リクエストエラー'},
+            {'followers_count': 10, 'url': 'https://note.com/test_user', 'stale': True},
+            {'followers_count': 11, 'url': 'https://note.com/test_user'}
+        ]
+
+        results = [note_scraper.get_cached_dashboard_info_for_user('test_user') for _ in range(3)]
+
+        assert results[2]['followers_count'] == 11
+        assert mock_get_info.call_count == 3
+
+    @patch('app.note_scraper.get_dashboard_info_from_note_url')
+    def test_キャッシュが無効の場合は毎回取得する(self, mock_get_info, monkeypatch):
+        monkeypatch.setattr(note_scraper, 'NOTE_DASHBOARD_CACHE', None)
+        mock_get_info.return_value = {'followers_count': 10, 'url': 'https://note.com/test_user'}
+
+        note_scraper.get_cached_dashboard_info_for_user('test_user')
+        note_scraper.get_cached_dashboard_info_for_user('test_user')
+
+        assert mock_get_info.call_count == 2
+
+
+class TestFollowerSnapshot:
+    """ストアに保存されたフォロワー数のスナップショットのテスト"""
+
+    @pytest.fixture
+    def store(self):
+        store = FakeAccountStore()
+        note_scraper.set_note_account_store(store)
+        return store
+
+    @patch('app.note_scraper.get_dashboard_info_from_note_url')
+    def test_オンデマンド取得では新しいスナップショットを使う(self, mock_get_info, store):
+        store.save_follower_snapshot('test_user', 777, int(time.time()) - 60)
+
+        result = note_scraper.get_cached_dashboard_info_for_user('Test_User')
+
+        assert result['followers_count'] == 777
+        assert result['url'] == 'https://note.com/Test_User'
+        mock_get_info.assert_not_called()
+
+    @patch('app.note_scraper.get_dashboard_info_from_note_url')
+    def test_古いスナップショットの場合はすぐに返して裏で取得し直す(self, mock_get_info, store, monkeypatch):
+        monkeypatch.setenv('NOTE_SNAPSHOT_MAX_AGE_SECONDS', '300')
+        store.save_follower_snapshot('test_user', 777, int(time.time()) - 301)
+        mock_get_info.return_value = {'followers_count': 800, 'url': 'https://note.com/test_user'}
+        revalidated = []
+
+        result = note_scraper.get_cached_dashboard_info_for_user(
+            'test_user', lambda stale, fresh: revalidated.append((stale, fresh))
+        )
+
+        assert result['followers_count'] == 777
+        assert result['revalidating'] is True
+        assert '5分前に取得した値です' in note_scraper.format_dashboard_info_for_display(result)
+        assert note_scraper.wait_for_revalidations(timeout=5)
+        mock_get_info.assert_called_once_with('https://note.com/test_user')
+        assert revalidated[0][0]['followers_count'] == 777
+        assert revalidated[0][1]['followers_count'] == 800
+        assert note_scraper.get_cached_dashboard_info_for_user('test_user')['followers_count'] == 800
+
+    def test_取得に成功するとスナップショットが保存される(self, note_stand_in, store):
+        note_scraper.get_dashboard_info_from_note_url(f'{note_stand_in}/test_user')
+
+        snapshot = store.get_follower_snapshot('test_user')
+        assert snapshot['followers_count'] == 4321
+        assert abs(snapshot['fetched_at'] - time.time()) < 5
+
+    @patch('app.note_scraper.NOTE_SESSION.get')
+    def test_サーキットブレーカーが開いている間は他のコンテナが保存したスナップショットを返す(self, mock_get, store, monkeypatch):
+        breaker = CircuitBreaker(minimum_calls=1)
+        breaker.record(False)
+        monkeypatch.setattr(note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        store.save_follower_snapshot('test_user', 555, int(time.time()) - 3600)
+
+        result = note_scraper.get_dashboard_info_from_note_url('https://note.com/test_user')
+
+        assert result['followers_count'] == 555
+        assert result['stale'] is True
+        mock_get.assert_not_called()
+
+
+class TestStaleWhileRevalidate:
+    """オンデマンド取得で古い値を返して裏で取得し直す処理のテスト"""
+
+    def test_同じアカウントの取得し直しは1回だけ行われる(self, monkeypatch):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch(note_url):
+            calls.append(note_url)
+            started.set()
+            release.wait(5)
+            return {'followers_count': 20, 'url': note_url, 'fetched_at': int(time.time())}
+
+        monkeypatch.setattr(note_scraper, 'get_dashboard_info_from_note_url', slow_fetch)
+        note_scraper.remember_dashboard_info(
+            {'followers_count': 10, 'url': 'https://note.com/test_user', 'fetched_at': int(time.time()) - 3600}
+        )
+        revalidated = []
+
+        first = note_scraper.get_cached_dashboard_info_for_user('test_user', lambda stale, fresh: revalidated.append('first'))
+        started.wait(5)
+        second = note_scraper.get_cached_dashboard_info_for_user('test_user', lambda stale, fresh: revalidated.append('second'))
+        release.set()
+
+        assert note_scraper.wait_for_revalidations(timeout=5)
+        assert first['revalidating'] and second['revalidating']
+        assert calls == ['https://note.com/test_user']
+        assert sorted(revalidated) == ['first', 'second']
+
+    def test_通知でエラーが起きても他の通知は行われる(self, monkeypatch):
+        monkeypatch.setattr(
+            note_scraper, 'get_dashboard_info_from_note_url',
+            lambda note_url: {'followers_count': 20, 'url': note_url, 'fetched_at': int(time.time())}
+        )
+        revalidated = []
+
+        def failing(stale, fresh):
+            raise RuntimeError('push failed')
+
+        note_scraper._revalidations['test_user'] = {'callbacks': [({}, failing), ({}, lambda stale, fresh: revalidated.append(fresh))]}
+        note_scraper.revalidate('test_user', 'https://note.com/test_user')
+
+        assert revalidated[0]['followers_count'] == 20
+        assert 'test_user' not in note_scraper._revalidations
+
+    def test_取得の後の通知が終わるまで待つ(self, monkeypatch):
+        monkeypatch.setattr(
+            note_scraper, 'get_dashboard_info_from_note_url',
+            lambda note_url: {'followers_count': 20, 'url': note_url, 'fetched_at': int(time.time())}
+        )
+        note_scraper.remember_dashboard_info(
+            {'followers_count': 10, 'url': 'https://note.com/test_user', 'fetched_at': int(time.time()) - 3600}
+        )
+        pushing = threading.Event()
+        release = threading.Event()
+        pushed = []
+
+        def slow_push(stale, fresh):
+            pushing.set()
+            release.wait(5)
+            pushed.append(fresh['followers_count'])
+
+        note_scraper.get_cached_dashboard_info_for_user('test_user', slow_push)
+        assert pushing.wait(5)
+
+        # 取得は終わっているが、通知の途中では待ち終わらない
+        assert 'test_user' not in note_scraper._revalidations
+        assert note_scraper.wait_for_revalidations(timeout=0.1) is False
+        release.set()
+        assert note_scraper.wait_for_revalidations(timeout=5) is True
+        assert pushed == [20]
+
+    def test_取得し直しがない場合はすぐに戻る(self):
+        assert note_scraper.wait_for_revalidations(timeout=0) is True
+
+    def test_format_age(self):
+        assert note_scraper.format_age(10) == '1分'
+        assert note_scraper.format_age(59 * 60) == '59分'
+        assert note_scraper.format_age(2 * 60 * 60) == '2時間'
+        assert note_scraper.format_age(3 * 24 * 60 * 60) == '3日'
+
+
+class TestNoteSingleFlight:
+    """同じURLへの同時の取得をまとめる処理のテスト"""
+
+    def test_同じURLの同時の取得は1回のリクエストにまとめられる(self, monkeypatch):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch(note_url, save_snapshot=True):
+            calls.append(note_url)
+            started.set()
+            release.wait(5)
+            return {'followers_count': 10, 'url': note_url}
+
+        monkeypatch.setattr(note_scraper, 'fetch_dashboard_info_from_note_url', slow_fetch)
+        monkeypatch.setattr(note_scraper, 'NOTE_SINGLE_FLIGHT', note_scraper.SingleFlight())
+        results = []
+
+        def lookup():
+            results.append(note_scraper.get_dashboard_info_from_note_url('https://note.com/popular'))
+
+        threads = [threading.Thread(target=lookup)]
+        threads[0].start()
+        started.wait(5)
+        threads += [threading.Thread(target=lookup) for _ in range(2)]
+        for thread in threads[1:]:
+            thread.start()
+
+        async def lookup_async():
+            return await note_scraper.get_dashboard_info_from_note_url_async('https://note.com/popular')
+
+        async def main():
+            waiting = asyncio.ensure_future(lookup_async())
+            while note_scraper.NOTE_SINGLE_FLIGHT.shared_count < 3:
+                await asyncio.sleep(0.01)
+            release.set()
+            return await waiting
+
+        results.append(asyncio.run(main()))
+        for thread in threads:
+            thread.join(5)
+
+        assert calls == ['https://note.com/popular']
+        assert [result['followers_count'] for result in results] == [10] * 4
+
+    def test_asyncio版も空のURLはエラーを返す(self):
+        result = asyncio.run(note_scraper.get_dashboard_info_from_note_url_async(''))
+
+        assert 'error' in result
+
+
+class TestFollowerHistory:
+    """フォロワー数の履歴と増減の表示のテスト"""
+
+    def test_履歴から前回と前日からの増減を求める(self):
+        now = 1700000000
+        timestamps = np.array([now - 2 * 86400, now - 86400 + 60, now - 3600])
+        counts = np.array([50, 63, 98])
+
+        changes = note_scraper.summarize_follower_changes(timestamps, counts, 100, now)
+
+        # 実行時刻が多少ずれていても、約1日前の取得を前日比の基準にする
+        assert changes == {'previous_followers_count': 98, 'followers_change': 2, 'daily_followers_change': 37}
+
+    def test_履歴がない場合は増減はNone(self):
+        empty = np.array([], dtype=np.int64)
+
+        changes = note_scraper.summarize_follower_changes(empty, empty, 100, 1700000000)
+
+        assert changes == {'previous_followers_count': None, 'followers_change': None, 'daily_followers_change': None}
+
+    def test_取得したフォロワー数を履歴に追加して増減を返す(self, monkeypatch):
+        store = FakeAccountStore()
+        store.append_follower_history('test_user', 90, int(time.time()) - 86400)
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', store)
+
+        with patch('app.note_scraper.get_dashboard_info_from_note_url') as mock_get_info:
+            mock_get_info.return_value = {
+                'followers_count': 127, 'url': 'https://note.com/Test_User', 'fetched_at': int(time.time())
+            }
+            result = note_scraper.get_dashboard_info_with_history_for_user('Test_User')
+
+        assert result['followers_change'] == 37
+        assert result['daily_followers_change'] == 37
+        assert [entry['followers_count'] for entry in store.get_follower_history('test_user')] == [90, 127]
+
+        message = note_scraper.format_dashboard_info_for_display(result)
+        assert '📈 前回比: +37人' in message
+        assert '📅 前日比: +37人' in message
+
+    def test_定期実行ではアカウントごとに1回の読み込みと1回の更新のみ行う(self, monkeypatch):
+        store = FakeAccountStore()
+        now = int(time.time())
+        validators = {'request_url': 'https://note.com/api/v2/creators/Test_User', 'etag': '"v1"',
+                      'last_modified': None, 'followers_count': 127}
+        store.save_follower_snapshot('test_user', 127, now - 3600, validators)
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', store)
+        monkeypatch.setattr(note_scraper, '_profile_validators', {})
+
+        with patch('app.note_scraper.get_dashboard_info_from_note_url') as mock_get_info, \
+                patch.object(store, 'save_follower_snapshot') as mock_save, \
+                patch.object(store, 'get_profile_validators') as mock_get_validators:
+            mock_get_info.return_value = {'followers_count': 127, 'url': 'https://note.com/Test_User', 'fetched_at': now}
+            note_scraper.get_dashboard_info_with_history_for_user('Test_User')
+
+        # 検証子は履歴と一緒に読み込み、フォロワー数と検証子は履歴の追加と同じ更新で保存する
+        mock_get_info.assert_called_once_with('https://note.com/Test_User', save_snapshot=False)
+        mock_save.assert_not_called()
+        mock_get_validators.assert_not_called()
+        assert store.record_reads == 1
+        assert note_scraper._profile_validators['https://note.com/Test_User'] == validators
+        assert store.get_follower_snapshot('test_user') == {'followers_count': 127, 'fetched_at': now}
+        assert store.get_profile_validators('test_user') == validators
+
+    def test_同じ実行で記録済みのアカウントは取得し直さずに記録した値を返す(self, monkeypatch):
+        store = FakeAccountStore()
+        now = int(time.time())
+        count = 1000
+        for hour in range(20, 0, -1):
+            count += 3 + hour % 3
+            store.append_follower_history('test_user', count, now - hour * 3600)
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', store)
+        for minute in range(15, 0, -1):
+            count += 3 + minute % 3
+            note_scraper.record_follower_history({
+                'followers_count': count, 'url': 'https://note.com/Test_User', 'fetched_at': now - minute * 60
+            })
+
+        # 中断する前に記録した（急に減った）
+        with patch('app.note_scraper.get_dashboard_info_from_note_url') as mock_get_info:
+            mock_get_info.return_value = {'followers_count': count - 200, 'url': 'https://note.com/Test_User', 'fetched_at': now}
+            recorded = note_scraper.get_dashboard_info_with_history_for_user('Test_User', now - 10)
+        anomaly_state = dict(store.items['test_user']['follower_anomaly'])
+
+        # When: 続きの実行で同じアカウントを処理する
+        with patch('app.note_scraper.get_dashboard_info_from_note_url') as mock_get_info:
+            result = note_scraper.get_dashboard_info_with_history_for_user('Test_User', now - 10)
+
+        # Then: 取得し直さず、履歴と状態も更新せずに、記録したときと同じ結果を返す
+        mock_get_info.assert_not_called()
+        assert len(store.get_follower_history('test_user')) == 36
+        assert store.items['test_user']['follower_anomaly'] == anomaly_state
+        assert recorded['anomaly'] is True
+        for key in ('followers_count', 'followers_change', 'daily_followers_change', 'anomaly', 'trend', 'fetched_at'):
+            assert result[key] == recorded[key]
+        assert result['anomaly_score'] == pytest.approx(recorded['anomaly_score'])
+
+        # 次の実行（開始日時が記録より後）では取得し直す
+        with patch('app.note_scraper.get_dashboard_info_from_note_url') as mock_get_info:
+            mock_get_info.return_value = {'followers_count': count, 'url': 'https://note.com/Test_User', 'fetched_at': now + 3600}
+            note_scraper.get_dashboard_info_with_history_for_user('Test_User', now + 3590)
+        assert len(store.get_follower_history('test_user')) == 37
+
+    def test_取得に失敗した場合や古い値は履歴に追加しない(self, monkeypatch):
+        store = FakeAccountStore()
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', store)
+
+        error = {'error': 'リクエストエラー'}
+        stale = {'followers_count': 10, 'url': 'https://note.com/test_user', 'stale': True}
+
+        assert note_scraper.record_follower_history(error) == error
+        assert note_scraper.record_follower_history(stale) == stale
+        assert store.get_follower_history('test_user') == []
+
+    def test_増減がない場合や減った場合の表示(self):
+        message = note_scraper.format_dashboard_info_for_display({
+            'followers_count': 1000, 'url': 'https://note.com/test_user',
+            'followers_change': 0, 'daily_followers_change': -1200
+        })
+
+        assert '📈 前回比: ±0人' in message
+        assert '📅 前日比: -1,200人' in message
+
+    def test_履歴全体の傾向を表示する(self, monkeypatch):
+        store = FakeAccountStore()
+        now = int(time.time())
+        for day in range(7, 0, -1):
+            store.append_follower_history('test_user', 1000 - day * 10, now - day * 86400)
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', store)
+
+        result = note_scraper.record_follower_history({
+            'followers_count': 1000, 'url': 'https://note.com/test_user', 'fetched_at': now
+        })
+
+        assert result['trend']['daily_growth'] == pytest.approx(10)
+        message = note_scraper.format_dashboard_info_for_display(result)
+        assert '📊 7日移動平均: 965人' in message
+        assert '🚀 1日あたり: +10.0人（+1.00%）' in message
+        assert '🎯 10,000人到達予測: ' in message
+
+    def test_増減の状態をストアに保存し急な減少を表示する(self, monkeypatch):
+        store = FakeAccountStore()
+        now = int(time.time())
+        count = 1000
+        for hour in range(30, 0, -1):
+            count += 3 + hour % 3
+            store.append_follower_history('test_user', count, now - hour * 3600)
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', store)
+
+        # 毎時間のフォロワー数の増減を学習させる
+        for hour in range(20, 0, -1):
+            count += 3 + hour % 3
+            result = note_scraper.record_follower_history({
+                'followers_count': count, 'url': 'https://note.com/test_user', 'fetched_at': now - hour * 60
+            })
+        assert result['anomaly'] is False
+        assert store.items['test_user']['follower_anomaly']['samples'] == 20
+        assert 'Zスコア' not in note_scraper.format_dashboard_info_for_display(result)
+
+        # 急に大きく減った
+        result = note_scraper.record_follower_history({
+            'followers_count': count - 200, 'url': 'https://note.com/test_user', 'fetched_at': now
+        })
+
+        assert result['anomaly'] is True
+        assert result['anomaly_score'] < 0
+        assert '⚠️ いつもと比べて急な変化です（Zスコア -' in note_scraper.format_dashboard_info_for_display(result)
+
+    def test_増減のないアカウントの小さな増加は急な増減とみなさない(self, monkeypatch):
+        store = FakeAccountStore()
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', store)
+        now = int(time.time())
+        for hour in range(20, 0, -1):
+            note_scraper.record_follower_history({
+                'followers_count': 300, 'url': 'https://note.com/test_user', 'fetched_at': now - hour * 3600
+            })
+
+        result = note_scraper.record_follower_history({
+            'followers_count': 305, 'url': 'https://note.com/test_user', 'fetched_at': now
+        })
+
+        # Zスコアは閾値を超えるが、増減の人数が下限に満たない
+        assert result['anomaly_score'] >= ANOMALY_Z_THRESHOLD
+        assert result['anomaly'] is False
+
+    def test_履歴が短い場合は傾向を表示しない(self, monkeypatch):
+        monkeypatch.setattr(note_scraper, 'NOTE_ACCOUNT_STORE', FakeAccountStore())
+
+        result = note_scraper.record_follower_history({
+            'followers_count': 1000, 'url': 'https://note.com/test_user', 'fetched_at': int(time.time())
+        })
+
+        assert result['trend'] is None
+        assert '移動平均' not in note_scraper.format_dashboard_info_for_display(result)
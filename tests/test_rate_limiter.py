@@ -0,0 +1,98 @@
+import pytest
+import asyncio
+import threading
+import time
+from app.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    """テスト用の進めることのできる時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket:
+    """TokenBucketのテスト"""
+
+    def test_バースト数までは待たずに取得できる(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+
+        waits = [bucket.reserve() for _ in range(3)]
+
+        assert waits == [0.0, 0.0, 0.0]
+
+    def test_バースト数を超えると補充される間隔だけ待つ(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=1, clock=clock)
+
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == pytest.approx(0.5)
+        # 予約は積み上がる
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_時間が経つとトークンが補充される(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+        bucket.reserve()
+        bucket.reserve()
+
+        clock.now += 0.1
+
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == pytest.approx(0.1)
+
+    def test_補充はバースト数を上限とする(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+
+        clock.now += 100
+
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, pytest.approx(0.1)]
+
+    def test_acquireは待ち時間だけスリープする(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4, burst=1, clock=clock)
+
+        bucket.acquire(sleep=clock.sleep)
+        waited = bucket.acquire(sleep=clock.sleep)
+
+        assert waited == pytest.approx(0.25)
+        assert clock.now == pytest.approx(0.25)
+
+    def test_複数スレッドから取得しても上限を超えない(self):
+        bucket = TokenBucket(rate=200, burst=5)
+        start = time.monotonic()
+
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 5件はバーストで即時、残り20件は200件/秒で補充されるため0.1秒近くかかる
+        assert time.monotonic() - start >= 0.09
+
+    def test_asyncioから待機できる(self):
+        bucket = TokenBucket(rate=100, burst=1)
+
+        async def acquire_all():
+            return await asyncio.gather(*(bucket.acquire_async() for _ in range(3)))
+
+        waits = asyncio.run(acquire_all())
+
+        assert waits[0] == 0.0
+        assert sorted(waits)[-1] == pytest.approx(0.02, abs=0.005)
+
+    def test_不正な設定の場合_ValueErrorが発生する(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+        with pytest.raises(ValueError):
+            TokenBucket(rate=1, burst=0)
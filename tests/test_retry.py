@@ -0,0 +1,172 @@
+import pytest
+import requests
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import Mock
+from app import retry
+from app.retry import RetryBudget, RetryPolicy, parse_retry_after
+
+
+def make_response(status_code, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+class TestRetryBudget:
+    """RetryBudgetのテスト"""
+
+    def test_上限回数まで消費できる(self):
+        budget = RetryBudget(2)
+
+        assert budget.try_spend() is True
+        assert budget.try_spend() is True
+        assert budget.try_spend() is False
+        assert budget.remaining == 0
+
+    def test_reset_retry_budgetで環境変数の値に戻る(self, monkeypatch):
+        monkeypatch.setenv('RETRY_BUDGET_PER_RUN', '7')
+
+        budget = retry.reset_retry_budget()
+
+        assert budget.remaining == 7
+        assert retry.get_retry_budget() is budget
+
+
+class TestParseRetryAfter:
+    """parse_retry_afterのテスト"""
+
+    def test_秒数の場合(self):
+        assert parse_retry_after('3') == 3.0
+
+    def test_HTTP日付の場合(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+        assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(30, abs=2)
+
+    def test_未設定または不正な値の場合(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('soon') is None
+
+
+class TestRetryPolicy:
+    """RetryPolicyのテスト"""
+
+    def make_policy(self, budget=None, **kwargs):
+        self.sleeps = []
+        return RetryPolicy(
+            budget=budget or RetryBudget(10),
+            sleep=self.sleeps.append,
+            random_func=lambda: 1.0,
+            **kwargs
+        )
+
+    def test_成功した場合はリトライしない(self):
+        policy = self.make_policy()
+        request_func = Mock(return_value=make_response(200))
+
+        response = policy.call(request_func)
+
+        assert response.status_code == 200
+        assert request_func.call_count == 1
+        assert self.sleeps == []
+
+    def test_5xxの場合は指数バックオフでリトライする(self):
+        policy = self.make_policy(max_attempts=3, base_delay=0.5)
+        request_func = Mock(side_effect=[make_response(503), make_response(502), make_response(200)])
+
+        response = policy.call(request_func)
+
+        assert response.status_code == 200
+        assert request_func.call_count == 3
+        assert self.sleeps == [0.5, 1.0]
+
+    def test_ジッターは上限までの一様乱数になる(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=3.0, random_func=lambda: 0.25)
+
+        assert policy.compute_delay(1) == 0.25
+        assert policy.compute_delay(5) == 0.75
+
+    def test_最長の所要時間は全ての試行のタイムアウトと最大の待ち時間の合計(self):
+        policy = RetryPolicy(max_attempts=3, max_delay=5.0)
+
+        assert policy.max_total_seconds(20) == 3 * 20 + 2 * 5.0
+        assert RetryPolicy(max_attempts=1).max_total_seconds(20) == 20
+
+    def test_リトライする場合は捨てる応答を閉じる(self):
+        policy = self.make_policy(max_attempts=2)
+        discarded = make_response(503)
+        final = make_response(503)
+        request_func = Mock(side_effect=[discarded, final])
+
+        response = policy.call(request_func)
+
+        assert response is final
+        discarded.close.assert_called_once_with()
+        final.close.assert_not_called()
+
+    def test_Retry_Afterヘッダーがある場合はその秒数だけ待つ(self):
+        policy = self.make_policy()
+        request_func = Mock(side_effect=[make_response(429, {'Retry-After': '2'}), make_response(200)])
+
+        policy.call(request_func)
+
+        assert self.sleeps == [2.0]
+
+    def test_Retry_Afterが待機上限を超える場合はリトライしない(self):
+        policy = self.make_policy(max_delay=5.0)
+        request_func = Mock(return_value=make_response(429, {'Retry-After': '120'}))
+
+        response = policy.call(request_func)
+
+        assert response.status_code == 429
+        assert request_func.call_count == 1
+
+    def test_リトライ対象外のステータスはリトライしない(self):
+        policy = self.make_policy()
+        request_func = Mock(return_value=make_response(404))
+
+        response = policy.call(request_func)
+
+        assert response.status_code == 404
+        assert request_func.call_count == 1
+
+    def test_接続エラーが続く場合は最後の例外を送出する(self):
+        policy = self.make_policy(max_attempts=2)
+        request_func = Mock(side_effect=requests.exceptions.ConnectionError('refused'))
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            policy.call(request_func)
+
+        assert request_func.call_count == 2
+
+    def test_読み込みタイムアウトはリトライしない(self):
+        policy = self.make_policy()
+        request_func = Mock(side_effect=requests.exceptions.ReadTimeout('slow'))
+
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            policy.call(request_func)
+
+        assert request_func.call_count == 1
+
+    def test_リトライ予算を使い切った場合はリトライしない(self):
+        budget = RetryBudget(1)
+        policy = self.make_policy(budget=budget, max_attempts=5)
+        request_func = Mock(return_value=make_response(503))
+
+        response = policy.call(request_func)
+
+        assert response.status_code == 503
+        assert request_func.call_count == 2
+        assert budget.remaining == 0
+
+    def test_予算を指定しない場合は共有の予算を使う(self, monkeypatch):
+        shared_budget = RetryBudget(0)
+        monkeypatch.setattr(retry, '_retry_budget', shared_budget)
+        policy = RetryPolicy(sleep=lambda seconds: None)
+        request_func = Mock(return_value=make_response(503))
+
+        policy.call(request_func)
+
+        assert request_func.call_count == 1
@@ -0,0 +1,755 @@
+import pytest
+import threading
+from decimal import Decimal
+from unittest.mock import ANY, patch, Mock
+import lambda_function
+from app import sharding
+from app.circuit_breaker import CircuitBreaker
+
+
+def account_update(message, followers_change=None, anomaly=False, followers_count=None):
+    """スケジュール実行で1アカウント分を取得した結果"""
+    return {'message': message, 'followers_count': followers_count, 'followers_change': followers_change, 'anomaly': anomaly}
+
+
+class TestScheduledMaxWorkers:
+    """get_scheduled_max_workers関数のテスト"""
+
+    def test_未設定の場合_デフォルト値を返す(self, monkeypatch):
+        monkeypatch.delenv('SCHEDULED_MAX_WORKERS', raising=False)
+
+        assert lambda_function.get_scheduled_max_workers() == lambda_function.DEFAULT_SCHEDULED_MAX_WORKERS
+
+    def test_数値が設定されている場合_その値を返す(self, monkeypatch):
+        monkeypatch.setenv('SCHEDULED_MAX_WORKERS', '16')
+
+        assert lambda_function.get_scheduled_max_workers() == 16
+
+    def test_不正な値の場合_デフォルト値を返す(self, monkeypatch):
+        monkeypatch.setenv('SCHEDULED_MAX_WORKERS', 'many')
+
+        assert lambda_function.get_scheduled_max_workers() == lambda_function.DEFAULT_SCHEDULED_MAX_WORKERS
+
+    def test_0以下の場合_1に丸められる(self, monkeypatch):
+        monkeypatch.setenv('SCHEDULED_MAX_WORKERS', '0')
+
+        assert lambda_function.get_scheduled_max_workers() == 1
+
+
+class TestConcurrentScheduledExecution:
+    """スケジュール実行の並列処理のテスト"""
+
+    def test_スレッドプールはバッチをまたいで再利用される(self):
+        # Given: 2並列で2回に分けて処理する
+        def thread_name(item):
+            return threading.current_thread().name
+
+        # When: 2回のバッチを処理する
+        first = lambda_function.run_concurrently(thread_name, [1, 2, 3, 4], 2)
+        second = lambda_function.run_concurrently(thread_name, [1, 2, 3, 4], 2)
+
+        # Then: 同じスレッドプールのスレッドで実行され、スレッドごとのboto3のリソースを作り直さない
+        assert len(set(first) | set(second)) <= 2
+        assert lambda_function.get_scheduled_executor(2) is lambda_function.get_scheduled_executor(2)
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_並列実行の場合_全ユーザーに同時に送信される(self, mock_db_handler, mock_send_push, monkeypatch, sample_lambda_context):
+        # Given: 3並列の設定と3人のユーザー
+        monkeypatch.setenv('SCHEDULED_MAX_WORKERS', '3')
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': f'user{i}', 'note_username': f'note_user{i}'} for i in range(3)
+        ]
+        mock_db_handler.return_value = mock_db
+
+        # 3件の取得が同時に実行中でなければ通過できないバリア
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_response(note_username, run_started_at):
+            barrier.wait()
+            return account_update(f"Response for {note_username}")
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=fake_response):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 全ユーザーに対応するメッセージが送信される
+        assert result['statusCode'] == 200
+        assert 'Scheduled execution completed for 3 users across 3 accounts (0 failed)' in result['body']
+        for i in range(3):
+            mock_send_push.assert_any_call(f'user{i}', f'Response for note_user{i}')
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_一部のユーザーで例外が発生した場合_他のユーザーには送信される(self, mock_db_handler, mock_send_push, monkeypatch, sample_lambda_context):
+        # Given: 2人目の取得で例外が発生する
+        monkeypatch.setenv('SCHEDULED_MAX_WORKERS', '2')
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'user1', 'note_username': 'note_user1'},
+            {'line_user_id': 'user2', 'note_username': 'broken_user'},
+            {'line_user_id': 'user3', 'note_username': 'note_user3'}
+        ]
+        mock_db_handler.return_value = mock_db
+
+        def fake_response(note_username, run_started_at):
+            if note_username == 'broken_user':
+                raise RuntimeError('boom')
+            return account_update(f"Response for {note_username}")
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=fake_response):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 失敗は1件として集計され、他のユーザーには送信される
+        assert result['statusCode'] == 200
+        assert '(1 failed)' in result['body']
+        assert mock_send_push.call_count == 2
+        mock_send_push.assert_any_call('user1', 'Response for note_user1')
+        mock_send_push.assert_any_call('user3', 'Response for note_user3')
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_送信に失敗した場合_失敗として集計される(self, mock_db_handler, mock_send_push, sample_lambda_context):
+        # Given: LINEへの送信が失敗する
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'user1', 'note_username': 'note_user1'}
+        ]
+        mock_db_handler.return_value = mock_db
+        mock_send_push.return_value = False
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 失敗として集計される
+        assert '(1 failed)' in result['body']
+
+
+class TestAccountDeduplication:
+    """note.comアカウント単位での取得集約のテスト"""
+
+    def test_同じアカウントのマッピングは正規化されて1つにまとめられる(self):
+        user_mappings = [
+            {'line_user_id': 'user1', 'note_username': 'popular'},
+            {'line_user_id': 'user2', 'note_username': 'Popular'},
+            {'line_user_id': 'user3', 'note_username': 'other'},
+            {'line_user_id': 'user1', 'note_username': 'popular'}
+        ]
+
+        result = lambda_function.group_mappings_by_note_username(user_mappings)
+
+        assert result == {
+            'popular': ['user1', 'user2'],
+            'other': ['user3']
+        }
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_同じアカウントの登録ユーザーが複数いる場合_取得は1回だけ行われる(self, mock_db_handler, mock_send_push, mock_send_multicast, sample_lambda_context):
+        # Given: 3人が同じアカウントを登録している
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'user1', 'note_username': 'popular'},
+            {'line_user_id': 'user2', 'note_username': 'popular'},
+            {'line_user_id': 'user3', 'note_username': 'POPULAR'},
+            {'line_user_id': 'user4', 'note_username': 'other'}
+        ]
+        mock_db_handler.return_value = mock_db
+        mock_send_multicast.return_value = 3
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=lambda name, run_started_at: account_update(f"Response for {name}")) as mock_get_response:
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: アカウントごとに1回だけ取得され、全員に同じ結果が送信される
+        assert 'Scheduled execution completed for 4 users across 2 accounts (0 failed)' in result['body']
+        assert mock_get_response.call_count == 2
+        mock_get_response.assert_any_call('popular', ANY)
+        mock_get_response.assert_any_call('other', ANY)
+        mock_send_multicast.assert_called_once_with(['user1', 'user2', 'user3'], 'Response for popular')
+        mock_send_push.assert_called_once_with('user4', 'Response for other')
+
+
+class TestMulticastDelivery:
+    """スケジュール実行でのマルチキャスト送信のテスト"""
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_送信先が上限を超える場合_上限ごとに分割して送信される(self, mock_db_handler, mock_send_multicast, mock_send_push, monkeypatch, sample_lambda_context):
+        # Given: 上限2件の設定で5人が同じアカウントを登録している
+        monkeypatch.setattr('lambda_function.line_handler.LINE_MULTICAST_MAX_RECIPIENTS', 2)
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': f'user{i}', 'note_username': 'popular'} for i in range(5)
+        ]
+        mock_db_handler.return_value = mock_db
+        mock_send_multicast.side_effect = lambda line_user_ids, message: len(line_user_ids)
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 2件・2件・1件に分割して送信される
+        assert '(0 failed)' in result['body']
+        assert mock_send_multicast.call_count == 2
+        mock_send_multicast.assert_any_call(['user0', 'user1'], 'message')
+        mock_send_multicast.assert_any_call(['user2', 'user3'], 'message')
+        mock_send_push.assert_called_once_with('user4', 'message')
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_マルチキャストの一部が失敗した場合_失敗した人数が集計される(self, mock_db_handler, mock_send_multicast, sample_lambda_context):
+        # Given: 3人中1人分の送信に失敗する
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': f'user{i}', 'note_username': 'popular'} for i in range(3)
+        ]
+        mock_db_handler.return_value = mock_db
+        mock_send_multicast.return_value = 2
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 失敗した1人分が集計される
+        assert '(1 failed)' in result['body']
+
+
+class TestStreamingScheduledExecution:
+    """スキャン結果をバッチ単位で処理するスケジュール実行のテスト"""
+
+    def test_iter_batchesは指定件数ごとに分割する(self):
+        result = list(lambda_function.iter_batches(iter(range(5)), 2))
+
+        assert result == [[0, 1], [2, 3], [4]]
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_複数のバッチに同じアカウントがある場合も取得は1回だけ行われる(self, mock_db_handler, mock_send_push, monkeypatch, sample_lambda_context):
+        # Given: バッチサイズ2で、同じアカウントが別のバッチにまたがっている
+        monkeypatch.setattr('lambda_function.SCHEDULED_BATCH_SIZE', 2)
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = iter([
+            {'line_user_id': 'user1', 'note_username': 'popular'},
+            {'line_user_id': 'user2', 'note_username': 'other'},
+            {'line_user_id': 'user3', 'note_username': 'popular'}
+        ])
+        mock_db_handler.return_value = mock_db
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=lambda name, run_started_at: account_update(f"Response for {name}")) as mock_get_response:
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: アカウントごとに1回だけ取得され、全員に送信される
+        assert 'Scheduled execution completed for 3 users across 2 accounts (0 failed)' in result['body']
+        assert mock_get_response.call_count == 2
+        mock_send_push.assert_any_call('user1', 'Response for popular')
+        mock_send_push.assert_any_call('user2', 'Response for other')
+        mock_send_push.assert_any_call('user3', 'Response for popular')
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_スキャンの途中でも先頭のバッチから処理を開始する(self, mock_db_handler, mock_send_push, monkeypatch, sample_lambda_context):
+        # Given: 2件目を返す前に1件目の送信が済んでいるかを記録するスキャン
+        monkeypatch.setattr('lambda_function.SCHEDULED_BATCH_SIZE', 1)
+        sent_before_second_item = []
+
+        def fake_scan():
+            yield {'line_user_id': 'user1', 'note_username': 'note_user1'}
+            sent_before_second_item.append(mock_send_push.call_count)
+            yield {'line_user_id': 'user2', 'note_username': 'note_user2'}
+
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = fake_scan()
+        mock_db_handler.return_value = mock_db
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')):
+            lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: スキャンが終わる前に1件目が送信されている
+        assert sent_before_second_item == [1]
+        assert mock_send_push.call_count == 2
+
+
+class TestParallelScanScheduledExecution:
+    """並列スキャンを使うスケジュール実行のテスト"""
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_セグメント数が設定されている場合_並列スキャンを使用する(self, mock_db_handler, mock_send_push, monkeypatch, sample_lambda_context):
+        # Given: 4セグメントの並列スキャン設定
+        monkeypatch.setenv('SCHEDULED_SCAN_SEGMENTS', '4')
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings_parallel.return_value = iter([
+            {'line_user_id': 'user1', 'note_username': 'note_user1'}
+        ])
+        mock_db_handler.return_value = mock_db
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 並列スキャンの結果が処理される
+        assert 'completed for 1 users' in result['body']
+        mock_db.iter_all_user_mappings_parallel.assert_called_once_with(4)
+        mock_db.iter_all_user_mappings.assert_not_called()
+        mock_send_push.assert_called_once_with('user1', 'message')
+
+
+class TestShardedScheduledExecution:
+    """コーディネーター/ワーカーに分割したスケジュール実行のテスト"""
+
+    USER_MAPPINGS = [
+        {'line_user_id': f'user{i}', 'note_username': f'note_user{i % 7}'} for i in range(20)
+    ]
+
+    def test_スケジュールイベントでシャード数が設定されている場合_コーディネーターが呼び出される(self, monkeypatch, sample_scheduled_event, sample_lambda_context):
+        monkeypatch.setenv('SCHEDULED_SHARD_COUNT', '3')
+
+        with patch('lambda_function.handle_scheduled_coordination', return_value={'statusCode': 200}) as mock_coordination:
+            lambda_function.lambda_handler(sample_scheduled_event, sample_lambda_context)
+
+        mock_coordination.assert_called_once_with(sample_lambda_context)
+
+    def test_ワーカーイベントの場合_担当シャードのスケジュール実行が呼び出される(self, sample_lambda_context):
+        event = {'source': 'note-monitor.scheduled-worker', 'shard_index': 1, 'shard_count': 3}
+
+        with patch('lambda_function.handle_scheduled_execution', return_value={'statusCode': 200}) as mock_execution:
+            lambda_function.lambda_handler(event, sample_lambda_context)
+
+        mock_execution.assert_called_once_with(sample_lambda_context, 1, 3, None)
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_ローカルディスパッチャで実行した場合_全アカウントがいずれか1つのシャードで1回だけ処理される(self, mock_db_handler, mock_send_push, mock_send_multicast, monkeypatch, sample_lambda_context):
+        # Given: 3シャードの設定と、ワーカーのスキャンごとに全件を返すDB（プロセス内のワーカーで共有される）
+        monkeypatch.setenv('SCHEDULED_SHARD_COUNT', '3')
+        mock_db_handler.return_value = Mock(
+            iter_all_user_mappings=Mock(side_effect=lambda *args, **kwargs: iter(self.USER_MAPPINGS))
+        )
+        mock_send_multicast.side_effect = lambda line_user_ids, message: len(line_user_ids)
+        dispatcher = sharding.LocalDispatcher(lambda_function.lambda_handler, sample_lambda_context)
+
+        # When: コーディネーターを実行
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=lambda name, run_started_at: account_update(f"Response for {name}")) as mock_get_response:
+            result = lambda_function.handle_scheduled_coordination(sample_lambda_context, dispatcher)
+
+        # Then: 3つのワーカーが実行され、各アカウントはちょうど1回だけ取得される
+        assert 'Dispatched 3/3 scheduled workers' in result['body']
+        assert len(dispatcher.responses) == 3
+        fetched = sorted(call.args[0] for call in mock_get_response.call_args_list)
+        assert fetched == sorted(f'note_user{i}' for i in range(7))
+
+        # 全ユーザーにちょうど1回ずつ送信される
+        recipients = [call.args[0] for call in mock_send_push.call_args_list]
+        for call in mock_send_multicast.call_args_list:
+            recipients.extend(call.args[0])
+        assert sorted(recipients) == sorted(mapping['line_user_id'] for mapping in self.USER_MAPPINGS)
+        # DynamoDBHandlerはワーカー間で1つだけ作成される
+        mock_db_handler.assert_called_once_with()
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_ワーカーは担当シャード以外のアカウントを処理しない(self, mock_db_handler, mock_send_push, sample_lambda_context):
+        # Given: シャード0のワーカー
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = iter([
+            {'line_user_id': f'user{i}', 'note_username': f'note_user{i}'} for i in range(30)
+        ])
+        mock_db_handler.return_value = mock_db
+        ring = sharding.ConsistentHashRing(2)
+        expected = sorted(f'note_user{i}' for i in range(30) if ring.get_shard(f'note_user{i}') == 0)
+
+        # When: シャード0として実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')) as mock_get_response:
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context, 0, 2)
+
+        # Then: シャード0に割り当てられたアカウントのみ処理される
+        assert sorted(call.args[0] for call in mock_get_response.call_args_list) == expected
+        assert 'in shard 1/2' in result['body']
+
+
+class FakeNotifiedUserTable:
+    """最後に通知したフォロワー数の保存を再現するDynamoDBHandlerの代わり"""
+
+    def __init__(self, user_mappings):
+        self.user_mappings = [dict(mapping) for mapping in user_mappings]
+
+    def iter_all_user_mappings(self, exclusive_start_key=None):
+        return iter([dict(mapping) for mapping in self.user_mappings])
+
+    def pop_scheduled_cursor(self, shard_index, shard_count):
+        return None
+
+    def update_last_notified_followers_count(self, line_user_id, note_username, followers_count):
+        for mapping in self.user_mappings:
+            if mapping['line_user_id'] == line_user_id and mapping['note_username'] == note_username:
+                mapping['last_notified_followers_count'] = Decimal(followers_count)
+        return True
+
+    def last_notified(self, line_user_id):
+        return next(
+            mapping.get('last_notified_followers_count')
+            for mapping in self.user_mappings if mapping['line_user_id'] == line_user_id
+        )
+
+
+class FakeUserTable:
+    """ExclusiveStartKeyによる再開を再現するDynamoDBHandlerの代わり"""
+
+    def __init__(self, user_mappings):
+        self.user_mappings = user_mappings
+        self.saved_cursors = {}
+
+    def iter_all_user_mappings(self, exclusive_start_key=None):
+        start = 0
+        if exclusive_start_key:
+            start = self.user_mappings.index(exclusive_start_key) + 1
+        return iter(self.user_mappings[start:])
+
+    def save_scheduled_cursor(self, shard_index, shard_count, cursor):
+        self.saved_cursors[(shard_index, shard_count)] = cursor
+        return True
+
+    def pop_scheduled_cursor(self, shard_index, shard_count):
+        return self.saved_cursors.pop((shard_index, shard_count), None)
+
+
+class DeadlineContext:
+    """指定回数だけ残り時間が十分にあると答えるLambda contextの代わり"""
+
+    function_name = 'test_function'
+
+    def __init__(self, allowed_checks):
+        self.allowed_checks = allowed_checks
+
+    def get_remaining_time_in_millis(self):
+        self.allowed_checks -= 1
+        return 600000 if self.allowed_checks >= 0 else 1000
+
+
+class TestDeadlineAwareScheduledExecution:
+    """締め切りを考慮したスケジュール実行の中断・再開のテスト"""
+
+    USER_MAPPINGS = [
+        {'line_user_id': f'user{i}', 'note_username': f'note_user{i % 5}'} for i in range(12)
+    ]
+
+    def test_残り時間を取得できないcontextの場合_締め切りを確認しない(self, sample_lambda_context):
+        assert lambda_function.build_deadline_check(sample_lambda_context) is None
+
+    def test_残り時間が余裕を下回るとFalseを返す(self, monkeypatch):
+        monkeypatch.setenv('SCHEDULED_DEADLINE_MARGIN_MS', '200000')
+        context = Mock()
+        context.get_remaining_time_in_millis.side_effect = [200001, 199999]
+
+        has_time_remaining = lambda_function.build_deadline_check(context)
+
+        assert has_time_remaining() is True
+        assert has_time_remaining() is False
+
+    def test_余裕は1アカウントの最長の処理時間を下回らない(self, monkeypatch):
+        # Given: 1アカウントの最長の処理時間より短い余裕
+        monkeypatch.setenv('SCHEDULED_DEADLINE_MARGIN_MS', '5000')
+        max_duration_ms = lambda_function.get_account_max_duration_ms()
+        context = Mock()
+        context.get_remaining_time_in_millis.side_effect = [max_duration_ms + 1, max_duration_ms - 1]
+
+        has_time_remaining = lambda_function.build_deadline_check(context)
+
+        # Then: 始めたアカウントがタイムアウトとリトライを繰り返しても間に合う時点で中断する
+        assert max_duration_ms == (5 + 3 * 20 + 2 * 5 + 3 * 5 + 2 * 5) * 1000
+        assert lambda_function.DEFAULT_SCHEDULED_DEADLINE_MARGIN_MS >= max_duration_ms
+        assert has_time_remaining() is True
+        assert has_time_remaining() is False
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_締め切りで中断して再開した場合_全ユーザーにちょうど1回ずつ送信される(self, mock_db_handler, mock_send_push, mock_send_multicast, monkeypatch):
+        # Given: バッチサイズ4で、3アカウント分の処理後に締め切りが近づく
+        monkeypatch.setattr('lambda_function.SCHEDULED_BATCH_SIZE', 4)
+        mock_db_handler.return_value = FakeUserTable(self.USER_MAPPINGS)
+        mock_send_multicast.side_effect = lambda line_user_ids, message: len(line_user_ids)
+        dispatcher = Mock()
+        dispatcher.dispatch.return_value = 1
+
+        # When: 最初の実行
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=lambda name, run_started_at: account_update(f"Response for {name}")):
+            first = lambda_function.handle_scheduled_execution(DeadlineContext(allowed_checks=6), dispatcher=dispatcher)
+
+        # Then: 中断され、カーソルを持つ続きのイベントが送られる
+        assert 'paused before the deadline, continuation dispatched' in first['body']
+        dispatcher.dispatch.assert_called_once()
+        (continuation_event,), = dispatcher.dispatch.call_args.args
+        assert continuation_event['source'] == sharding.SCHEDULED_WORKER_EVENT_SOURCE
+        assert continuation_event['cursor'] == first['cursor']
+        assert first['cursor']['exclusive_start_key'] == {'line_user_id': 'user3', 'note_username': 'note_user3'}
+        assert first['cursor']['processed_accounts'] == ['note_user4', 'note_user0']
+
+        # When: 続きのイベントで再開（締め切りに余裕がある）
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=lambda name, run_started_at: account_update(f"Response for {name}")):
+            second = lambda_function.lambda_handler(continuation_event, DeadlineContext(allowed_checks=100))
+
+        # Then: 最後まで処理され、全ユーザーにちょうど1回ずつ送信される
+        assert 'paused' not in second['body']
+        recipients = [call.args[0] for call in mock_send_push.call_args_list]
+        for call in mock_send_multicast.call_args_list:
+            recipients.extend(call.args[0])
+        assert sorted(recipients) == sorted(mapping['line_user_id'] for mapping in self.USER_MAPPINGS)
+        # DynamoDBHandlerはワーカー間で1つだけ作成される
+        mock_db_handler.assert_called_once_with()
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_再開後の実行には最初の実行の開始日時を渡す(self, mock_db_handler, mock_send_push, monkeypatch):
+        # Given: バッチサイズ1で、同じアカウント（alice）が中断の前後のバッチに現れる
+        monkeypatch.setattr('lambda_function.SCHEDULED_BATCH_SIZE', 1)
+        mock_db_handler.return_value = FakeUserTable([
+            {'line_user_id': 'u1', 'note_username': 'alice'},
+            {'line_user_id': 'u2', 'note_username': 'bob'},
+            {'line_user_id': 'u3', 'note_username': 'alice'}
+        ])
+        dispatcher = Mock()
+        dispatcher.dispatch.return_value = 1
+        calls = []
+
+        def fetch(name, run_started_at):
+            calls.append((name, run_started_at))
+            return account_update(f"Response for {name}", 2)
+
+        # When: 1バッチ目の後に中断し、続きのイベントで再開する
+        with patch('lambda_function.get_note_account_update_for_user', side_effect=fetch):
+            first = lambda_function.handle_scheduled_execution(DeadlineContext(allowed_checks=1), dispatcher=dispatcher)
+            (continuation_event,), = dispatcher.dispatch.call_args.args
+            second = lambda_function.lambda_handler(continuation_event, DeadlineContext(allowed_checks=100))
+
+        # Then: カーソルには取得結果を含めず、再開後も最初の実行の開始日時で取得する
+        # （中断前に履歴に記録したaliceは、note_scraperが記録した値を返す）
+        assert 'paused' in first['body'] and 'paused' not in second['body']
+        assert set(first['cursor']) == {'exclusive_start_key', 'processed_accounts', 'run_started_at'}
+        assert sorted(name for name, _ in calls) == ['alice', 'alice', 'bob']
+        assert {run_started_at for _, run_started_at in calls} == {first['cursor']['run_started_at']}
+        assert sorted(call.args for call in mock_send_push.call_args_list) == [
+            ('u1', 'Response for alice'), ('u2', 'Response for bob'), ('u3', 'Response for alice')
+        ]
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_続きの呼び出しに失敗した場合_次の実行がカーソルから再開する(self, mock_db_handler, mock_send_push, mock_send_multicast):
+        # Given: 最初のアカウントを処理する前に締め切りが近づく
+        table = FakeUserTable(self.USER_MAPPINGS)
+        mock_db_handler.return_value = table
+        mock_send_multicast.side_effect = lambda line_user_ids, message: len(line_user_ids)
+        dispatcher = Mock()
+        dispatcher.dispatch.return_value = 0
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')):
+            result = lambda_function.handle_scheduled_execution(DeadlineContext(allowed_checks=0), dispatcher=dispatcher)
+
+        # Then: 何も送信されず、再開用のカーソルがDynamoDBに保存される
+        assert 'continuation failed, resuming in the next run' in result['body']
+        assert result['cursor'] == {
+            'exclusive_start_key': None, 'processed_accounts': [], 'run_started_at': result['cursor']['run_started_at']
+        }
+        assert table.saved_cursors == {(0, 1): result['cursor']}
+        mock_send_push.assert_not_called()
+
+        # When: 次のスケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')) as mock_get_response:
+            lambda_function.handle_scheduled_execution(DeadlineContext(allowed_checks=100), dispatcher=dispatcher)
+
+        # Then: 保存したカーソルを取り出して、その位置から全アカウントを処理する
+        assert table.saved_cursors == {}
+        assert mock_get_response.call_count == 5
+        recipients = [call.args[0] for call in mock_send_push.call_args_list]
+        for call in mock_send_multicast.call_args_list:
+            recipients.extend(call.args[0])
+        assert sorted(recipients) == sorted(mapping['line_user_id'] for mapping in self.USER_MAPPINGS)
+
+
+class TestCircuitBreakerScheduledExecution:
+    """スケジュール実行でのnote.comのサーキットブレーカーの状態報告のテスト"""
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_サーキットブレーカーが拒否した呼び出しの数が結果に含まれる(self, mock_db_handler, mock_send_push, sample_lambda_context, monkeypatch):
+        # Given: note.comのサーキットブレーカーが開いている
+        breaker = CircuitBreaker(minimum_calls=1)
+        breaker.record(False)
+        monkeypatch.setattr(lambda_function.note_scraper, 'NOTE_CIRCUIT_BREAKER', breaker)
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'user1', 'note_username': 'alice'},
+            {'line_user_id': 'user2', 'note_username': 'bob'}
+        ]
+        mock_db_handler.return_value = mock_db
+        mock_send_push.return_value = True
+
+        # When: スケジュール実行
+        with patch('app.note_scraper.NOTE_SESSION.get') as mock_get:
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: note.comへはリクエストせず、拒否した数が報告される
+        mock_get.assert_not_called()
+        assert '[note.com circuit breaker open, 2 requests rejected]' in result['body']
+
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_サーキットブレーカーが閉じている場合は結果に含まれない(self, mock_db_handler, mock_send_push, sample_lambda_context):
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'user1', 'note_username': 'alice'}
+        ]
+        mock_db_handler.return_value = mock_db
+        mock_send_push.return_value = True
+
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message')):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        assert 'circuit breaker' not in result['body']
+
+
+class TestNotifyOnChange:
+    """フォロワー数が変わった場合のみ通知するスケジュール実行のテスト"""
+
+    def test_変化が下限以上の場合のみ通知する(self):
+        assert lambda_function.should_notify(3, 1) is True
+        assert lambda_function.should_notify(-3, 3) is True
+        assert lambda_function.should_notify(0, 1) is False
+        assert lambda_function.should_notify(2, 5) is False
+        assert lambda_function.should_notify(0, 0) is True
+        # 比較できない場合（初回の取得や取得の失敗）は通知する
+        assert lambda_function.should_notify(None, 5) is True
+        # いつもと比べて急な増減の場合は下限に関わらず通知する
+        assert lambda_function.should_notify(2, 5, anomaly=True) is True
+
+    def test_マッピングの下限が未設定や不正な場合はデフォルト値を使う(self):
+        assert lambda_function.get_notify_min_change({'notify_min_change': 10}) == 10
+        assert lambda_function.get_notify_min_change({}) == lambda_function.DEFAULT_NOTIFY_MIN_CHANGE
+        assert lambda_function.get_notify_min_change({'notify_min_change': 'many'}) == lambda_function.DEFAULT_NOTIFY_MIN_CHANGE
+        assert lambda_function.get_notify_min_change({'notify_min_change': -1}) == 0
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_フォロワー数が変わっていないアカウントはLINEのAPIを呼び出さない(self, mock_db_handler, mock_send_push, mock_send_multicast, sample_lambda_context):
+        # Given: 変化のないアカウントと変化したアカウント
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'user1', 'note_username': 'unchanged'},
+            {'line_user_id': 'user2', 'note_username': 'unchanged'},
+            {'line_user_id': 'user3', 'note_username': 'changed'}
+        ]
+        mock_db_handler.return_value = mock_db
+        changes = {'unchanged': 0, 'changed': 2}
+
+        # When: スケジュール実行
+        with patch('lambda_function.get_note_account_update_for_user',
+                   side_effect=lambda name, run_started_at: account_update(f"Response for {name}", changes[name])):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 変化したアカウントの登録ユーザーにのみ送信される
+        mock_send_multicast.assert_not_called()
+        mock_send_push.assert_called_once_with('user3', 'Response for changed')
+        assert 'completed for 3 users across 2 accounts (0 failed), 2 not notified without follower changes' in result['body']
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_ユーザーごとの下限に応じて送信先が決まる(self, mock_db_handler, mock_send_push, mock_send_multicast, sample_lambda_context):
+        # Given: 同じアカウントを異なる下限で登録しているユーザー
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'default_user', 'note_username': 'popular'},
+            {'line_user_id': 'every_run_user', 'note_username': 'popular', 'notify_min_change': Decimal(0)},
+            {'line_user_id': 'large_change_user', 'note_username': 'Popular', 'notify_min_change': Decimal(5)}
+        ]
+        mock_db_handler.return_value = mock_db
+        mock_send_multicast.side_effect = lambda line_user_ids, message: len(line_user_ids)
+
+        # When: フォロワー数が3人増えた
+        with patch('lambda_function.get_note_account_update_for_user', return_value=account_update('message', 3)):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 下限が3人以下のユーザーにのみ送信される
+        mock_send_multicast.assert_called_once_with(['default_user', 'every_run_user'], 'message')
+        mock_send_push.assert_not_called()
+        assert '(0 failed), 1 not notified' in result['body']
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_急な増減の場合は下限に関わらず通知する(self, mock_db_handler, mock_send_push, mock_send_multicast, sample_lambda_context):
+        # Given: 大きな変化のときだけ通知を受け取るユーザー
+        mock_db = Mock()
+        mock_db.iter_all_user_mappings.return_value = [
+            {'line_user_id': 'large_change_user', 'note_username': 'purged', 'notify_min_change': Decimal(100)}
+        ]
+        mock_db_handler.return_value = mock_db
+
+        # When: いつもは増えているアカウントのフォロワー数が急に減った
+        with patch('lambda_function.get_note_account_update_for_user',
+                   return_value=account_update('message', -30, anomaly=True)):
+            result = lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 下限未満の変化でも送信される
+        mock_send_push.assert_called_once_with('large_change_user', 'message')
+        assert 'not notified' not in result['body']
+
+    @patch('lambda_function.line_handler.send_multicast_message')
+    @patch('lambda_function.line_handler.send_push_message')
+    @patch('lambda_function.db_handler.DynamoDBHandler')
+    def test_少しずつの増加も最後の通知からの合計が下限に達したら通知する(self, mock_db_handler, mock_send_push, mock_send_multicast, sample_lambda_context):
+        # Given: 下限10人のユーザーと、毎回通知を受け取るユーザー（まだ通知していない）
+        table = FakeNotifiedUserTable([
+            {'line_user_id': 'large_change_user', 'note_username': 'Slow_Grower', 'notify_min_change': Decimal(10)},
+            {'line_user_id': 'every_run_user', 'note_username': 'slow_grower'}
+        ])
+        mock_db_handler.return_value = table
+        notified = []
+        mock_send_push.side_effect = lambda line_user_id, message: notified.append((line_user_id, message))
+        mock_send_multicast.side_effect = lambda line_user_ids, message: len(
+            [notified.append((line_user_id, message)) for line_user_id in line_user_ids]
+        )
+
+        # When: フォロワー数が実行ごとに3人ずつ増える
+        for run, followers_count in enumerate([100, 103, 106, 109, 112]):
+            update = account_update(f'run{run}', followers_change=3, followers_count=followers_count)
+            with patch('lambda_function.get_note_account_update_for_user', return_value=update):
+                lambda_function.handle_scheduled_execution(sample_lambda_context)
+
+        # Then: 下限10人のユーザーには、最初の基準（100人）から12人増えた時点で1回だけ通知される
+        assert [message for line_user_id, message in notified if line_user_id == 'large_change_user'] == ['run4']
+        assert table.last_notified('large_change_user') == 112
+        assert len([1 for line_user_id, _ in notified if line_user_id == 'every_run_user']) == 5
+        # 保存されているnote.comユーザー名のキーに書き込まれる
+        assert table.user_mappings[0]['note_username'] == 'Slow_Grower'
+
+    @patch('lambda_function.line_handler.send_push_message')
+    def test_送信に失敗した場合は最後に通知したフォロワー数を更新しない(self, mock_send_push):
+        store = Mock()
+        mock_send_push.return_value = False
+        updates = {'test_user': account_update('message', followers_change=5, followers_count=105)}
+
+        failed_count, skipped_count = lambda_function.notify_account(
+            'test_user', ['user1'], updates, last_notified={('test_user', 'user1'): 100}, store=store
+        )
+
+        assert (failed_count, skipped_count) == (1, 0)
+        store.update_last_notified_followers_count.assert_not_called()
+
+        mock_send_push.return_value = True
+        lambda_function.notify_account(
+            'test_user', ['user1'], updates, last_notified={('test_user', 'user1'): 100}, store=store
+        )
+        store.update_last_notified_followers_count.assert_called_once_with('user1', 'test_user', 105)
@@ -0,0 +1,92 @@
+import pytest
+import json
+from unittest.mock import patch, Mock
+from botocore.exceptions import ClientError
+from app import sharding
+
+
+class TestConsistentHashRing:
+    """ConsistentHashRingのテスト"""
+
+    def test_同じキーは常に同じシャードに割り当てられる(self):
+        ring = sharding.ConsistentHashRing(4)
+
+        assert ring.get_shard('popular') == ring.get_shard('popular')
+        assert ring.get_shard('popular') == sharding.ConsistentHashRing(4).get_shard('popular')
+
+    def test_全てのシャードにキーが割り当てられる(self):
+        ring = sharding.ConsistentHashRing(4)
+
+        shards = [ring.get_shard(f'note_user{i}') for i in range(1000)]
+
+        assert set(shards) == {0, 1, 2, 3}
+        # 極端な偏りがないこと
+        assert min(shards.count(shard) for shard in range(4)) > 100
+
+    def test_シャードを追加しても大半のキーは移動しない(self):
+        before = sharding.ConsistentHashRing(4)
+        after = sharding.ConsistentHashRing(5)
+        keys = [f'note_user{i}' for i in range(1000)]
+
+        moved = sum(1 for key in keys if before.get_shard(key) != after.get_shard(key))
+
+        # 理想的には1/5程度のキーだけが新しいシャードに移動する
+        assert moved < 350
+
+    def test_シャード数が1の場合_全てのキーが0番に割り当てられる(self):
+        ring = sharding.ConsistentHashRing(1)
+
+        assert ring.get_shard('anything') == 0
+
+    def test_シャード数が0の場合_ValueErrorが発生する(self):
+        with pytest.raises(ValueError):
+            sharding.ConsistentHashRing(0)
+
+
+class TestDispatchers:
+    """ディスパッチャのテスト"""
+
+    def test_build_worker_eventsはシャードごとのイベントを作成する(self):
+        events = sharding.build_worker_events(3)
+
+        assert events == [
+            {'source': sharding.SCHEDULED_WORKER_EVENT_SOURCE, 'shard_index': i, 'shard_count': 3}
+            for i in range(3)
+        ]
+
+    @patch('app.sharding.boto3.client')
+    def test_LambdaDispatcherはイベントごとに非同期呼び出しを行う(self, mock_client_factory):
+        mock_client = Mock()
+        mock_client_factory.return_value = mock_client
+        mock_client.invoke.side_effect = [
+            {'StatusCode': 202},
+            ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate exceeded'}}, 'Invoke')
+        ]
+        dispatcher = sharding.LambdaDispatcher('note-monitor')
+
+        result = dispatcher.dispatch(sharding.build_worker_events(2))
+
+        assert result == 1
+        assert mock_client.invoke.call_count == 2
+        _, kwargs = mock_client.invoke.call_args_list[0]
+        assert kwargs['FunctionName'] == 'note-monitor'
+        assert kwargs['InvocationType'] == 'Event'
+        assert json.loads(kwargs['Payload'])['shard_index'] == 0
+
+    def test_LocalDispatcherは同じプロセス内でイベントを処理する(self):
+        handler = Mock(side_effect=lambda event, context: {'statusCode': 200, 'shard': event['shard_index']})
+        dispatcher = sharding.LocalDispatcher(handler, context='context')
+
+        result = dispatcher.dispatch(sharding.build_worker_events(3))
+
+        assert result == 3
+        assert sorted(response['shard'] for response in dispatcher.responses) == [0, 1, 2]
+        assert handler.call_count == 3
+
+    def test_LocalDispatcherはワーカーの例外を失敗として数える(self):
+        handler = Mock(side_effect=RuntimeError('boom'))
+        dispatcher = sharding.LocalDispatcher(handler)
+
+        result = dispatcher.dispatch(sharding.build_worker_events(2))
+
+        assert result == 0
@@ -0,0 +1,150 @@
+import pytest
+import asyncio
+import threading
+from app.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """SingleFlightのテスト"""
+
+    def test_呼び出しが重ならない場合はそれぞれ実行する(self):
+        flight = SingleFlight()
+        calls = []
+
+        assert flight.do('a', lambda: calls.append(1) or 'first') == 'first'
+        assert flight.do('a', lambda: calls.append(2) or 'second') == 'second'
+
+        assert calls == [1, 2]
+        assert flight.shared_count == 0
+
+    def test_同じキーの同時の呼び出しは1回にまとめられる(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('a', slow)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('a', slow))) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        while flight.shared_count < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        assert results == ['result'] * 4
+        assert calls == [1]
+
+    def test_異なるキーの呼び出しはまとめない(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'a'
+
+        leader = threading.Thread(target=lambda: flight.do('a', slow))
+        leader.start()
+        started.wait(5)
+
+        assert flight.do('b', lambda: 'b') == 'b'
+        release.set()
+        leader.join(5)
+
+    def test_例外は待っている呼び出し元にも送出される(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise ValueError('failed')
+
+        def call():
+            try:
+                flight.do('a', failing)
+            except ValueError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        started.wait(5)
+        threads.append(threading.Thread(target=call))
+        threads[1].start()
+        while flight.shared_count < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert errors == ['failed', 'failed']
+        # 失敗した後は新たに実行できる
+        assert flight.do('a', lambda: 'ok') == 'ok'
+
+    def test_asyncioの同時の呼び出しは1回にまとめられる(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        async def main():
+            return await asyncio.gather(*[flight.do_async('a', fetch) for _ in range(5)])
+
+        assert asyncio.run(main()) == ['result'] * 5
+        assert calls == [1]
+
+    def test_スレッドの実行中の呼び出しをasyncioから待てる(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        leader = threading.Thread(target=lambda: flight.do('a', slow))
+        leader.start()
+        started.wait(5)
+
+        async def main():
+            waiting = asyncio.ensure_future(flight.do_async('a', slow))
+            # 待っている間もイベントループは止まらない
+            await asyncio.sleep(0.01)
+            assert not waiting.done()
+            release.set()
+            return await waiting
+
+        assert asyncio.run(main()) == 'result'
+        leader.join(5)
+        assert calls == [1]
+
+    def test_asyncioから通常の関数を渡した場合はスレッドプールで実行する(self):
+        flight = SingleFlight()
+        thread_ids = []
+
+        def fetch():
+            thread_ids.append(threading.get_ident())
+            return 'result'
+
+        assert asyncio.run(flight.do_async('a', fetch)) == 'result'
+        assert thread_ids != [threading.get_ident()]
@@ -0,0 +1,65 @@
+import pytest
+from app import trends
+from app.trends import analyze_follower_trend
+
+DAY = 24 * 60 * 60
+
+
+class TestAnalyzeFollowerTrend:
+    """フォロワー数の傾向の計算のテスト"""
+
+    def test_一定のペースで増えている場合の傾向(self):
+        # Given: 1時間ごとに10日分、1日あたり24人ずつ増えている履歴
+        timestamps = [1700000000 + i * 3600 for i in range(240)]
+        counts = [900 + i for i in range(240)]
+
+        trend = analyze_follower_trend(timestamps, counts)
+
+        assert trend['daily_growth'] == pytest.approx(24)
+        assert trend['daily_growth_rate'] == pytest.approx(24 / 1139 * 100)
+        # 直近7日間（168時間）の平均
+        assert trend['moving_average'] == pytest.approx(1139 - 84)
+        assert trend['next_milestone'] == 10_000
+        assert trend['milestone_eta'] == pytest.approx(timestamps[-1] + (10_000 - 1139) / 24 * DAY, abs=1)
+
+    def test_減っている場合は到達予測を出さない(self):
+        timestamps = [1700000000 + i * DAY for i in range(5)]
+        counts = [1000, 990, 980, 970, 960]
+
+        trend = analyze_follower_trend(timestamps, counts)
+
+        assert trend['daily_growth'] == pytest.approx(-10)
+        assert trend['next_milestone'] == 1_000
+        assert trend['milestone_eta'] is None
+
+    def test_到達予測が遠すぎる場合は出さない(self):
+        timestamps = [1700000000, 1700000000 + DAY]
+        counts = [10_001, 10_002]
+
+        assert analyze_follower_trend(timestamps, counts)['milestone_eta'] is None
+
+    def test_最後の節目を超えている場合(self):
+        trend = analyze_follower_trend([0, DAY], [2_000_000, 2_000_100])
+
+        assert trend['next_milestone'] is None
+        assert trend['milestone_eta'] is None
+
+    def test_期間内の取得が1件しかない場合は直前の取得と比べる(self):
+        timestamps = [0, DAY, 20 * DAY]
+        counts = [10, 20, 210]
+
+        trend = analyze_follower_trend(timestamps, counts, window_seconds=DAY)
+
+        assert trend['daily_growth'] == pytest.approx(10)
+        assert trend['moving_average'] == pytest.approx(115)
+
+    def test_フォロワー数が0の場合は増加率を出さない(self):
+        assert analyze_follower_trend([0, DAY], [0, 0])['daily_growth_rate'] is None
+
+    @pytest.mark.parametrize('timestamps, counts', [
+        ([], []),
+        ([1700000000], [10]),
+        ([1700000000, 1700000000 + trends.TREND_MIN_SPAN_SECONDS - 1], [10, 11])
+    ])
+    def test_履歴が短い場合はNone(self, timestamps, counts):
+        assert analyze_follower_trend(timestamps, counts) is None
@@ -1,5 +1,5 @@
 import pytest
-from app.validator import validate_note_username, extract_username_from_note_url, is_valid_note_url
+from app.validator import validate_note_username, extract_username_from_note_url, is_valid_note_url, normalize_note_username, parse_notify_min_change
 
 
 class TestValidator:
@@ -147,4 +147,21 @@ class TestValidator:
         
         # 17文字（最大+1）
         assert validate_note_username('abcdefghijklmnopq') is False
-        assert validate_note_username('12345678901234567') is False
\ No newline at end of file
+        assert validate_note_username('12345678901234567') is False
+    
+    def test_normalize_note_username(self):
+        """ユーザー名を小文字かつ前後の空白なしに正規化できること"""
+        assert normalize_note_username('Test_User') == 'test_user'
+        assert normalize_note_username('  test_user  ') == 'test_user'
+        assert normalize_note_username('') == ''
+        assert normalize_note_username(None) == ''
+    
+    def test_parse_notify_min_change(self):
+        """「通知 10」のようなメッセージから通知するフォロワー数の変化の下限を取り出せること"""
+        assert parse_notify_min_change('通知 10') == 10
+        assert parse_notify_min_change('通知0') == 0
+        assert parse_notify_min_change(' 通知　5 ') == 5
+        assert parse_notify_min_change('通知') is None
+        assert parse_notify_min_change('通知 -1') is None
+        assert parse_notify_min_change('test_user') is None
+        assert parse_notify_min_change(None) is None